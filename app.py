@@ -4,19 +4,17 @@ import R
 from routes import create_app
 from stats import epa
 import time
-import threading
 
 app = create_app()
 
 # Initialize the SQLite database
 database.init()
 
-# Initialize EPA in background
-def __init_epa():
-    epa.init()
-    epa.season_epa()
-
-threading.Thread(target=__init_epa).start()
+# Load EPA in the background (from the last snapshot if there is one). Until it's ready,
+# the EPA routes answer 503 and /api/stats/epa/<season>/status reports the progress.
+epa.start_loading()
+# Apply newly ingested matches as they arrive
+epa.start_updater()
 
 # Connect to Redis
 if R.init() == False:
@@ -1,55 +1,194 @@
-from queue import Queue
+from pathlib import Path
+from datetime import datetime, timezone
 import secrets
 import sqlite3
 import hashlib
 import string
-from functools import reduce
 from helper import *
-import time
+import threading
+import operator
+from contextlib import contextmanager, nullcontext
+from collections.abc import Mapping
+import numpy as np
 
 from R import Team, UserTeam
+from pool import ConnectionPool
 
-schema_file = "schema.sql"
+schema_file = Path(__file__).resolve().parent / "schema.sql"
+# Numbered SQL files (e.g. 001_hot_path_indexes.sql), applied in order on top of the schema.
+# The number of the last one applied is kept in the database's user_version.
+migrations_dir = Path(__file__).resolve().parent / "migrations"
 
-# Connection pool for SQLite database connections
+def __connect(read_only: bool = False) -> sqlite3.Connection:
+    """
+    Opens a connection to the database, tuned for many readers and a few bulk writers.
+
+    Args:
+        read_only (optional): reject any statement that would change the database
+    """
+    # timeout is how long SQLite waits on another connection's write lock before giving up
+    conn = sqlite3.connect(database_file, timeout=30, check_same_thread=False)
+    # WAL lets readers keep going while something writes, and NORMAL only fsyncs at checkpoints
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # 64 MiB page cache and 256 MiB of memory-mapped I/O per connection
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+# Connection pools for SQLite database connections
 # I had to do this because flask is handling my requests 
 # on seperate threads. This solution helps avoid using one
 # connection on different threads and allows my application
 # to scale better
-__connection_pool = Queue(maxsize=5)
-for _ in range(5):
-    __connection_pool.put(sqlite3.connect("database.db", check_same_thread=False))
+# Reads and writes get separate pools: WAL allows any number of readers next to one writer,
+# so a slow ingest can't starve page loads of connections.
+database_file = "database.db"
+__readers = None
+__writers = None
 
-def get_connection() -> sqlite3.Connection:
-    return __connection_pool.get()
+def configure(path: str = "database.db", readers: int = 5, writers: int = 1, timeout: float = 30.0):
+    """
+    Sets up the connection pools. Called with the defaults on import; call it again before any
+    connections are in use to point at a different database or resize the pools.
 
-def release_connection(connection: sqlite3.Connection):
-    __connection_pool.put(connection)
+    Args:
+        path: the SQLite database file
+        readers: the number of read-only connections
+        writers: the number of connections that can write
+        timeout: seconds to wait for a free connection before raising pool.PoolTimeout
+    """
+    global database_file, __readers, __writers, __migrated
+    database_file = path
+    # A different file needs its own migrations on the next init()
+    __migrated = False
+    __readers = ConnectionPool("reader", lambda: __connect(read_only=True), size=readers, timeout=timeout)
+    __writers = ConnectionPool("writer", __connect, size=writers, timeout=timeout)
 
-def init():
+configure()
+
+# The connection the current thread opened with dedicated(), if any
+__dedicated = threading.local()
+
+def reading():
+    """
+    Borrows a read-only connection for a `with` block:
+
+        with database.reading() as conn:
+            conn.execute(...)
+
+    The connection goes back to the pool when the block ends, even if it raised.
+    Inside a `dedicated()` block, the thread's own connection is used instead of the pool.
+    """
+    conn = getattr(__dedicated, "conn", None)
+    if conn is not None:
+        return nullcontext(conn)
+    return __readers.connection()
+
+@contextmanager
+def dedicated():
     """
-    Connect to the SQLite database and create the tables if they don't exist.
+    Gives the calling thread its own read-only connection, outside the pools, for a `with` block:
+
+        with database.dedicated():
+            database.get_match_teams(season=2024)
+
+    Every `reading()` on the thread uses it until the block ends, so background work that reads for
+    a long time (like loading a season) doesn't hold connections request handlers are waiting on.
     """
+    if getattr(__dedicated, "conn", None) is not None:
+        # Already inside a dedicated() block on this thread
+        yield __dedicated.conn
+        return
 
-    conn = get_connection()
+    conn = __connect(read_only=True)
+    __dedicated.conn = conn
     try:
+        yield conn
+    finally:
+        __dedicated.conn = None
+        conn.close()
+
+def writing():
+    """
+    Borrows a connection that can write for a `with` block. Any transaction left open when the
+    block ends is rolled back, so commit before leaving it.
+    """
+    return __writers.connection()
+
+def get_pool_stats() -> dict[str, dict]:
+    """
+    Returns the reader and writer pools' counters (checkouts, exhaustion, timeouts, wait times) for monitoring.
+    """
+    return {"reader": __readers.stats(), "writer": __writers.stats()}
+
+__migration_lock = threading.Lock()
+__migrated = False
+
+def get_migrations() -> list[tuple[int, Path]]:
+    """
+    Returns every migration as (version, path to SQL file), sorted by version.
+    """
+    return sorted((int(path.name.split("_")[0]), path) for path in migrations_dir.glob("[0-9]*_*.sql"))
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Brings a database up to the latest schema version. Only migrations newer than the database's
+    user_version run, so this is cheap when the database is already up to date.
+
+    Args:
+        conn: the connection to migrate
+
+    Returns the schema version the database is at afterwards.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    if version == 0:
         # This just creates all the tables that are defined in the schema file
         with open(schema_file) as f:
-            schema = f.read()
-
-        conn.executescript(schema)
+            conn.executescript(f.read())
         conn.commit()
-    finally:
-        release_connection(conn)
+
+    for (number, path) in get_migrations():
+        if number <= version:
+            continue
+
+        # Each migration and its version bump are applied together or not at all
+        with open(path) as f:
+            script = f.read()
+        try:
+            conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+        except:
+            conn.rollback()
+            raise
+        version = number
+        print(f"Applied migration {path.name}")
+
+    return version
+
+def init():
+    """
+    Connect to the SQLite database and create or migrate the tables. Only does work the first time it's called.
+    """
+    global __migrated
+
+    with __migration_lock:
+        if __migrated:
+            return
+
+        with writing() as conn:
+            migrate(conn)
+            __migrated = True
 
 def login(email: str, password: str) -> int:
     """
     Login a user with the given email and password.
     """
 
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
+    with reading() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT password, salt, rowid FROM users WHERE email=?", (email.lower(),))
         user = cursor.fetchone()
@@ -67,9 +206,6 @@ def login(email: str, password: str) -> int:
 
         if hashed_password == password_digest:
             return int(user[2])
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
 
     return None
 
@@ -79,9 +215,7 @@ def register(email: str, password: str, name: str) -> int:
     Register a new user with the given email and password. If the email is already taken, false will be returned.
     """
 
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
+    with writing() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users WHERE email=?", (email.lower(),))
         existing_user = cursor.fetchone()
@@ -100,89 +234,175 @@ def register(email: str, password: str, name: str) -> int:
         id = cursor.lastrowid
         conn.commit()
         return id
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
 
-def store_match_score(event_code: str, score_data: dict, season: int = 2024) -> bool:
+SCORE_KEYS_2024 = ['alliance', 'team', 'robot1Auto', 'robot2Auto', 'autoSampleNet', 'autoSampleLow', 'autoSampleHigh', 'autoSpecimenLow', 'autoSpecimenHigh', 'teleopSampleNet', 'teleopSampleLow', 'teleopSampleHigh', 'teleopSpecimenLow', 'teleopSpecimenHigh', 'robot1Teleop', 'robot2Teleop', 'minorFouls', 'majorFouls', 'autoSamplePoints', 'autoSpecimenPoints', 'teleopSamplePoints', 'teleopSpecimenPoints', 'teleopParkPoints', 'teleopAscentPoints', 'autoPoints', 'teleopPoints', 'endGamePoints', 'foulPointsCommitted', 'preFoulTotal', 'totalPoints']
+MATCH_KEYS = ["actualStartTime","description","tournamentLevel","series","matchNumber","scoreRedFinal","scoreRedFoul","scoreRedAuto","scoreBlueFinal","scoreBlueFoul","scoreBlueAuto","postResultTime","modifiedOn"]
+def api_time_to_epoch(api_time: str) -> int:
     """
-    Saves latest match score details. If we already have old data for the match, it will be overwritten.
+    Converts a time from the FTC Event API (e.g. 2025-01-11T09:12:33.21) to epoch seconds.
+
+    The API doesn't say which time zone its times are in, so they are treated as UTC. This matches
+    what SQLite's strftime('%s', ...) does, which is used to fill in rows stored before this existed.
+
+    Returns None if there is no time (e.g. the match hasn't been played).
+    """
+    if api_time is None:
+        return None
+    return int(datetime.fromisoformat(api_time).replace(tzinfo=timezone.utc).timestamp())
+
+SCHEDULE_KEYS = ["description","field","tournamentLevel","startTime","series","matchNumber","modifiedOn"]
+
+def __versioned_insert(table: str, columns: list[str], key: list[str]) -> str:
+    """
+    Builds an insert that stamps each row with a version, passed after the columns (see `__store_rows`). A row that's
+    already stored with the same values is left alone and keeps its version, so the version says when it last changed.
 
     Args:
-        event_code: the code of the event that this match is part of
-        score_data: the dictionary storing the JSON data from a single match, obtained from the FTC Event API
+        table: the table to insert into
+        columns: every column being inserted, in parameter order
+        key: the columns of the table's primary key
+    """
+    values = [column for column in columns if column not in key]
+    return (f"INSERT INTO {table} ({', '.join(columns)}, version) VALUES ({', '.join(['?'] * (len(columns) + 1))}) "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {', '.join(f'{column}=excluded.{column}' for column in values)}, version=excluded.version "
+            f"WHERE ({', '.join(f'{table}.{column}' for column in values)}) IS NOT ({', '.join(f'excluded.{column}' for column in values)})")
+
+# The insert statements are built once so sqlite can reuse the prepared statement for every row
+__STORE_SCORE_QUERY = __versioned_insert("scores", ["season", "eventCode", "matchLevel", "matchSeries", "matchNumber", *SCORE_KEYS_2024],
+                                         ["season", "eventCode", "matchLevel", "matchSeries", "matchNumber", "alliance"])
+__STORE_MATCH_QUERY = __versioned_insert("matches", ["season", "eventCode", "teamNumber", "station", "dq", "onField", "startTimestamp", *MATCH_KEYS],
+                                         ["season", "eventCode", "tournamentLevel", "series", "matchNumber", "teamNumber", "station", "dq", "onField"])
+__STORE_SCHEDULE_QUERY = f"INSERT INTO schedule (season, eventCode, teamNumber, displayTeamNumber, station, team, teamName, surrogate, noShow, {', '.join(SCHEDULE_KEYS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {', '.join(['?']*len(SCHEDULE_KEYS))})"
+# schedule has no primary key, so old rows for a scheduled match are removed before it is stored again
+__CLEAR_SCHEDULE_QUERY = "DELETE FROM schedule WHERE season=? AND eventCode=? AND tournamentLevel=? AND series=? AND matchNumber=?"
+__BUMP_EVENT_VERSION_QUERY = "INSERT OR REPLACE INTO event_versions (season, eventCode, version) VALUES (?, ?, ?)"
+
+def __store_rows(query: str, rows: list[tuple], clear_query: str = None, clear_rows: list[tuple] = None, event: tuple[int, str] = None, versioned: bool = False) -> int:
+    """
+    Writes a batch of rows with a single prepared statement inside one transaction.
+
+    Args:
+        query: the parameterized insert statement
+        rows: the parameters for every row to insert
+        clear_query (optional): a delete statement run for every entry of `clear_rows` before inserting
+        clear_rows (optional): the parameters for `clear_query`
+        event (optional): (season, event code) whose version is bumped in the same transaction
+        versioned (optional): the event's new version is passed to `query` after every row's parameters (see `__versioned_insert`)
+    
+    Returns the number of rows inserted or updated.
+    """
+
+    if not rows and not clear_rows:
+        return 0
+
+    with writing() as conn:
+        # `with conn` commits once at the end, or rolls everything back if a row fails
+        with conn:
+            cursor = conn.cursor()
+            # Writes are serialized, so nothing else can take this version before the bump below
+            version = cursor.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM event_versions").fetchone()[0]
+            if clear_query is not None:
+                cursor.executemany(clear_query, clear_rows)
+            cursor.executemany(query, [row + (version,) for row in rows] if versioned else rows)
+            written = cursor.rowcount
+            if event is not None:
+                cursor.execute(__BUMP_EVENT_VERSION_QUERY, (*event, version))
+            return written
+
+def store_match_scores(event_code: str, match_scores: list[dict], season: int = 2024) -> int:
+    """
+    Saves every match score from an event in one transaction. If we already have old data for a match, it will be overwritten.
+
+    Args:
+        event_code: the code of the event that these matches are part of
+        match_scores: the `matchScores` list obtained from the FTC Event API
         season: the year the event happened
     
-    Returns True if the operation succeeded, False if it failed.
+    Returns the number of rows inserted or changed (rows stored again unchanged don't count), or None if the operation failed.
     """
     if season != 2024:
         # Every year has a unique score format. Only 2024-2025 is supported for now.
-        return False
+        return None
     
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        allianceScores = score_data['alliances']
-        for alliance in ["Red", "Blue"]:
-            this_alliance: dict = next(filter(lambda allianceScore: allianceScore['alliance'] == alliance, allianceScores))
-
-            individual_alliance_keys = ['alliance', 'team', 'robot1Auto', 'robot2Auto', 'autoSampleNet', 'autoSampleLow', 'autoSampleHigh', 'autoSpecimenLow', 'autoSpecimenHigh', 'teleopSampleNet', 'teleopSampleLow', 'teleopSampleHigh', 'teleopSpecimenLow', 'teleopSpecimenHigh', 'robot1Teleop', 'robot2Teleop', 'minorFouls', 'majorFouls', 'autoSamplePoints', 'autoSpecimenPoints', 'teleopSamplePoints', 'teleopSpecimenPoints', 'teleopParkPoints', 'teleopAscentPoints', 'autoPoints', 'teleopPoints', 'endGamePoints', 'foulPointsCommitted', 'preFoulTotal', 'totalPoints']
-            individual_alliance_values = [this_alliance[key] for key in individual_alliance_keys]
-
-            query = f"INSERT OR REPLACE INTO scores (season, eventCode, matchLevel, matchSeries, matchNumber, {', '.join(individual_alliance_keys)}) VALUES (?, ?, ?, ?, ?, {', '.join(['?']*len(individual_alliance_keys))})"
+    rows = [(season, event_code, score_data["matchLevel"], score_data["matchSeries"], score_data["matchNumber"], *[alliance_score[key] for key in SCORE_KEYS_2024])
+            for score_data in match_scores
+            for alliance_score in score_data['alliances']
+            if alliance_score['alliance'] in ("Red", "Blue")]
+    
+    return __store_rows(__STORE_SCORE_QUERY, rows, event=(season, event_code), versioned=True)
 
-            cursor.execute(query,
-                           (season, event_code, score_data["matchLevel"], score_data["matchSeries"], score_data["matchNumber"], *individual_alliance_values))
+def store_matches(event_code: str, matches: list[dict], season: int = 2024) -> int:
+    """
+    Saves every match from an event in one transaction. If we already have old data for a match, it will be overwritten.
 
-            conn.commit()
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
+    Args:
+        event_code: the code of the event that these matches are part of
+        matches: the `matches` list obtained from the FTC Event API
+        season: the year the event happened
+    
+    Returns the number of rows inserted or changed (rows stored again unchanged don't count), or None if the operation failed.
+    """
+    if season != 2024:
+        # Every year has a unique score format. Only 2024-2025 is supported for now.
+        return None
     
-    return True
+    rows = [(season, event_code, team["teamNumber"], team["station"], team["dq"], team["onField"], api_time_to_epoch(match_data["actualStartTime"]), *[match_data[key] for key in MATCH_KEYS])
+            for match_data in matches
+            for team in match_data['teams']]
+    
+    return __store_rows(__STORE_MATCH_QUERY, rows, event=(season, event_code), versioned=True)
 
-def store_match(event_code: str, match_data: dict, season: int = 2024) -> bool:
+def store_scheduled_matches(event_code: str, scheduled_matches: list[dict], season: int = 2024) -> int:
     """
-    Saves latest match details. If we already have old data for the match, it will be overwritten.
+    Saves every scheduled match from an event in one transaction. If we already have old data for a match, it will be overwritten.
+    Bumps the event's version (see `get_event_versions`), so cached predictions for the event are recalculated.
 
     Args:
-        event_code: the code of the event that this match is part of
-        score_data: the dictionary storing the JSON data from a single match, obtained from the FTC Event API
+        event_code: the code of the event that these matches are part of
+        scheduled_matches: the `schedule` list obtained from the FTC Event API
         season: the year the event happened
     
-    Returns True if the operation succeeded, False if it failed.
+    Returns the number of rows inserted or updated, or None if the operation failed.
     """
     if season != 2024:
         # Every year has a unique score format. Only 2024-2025 is supported for now.
-        return False
+        return None
     
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        teams = match_data['teams']
+    clear_rows = [(season, event_code, match_data["tournamentLevel"], match_data["series"], match_data["matchNumber"]) for match_data in scheduled_matches]
+    rows = [(season, event_code, team["teamNumber"], team["displayTeamNumber"], team["station"], team["team"], team["teamName"], team["surrogate"], team["noShow"], *[match_data[key] for key in SCHEDULE_KEYS])
+            for match_data in scheduled_matches
+            for team in match_data['teams']]
+    
+    return __store_rows(__STORE_SCHEDULE_QUERY, rows, clear_query=__CLEAR_SCHEDULE_QUERY, clear_rows=clear_rows, event=(season, event_code))
 
-        match_keys = ["actualStartTime","description","tournamentLevel","series","matchNumber","scoreRedFinal","scoreRedFoul","scoreRedAuto","scoreBlueFinal","scoreBlueFoul","scoreBlueAuto","postResultTime","modifiedOn"]
-        match_values = [match_data[key] for key in match_keys]
+def store_match_score(event_code: str, score_data: dict, season: int = 2024) -> bool:
+    """
+    Saves latest match score details. If we already have old data for the match, it will be overwritten.
 
-        for team in teams:
-            query = f"INSERT OR REPLACE INTO matches (season, eventCode, teamNumber, station, dq, onField, {', '.join(match_keys)}) VALUES (?, ?, ?, ?, ?, ?, {', '.join(['?']*len(match_keys))})"
+    Args:
+        event_code: the code of the event that this match is part of
+        score_data: the dictionary storing the JSON data from a single match, obtained from the FTC Event API
+        season: the year the event happened
+    
+    Returns True if the operation succeeded, False if it failed.
+    """
+    return store_match_scores(event_code, [score_data], season=season) is not None
 
-            cursor.execute(query,
-                           (season, event_code, team["teamNumber"], team["station"], team["dq"], team["onField"], *match_values))
+def store_match(event_code: str, match_data: dict, season: int = 2024) -> bool:
+    """
+    Saves latest match details. If we already have old data for the match, it will be overwritten.
 
-            conn.commit()
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
+    Args:
+        event_code: the code of the event that this match is part of
+        match_data: the dictionary storing the JSON data from a single match, obtained from the FTC Event API
+        season: the year the event happened
     
-    return True
+    Returns True if the operation succeeded, False if it failed.
+    """
+    return store_matches(event_code, [match_data], season=season) is not None
 
 def store_new_team(name: str, number: int, created_by_id: int) -> Team:
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
+    with writing() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
         cursor.execute("SELECT * FROM teams WHERE team_number=?", (number,))
         existing_user = cursor.fetchone()
@@ -204,9 +424,6 @@ def store_new_team(name: str, number: int, created_by_id: int) -> Team:
         cursor.execute("UPDATE users SET team_id=?, team_role=1 WHERE rowid=?", (team_id, created_by_id,))
         conn.commit()
         return {'id': cursor.lastrowid, 'name': name, 'code': code}
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
 
 def store_scheduled_match(event_code: str, scheduled_match_data: dict, season: int = 2024) -> bool:
     """
@@ -214,44 +431,205 @@ def store_scheduled_match(event_code: str, scheduled_match_data: dict, season: i
 
     Args:
         event_code: the code of the event that this match is part of
-        score_data: the dictionary storing the JSON data from a single scheduled match, obtained from the FTC Event API
+        scheduled_match_data: the dictionary storing the JSON data from a single scheduled match, obtained from the FTC Event API
         season: the year the event happened
     
     Returns True if the operation succeeded, False if it failed.
     """
-    if season != 2024:
-        # Every year has a unique score format. Only 2024-2025 is supported for now.
-        return False
-    
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
+    return store_scheduled_matches(event_code, [scheduled_match_data], season=season) is not None
+
+def get_crawled_events(season: int = 2024) -> set[str]:
+    """
+    Returns the codes of every event a season crawl has already finished caching.
+    """
+
+    with reading() as conn:
         cursor = conn.cursor()
-        teams = scheduled_match_data['teams']
+        cursor.execute("SELECT eventCode FROM crawl_checkpoints WHERE season=?", (season,))
+        return {row[0] for row in cursor.fetchall()}
 
-        scheduled_match_keys = ["description","field","tournamentLevel","startTime","series","matchNumber","modifiedOn"]
-        scheduled_match_values = [scheduled_match_data[key] for key in scheduled_match_keys]
+def mark_event_crawled(event_code: str, season: int = 2024):
+    """
+    Records that a season crawl has finished caching an event.
+    """
 
-        for team in teams:
-            query = f"INSERT OR REPLACE INTO schedule (season, eventCode, teamNumber, displayTeamNumber, station, team, teamName, surrogate, noShow, {', '.join(scheduled_match_keys)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {', '.join(['?']*len(scheduled_match_keys))})"
+    with writing() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO crawl_checkpoints (season, eventCode) VALUES (?, ?)", (season, event_code))
+        conn.commit()
 
-            cursor.execute(query,
-                           (season, event_code, team["teamNumber"], team["displayTeamNumber"], team["station"], team["team"], team["teamName"], team["surrogate"], team["noShow"], *scheduled_match_values))
+def clear_crawl_checkpoints(season: int = 2024):
+    """
+    Forgets crawl progress for a season, so the next crawl starts over.
+    """
 
-            conn.commit()
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
-    
-    return True
+    with writing() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM crawl_checkpoints WHERE season=?", (season,))
+        conn.commit()
+
+def get_sync_state(event_code: str, season: int = 2024) -> dict[str, tuple[str, str]]:
+    """
+    Returns what an incremental sync last saw for every endpoint of an event.
+
+    Returns a dictionary where key = endpoint (e.g. matches, scores/qual) and value = a tuple (Last-Modified header, latest modifiedOn).
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT endpoint, lastModified, watermark FROM sync_state WHERE season=? AND eventCode=?", (season, event_code))
+        return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+def set_sync_state(event_code: str, endpoint: str, last_modified: str, watermark: str, season: int = 2024):
+    """
+    Records what an incremental sync saw for one endpoint of an event.
+
+    Args:
+        event_code: the event that was synced
+        endpoint: the endpoint that was synced (e.g. matches, scores/qual)
+        last_modified: the Last-Modified header the API sent back, used for the next conditional request
+        watermark: the latest modifiedOn among the rows we received
+        season: the year the event happened
+    """
+
+    with writing() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO sync_state (season, eventCode, endpoint, lastModified, watermark, synced_at) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                       (season, event_code, endpoint, last_modified, watermark))
+        conn.commit()
+
+def get_synced_events(season: int = 2024) -> set[str]:
+    """
+    Returns the codes of every event an incremental sync has fully synced at least once.
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT eventCode FROM sync_state WHERE season=? AND endpoint='event'", (season,))
+        return {row[0] for row in cursor.fetchall()}
+
+def get_modified_times(table: str, event_code: str, season: int = 2024) -> dict[tuple[str, int, int], str]:
+    """
+    Returns the stored modifiedOn of every match at an event.
+
+    Args:
+        table: either matches or schedule
+        event_code: the event to look at
+        season: the year the event happened
+
+    Returns a dictionary where key = (tournament level, series, match number) and value = modifiedOn.
+    """
+    if table not in ("matches", "schedule"):
+        raise ValueError(f"{table} has no modifiedOn column")
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT DISTINCT tournamentLevel, series, matchNumber, modifiedOn FROM {table} WHERE season=? AND eventCode=?", (season, event_code))
+        return {(level, int(series), int(number)): modified_on for (level, series, number, modified_on) in cursor.fetchall()}
+
+def get_scored_matches(event_code: str, season: int = 2024) -> set[tuple[str, int, int]]:
+    """
+    Returns (match level, series, match number) of every match at an event that has scores stored.
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT matchLevel, matchSeries, matchNumber FROM scores WHERE season=? AND eventCode=?", (season, event_code))
+        return set(cursor.fetchall())
+
+def get_event_versions(season: int = 2024, since: int = 0) -> dict[str, int]:
+    """
+    Returns the events whose matches, scores or schedule were written after version `since`.
+
+    Args:
+        season: the year to look at
+        since (optional): the newest version already seen, 0 returns every event
+
+    Returns a dictionary where key = event code and value = the event's current version.
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT eventCode, version FROM event_versions WHERE season=? AND version>?", (season, since))
+        return dict(cursor.fetchall())
+
+def get_event_version(event_code: str, season: int = 2024) -> int:
+    """
+    Returns an event's current version (see `get_event_versions`), or 0 if nothing has been written for it.
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM event_versions WHERE season=? AND eventCode=?", (season, event_code))
+        row = cursor.fetchone()
+        return row[0] if row is not None else 0
+
+def get_scheduled_matches(event_code: str, season: int = 2024) -> list[dict]:
+    """
+    Retrieves every scheduled match at an event, in start time order.
+
+    Args:
+        event_code: the event code for matches to be retrieved
+        season: the season the event happened in
+
+    Returns a list of dictionaries, one per match, with:
+        level, series, number: identify the match like the scores table (e.g. ("QUALIFICATION", 0, 12))
+        description: e.g. Qualification 12
+        start_time: the scheduled start time in epoch seconds, or None if unknown
+        red, blue: the teams scheduled on each alliance (no-shows left out)
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT tournamentLevel, series, matchNumber, description, startTime, teamNumber, station, noShow FROM schedule WHERE season=? AND eventCode=?", (season, event_code))
+
+        matches = {}
+        for (level, series, number, description, start_time, team_number, station, no_show) in cursor:
+            match_id = (level, int(series), int(number))
+            match = matches.get(match_id)
+            if match is None:
+                match = matches[match_id] = {"level": level, "series": int(series), "number": int(number), "description": description,
+                                             "start_time": api_time_to_epoch(start_time or None), "red": [], "blue": []}
+            alliance = match.get((station or "")[:-1].lower())
+            if alliance is not None and team_number is not None and not no_show and team_number not in alliance:
+                alliance.append(team_number)
+
+    # Unknown start times last
+    return sorted(matches.values(), key=lambda match: (match["start_time"] is None, match["start_time"] or 0, match["level"], match["series"], match["number"]))
+
+def has_season(season: int) -> bool:
+    """
+    Returns True if at least one match is stored for a season.
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM matches WHERE season=? LIMIT 1", (season,))
+        return cursor.fetchone() is not None
+
+def get_row_counts(season: int = 2024) -> dict[str, int]:
+    """
+    Counts the rows `get_match_teams` and `get_match_score_columns` would read for a whole season, for progress reporting.
+
+    Returns a dictionary where key = table (matches or scores) and value = its number of rows in the season.
+    """
+
+    with reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM matches WHERE season=? AND startTimestamp IS NOT NULL", (season,))
+        matches = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM scores WHERE season=?", (season,))
+        return {"matches": matches, "scores": cursor.fetchone()[0]}
 
 class MatchKey:
-    event_code: str
-    match_level: str
-    match_series: int
-    match_number: int
-    alliance: str
-    season: int = 2024
+    """
+    Identifies one alliance's side of a match. Keys are used as dictionary keys millions of times during
+    EPA replay, so they are slotted, their hash is computed once, and the opposite alliance's key is cached.
+
+    Keys must not be modified after they are created (that would change their hash).
+    `start_time` is extra information and isn't part of the key's identity.
+    """
+    __slots__ = ("event_code", "match_level", "match_series", "match_number", "alliance", "season", "start_time", "__hash", "__opposite")
 
     def __init__(self, event_code: str, match_level: str, match_series: int, match_number: int, alliance: str, season: int = 2024, start_time: float = None):
         self.event_code = event_code
@@ -261,93 +639,299 @@ class MatchKey:
         self.alliance = alliance
         self.season = season
         self.start_time = start_time
+        self.__hash = hash((event_code, match_level, match_series, match_number, alliance, season))
+        self.__opposite = None
 
     def __repr__(self) -> str:
         return f'MatchKey(event_code="{self.event_code}", match_level="{self.match_level}", match_series={self.match_series}, match_number={self.match_number}, alliance="{self.alliance}", season={self.season})'
     
     def __hash__(self) -> int:
-        return self.__repr__().__hash__()
+        return self.__hash
     
     def __eq__(self, other) -> bool:
-        return self.__hash__() == other.__hash__()
+        if self is other:
+            return True
+        if not isinstance(other, MatchKey) or self.__hash != other.__hash:
+            return False
+        # Equal hashes can still collide, so compare every field
+        return (self.match_number == other.match_number and self.alliance == other.alliance and self.event_code == other.event_code
+                and self.match_level == other.match_level and self.match_series == other.match_series and self.season == other.season)
+
+    def __getstate__(self):
+        # The cached opposite key is left out so copies and pickles don't drag it along
+        return (self.event_code, self.match_level, self.match_series, self.match_number, self.alliance, self.season, self.start_time)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def opposite(self) -> "MatchKey":
+        """
+        Returns the key of the other alliance in the same match. It is created on the first call and reused afterwards.
+        """
+        if self.__opposite is None:
+            MatchKey.pair(self, MatchKey(self.event_code, self.match_level, self.match_series, self.match_number,
+                                         "Blue" if self.alliance == "Red" else "Red", season=self.season, start_time=self.start_time))
+        return self.__opposite
+
+    @staticmethod
+    def pair(key: "MatchKey", opposite: "MatchKey"):
+        """
+        Records that two existing keys are the two alliances of the same match, so `opposite()` never has to create one.
+        """
+        key.__opposite = opposite
+        opposite.__opposite = key
 
 SCORE_FIELDS_2024 = ['robot1Auto', 'robot2Auto', 'autoSampleNet', 'autoSampleLow', 'autoSampleHigh', 'autoSpecimenLow', 'autoSpecimenHigh', 'teleopSampleNet', 'teleopSampleLow', 'teleopSampleHigh', 'teleopSpecimenLow', 'teleopSpecimenHigh', 'robot1Teleop', 'robot2Teleop', 'minorFouls', 'majorFouls', 'autoSamplePoints', 'autoSpecimenPoints', 'teleopSamplePoints', 'teleopSpecimenPoints', 'teleopParkPoints', 'teleopAscentPoints', 'autoPoints', 'teleopPoints', 'endGamePoints', 'foulPointsCommitted', 'preFoulTotal', 'totalPoints']
 
-def get_match_scores(event_code: str = None, season: int = 2024) -> dict[MatchKey, dict[str, Any]]:
+# The score fields that hold text (where each robot parked) rather than numbers
+TEXT_SCORE_FIELDS_2024 = ['robot1Auto', 'robot2Auto', 'robot1Teleop', 'robot2Teleop']
+NUMERIC_SCORE_FIELDS_2024 = [field for field in SCORE_FIELDS_2024 if field not in TEXT_SCORE_FIELDS_2024]
+
+class ScoreColumns:
+    """
+    Score statistics for a set of alliance-matches, stored column by column.
+
+    Row i holds the scores of `keys[i]`. Every numeric field is a contiguous int32 array (a row of `numeric`),
+    and every text field is stored as int8 codes into a short list of categories.
+
+    Attributes:
+        keys: the MatchKey of every row
+        index: dictionary where key = MatchKey and value = its row
+        match_ids: int32 array identifying the match of every row (both alliances of a match share an id)
+        is_red: bool array, True if the row belongs to the red alliance
+        numeric: int32 array of shape (len(NUMERIC_SCORE_FIELDS_2024), rows)
+    """
+
+    def __init__(self, keys: list[MatchKey], numeric: np.ndarray, text: dict[str, tuple[np.ndarray, np.ndarray]]):
+        self.keys = keys
+        self.index = {key: row for (row, key) in enumerate(keys)}
+        self.numeric = numeric
+        self.__text = text
+        self.__field_rows = {field: i for (i, field) in enumerate(NUMERIC_SCORE_FIELDS_2024)}
+
+        match_numbers = {}
+        self.match_ids = np.array([match_numbers.setdefault((k.event_code, k.match_level, k.match_series, k.match_number), len(match_numbers)) for k in keys], dtype=np.int32)
+        self.is_red = np.array([k.alliance == "Red" for k in keys], dtype=np.bool_)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def column(self, field: str) -> np.ndarray:
+        """
+        Returns every row's value of a score field (e.g. totalPoints) as a NumPy array.
+        """
+        if field in self.__field_rows:
+            return self.numeric[self.__field_rows[field]]
+        (categories, codes) = self.__text[field]
+        return categories[codes]
+
+    def value(self, field: str, row: int) -> Any:
+        """
+        Returns a single score field of a single row as a plain Python value.
+        """
+        if field in self.__field_rows:
+            return int(self.numeric[self.__field_rows[field], row])
+        (categories, codes) = self.__text[field]
+        return str(categories[codes[row]])
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes used by the score arrays (not counting the keys).
+        """
+        return self.numeric.nbytes + self.match_ids.nbytes + self.is_red.nbytes + sum(categories.nbytes + codes.nbytes for (categories, codes) in self.__text.values())
+
+class ScoreRow(Mapping):
+    """
+    A read-only dictionary view of one row of a ScoreColumns, where key = statistic and value = its value.
+    """
+
+    def __init__(self, columns: ScoreColumns, row: int):
+        self.__columns = columns
+        self.__row = row
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in SCORE_FIELDS_2024:
+            raise KeyError(field)
+        return self.__columns.value(field, self.__row)
+
+    def __iter__(self):
+        return iter(SCORE_FIELDS_2024)
+
+    def __len__(self) -> int:
+        return len(SCORE_FIELDS_2024)
+
+class ScoreView(Mapping):
+    """
+    A read-only dictionary view of a ScoreColumns, where key = MatchKey and value = a ScoreRow.
+    """
+
+    def __init__(self, columns: ScoreColumns):
+        self.columns = columns
+
+    def __getitem__(self, key: MatchKey) -> ScoreRow:
+        return ScoreRow(self.columns, self.columns.index[key])
+
+    def __contains__(self, key) -> bool:
+        return key in self.columns.index
+
+    def __iter__(self):
+        return iter(self.columns.keys)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+# How many rows the season loaders read between progress callbacks
+PROGRESS_ROWS = 10000
+
+def __changed_matches(scope: str, params: tuple, since: int) -> tuple[str, tuple]:
+    """
+    Builds a subquery for the matches, as (event code, level, series, number), with a match or score row written after
+    an event version (see `__versioned_insert`).
+
+    Args:
+        scope: the condition on season (and event code) both tables are filtered with
+        params: the parameters for `scope`
+        since: the event version, only rows with a newer one count
+
+    Returns (the subquery, its parameters).
+    """
+    return (f"(SELECT eventCode, tournamentLevel, series, matchNumber FROM matches WHERE {scope} AND version>? "
+            f"UNION SELECT eventCode, matchLevel, matchSeries, matchNumber FROM scores WHERE {scope} AND version>?)", (*params, since, *params, since))
+
+def get_match_score_columns(event_code: str = None, season: int = 2024, progress: Callable[[int], None] = None, since: int = None) -> ScoreColumns:
+    """
+    Gets all score statistics from every match at the event (or the whole season) as NumPy columns.
+
+    Args:
+        event_code: the event code for matches to be retrieved, or None for every event in the season
+        season: the season the event happened in
+        progress (optional): called with the number of rows read so far, every PROGRESS_ROWS rows
+        since (optional): an event version (see `get_event_versions`), to read only the matches that changed after it
+                          (both alliances of any match with a match or score row written since)
+    
+    Returns a ScoreColumns, which is empty if there was an error.
+    """
+
+    # Both queries walk the primary key, so they return rows in the same order
+    scope = "season=?" if event_code == None else "eventCode=? AND season=?"
+    params = (season,) if event_code == None else (event_code, season)
+    where = f"WHERE {scope}"
+    if since is not None:
+        (changed, changed_params) = __changed_matches(scope, params, since)
+        (where, params) = (f"{where} AND (eventCode, matchLevel, matchSeries, matchNumber) IN {changed}", params + changed_params)
+    order = "ORDER BY season, eventCode, matchLevel, matchSeries, matchNumber, alliance"
+
+    with reading() as conn:
+        try:
+            # Read both queries from the same snapshot, in case an ingest lands in between
+            conn.execute("BEGIN")
+            # The numeric fields are fetched on their own so NumPy can convert them in one go
+            numeric = np.array(conn.execute(f"SELECT {', '.join(NUMERIC_SCORE_FIELDS_2024)} FROM scores {where} {order}", params).fetchall(), dtype=np.int32)
+            cursor = conn.execute(f"SELECT eventCode, matchLevel, matchSeries, matchNumber, alliance, {', '.join(TEXT_SCORE_FIELDS_2024)} FROM scores {where} {order}", params)
+            if progress is None:
+                rows = cursor.fetchall()
+            else:
+                rows = []
+                while chunk := cursor.fetchmany(PROGRESS_ROWS):
+                    rows.extend(chunk)
+                    progress(len(rows))
+            conn.commit()
+        except Exception as e:
+            print(e)
+            conn.rollback()
+            numeric = np.zeros((0, len(NUMERIC_SCORE_FIELDS_2024)), dtype=np.int32)
+            rows = []
+
+    keys = [MatchKey(event_code, match_level, match_series, match_number, alliance, season=season) for (event_code, match_level, match_series, match_number, alliance, *_) in rows]
+    # One contiguous row per field, so each column is a contiguous array
+    numeric = numeric.reshape(len(rows), len(NUMERIC_SCORE_FIELDS_2024)).T.copy()
+
+    text = {}
+    for (field, values) in zip(TEXT_SCORE_FIELDS_2024, list(zip(*rows))[5:] if rows else [()] * len(TEXT_SCORE_FIELDS_2024)):
+        categories = sorted(set(values))
+        lookup = {category: code for (code, category) in enumerate(categories)}
+        text[field] = (np.array(categories, dtype=str), np.array([lookup[value] for value in values], dtype=np.int8))
+
+    return ScoreColumns(keys, numeric, text)
+
+def get_match_scores(event_code: str = None, season: int = 2024) -> Mapping[MatchKey, Mapping[str, Any]]:
     """
     Gets all score statistics from every match at the event for the given season.
 
+    This is a dictionary-like view over `get_match_score_columns`; use that directly for whole columns.
+
     Args:
         event_code: the event code for matches to be retrieved
         season: the season the event happened in
     
-    Returns a dictionary storing match statistics, or an empty dictionary if there was an error.
+    Returns a read-only dictionary storing match statistics, or an empty one if there was an error.
         Key: a MatchKey
-        Value: dictionary where key = statistic (from FTC event API) and value = its value
+        Value: dictionary where key = statistic (from FTC Event API) and value = its value
     """
+    return ScoreView(get_match_score_columns(event_code=event_code, season=season))
 
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        if event_code == None:
-            query = f"SELECT eventCode, matchLevel, matchSeries, matchNumber, alliance, {', '.join(SCORE_FIELDS_2024)} FROM scores WHERE season=?"
-            cursor.execute(query, (season,))
-        else:
-            query = f"SELECT eventCode, matchLevel, matchSeries, matchNumber, alliance, {', '.join(SCORE_FIELDS_2024)} FROM scores WHERE eventCode=? AND season=?"
-            cursor.execute(query, (event_code, season))
-
-        scores = cursor.fetchall()
-
-        return {MatchKey(event_code=score[0], match_level=score[1], match_series=score[2], match_number=score[3], alliance=score[4], season=season): {SCORE_FIELDS_2024[i]: score[5+i] for i in range(len(SCORE_FIELDS_2024))} for score in scores}
-    except Exception as e:
-        print(e)
-        return {}
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
-
-def get_match_teams(event_code: str = None, season: int = 2024) -> dict[MatchKey, dict[int, tuple[str, bool]]]:
+def get_match_teams(event_code: str = None, season: int = 2024, progress: Callable[[int], None] = None, since: int = None) -> dict[MatchKey, dict[int, tuple[str, bool]]]:
     """
-    Retrieves teams playing in each match.
+    Retrieves teams playing in each match that has been played, in start time order.
 
     Args:
         event_code: the event code for matches to be retrieved
         season: the season the event happened in
+        progress (optional): called with the number of rows read so far, every PROGRESS_ROWS rows
+        since (optional): an event version (see `get_event_versions`), to read only the matches that changed after it
+                          (every team of any match with a match or score row written since)
     
     Returns a dictionary storing teams playing in each match, or an empty dictionary if there was an error.
-        Key: a MatchKey
+        Key: a MatchKey (start_time is in epoch seconds)
         Value: dictionary where the key is the team number and the value is a tuple (station, on_field)
     """
 
-    # Grab a connection from the pool
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        if event_code == None:
-            query = f"SELECT eventCode, tournamentLevel, series, matchNumber, teamNumber, station, onField, actualStartTime FROM matches WHERE season=? ORDER BY DATETIME(actualStartTime)"
-            cursor.execute(query, (season,))
-        else:
-            query = f"SELECT eventCode, tournamentLevel, series, matchNumber, teamNumber, station, onField, actualStartTime FROM matches WHERE eventCode=? AND season=? ORDER BY DATETIME(actualStartTime)"
-            cursor.execute(query, (event_code, season))
-
-        matches = cursor.fetchall()
-
-        # note: match start time is in local time zone :/
-        individual_dicts = [{MatchKey(event_code, match_level, match_series, match_number, alliance=station[:-1], season=season, start_time=time.mktime(time.strptime(actualStartTime if "." not in actualStartTime else actualStartTime[:actualStartTime.index(".")], "%Y-%m-%dT%H:%M:%S"))): {team_number: (station, on_field)}}
-                            for (event_code, match_level, match_series, match_number, team_number, station, on_field, actualStartTime) in matches]
-        
-        return reduce(lambda current_dict, new_dict: merge_with(merge_left, current_dict, new_dict), individual_dicts)
-    except Exception as e:
-        print(e)
-        return {}
-    finally:
-        # Release the connection back to the pool
-        release_connection(conn)
+    with reading() as conn:
+        try:
+            cursor = conn.cursor()
+            # Ordered by match and station, which walks the matches_teams index without sorting, so each alliance's
+            # rows arrive together and the two alliances of a match arrive one after the other
+            scope = "season=?" if event_code == None else "eventCode=? AND season=?"
+            params = (season,) if event_code == None else (event_code, season)
+            where = f"{scope} AND startTimestamp IS NOT NULL"
+            if since is not None:
+                (changed, changed_params) = __changed_matches(scope, params, since)
+                (where, params) = (f"{where} AND (eventCode, tournamentLevel, series, matchNumber) IN {changed}", params + changed_params)
+            query = f"SELECT eventCode, tournamentLevel, series, matchNumber, station, teamNumber, onField, startTimestamp FROM matches WHERE {where} ORDER BY eventCode, tournamentLevel, series, matchNumber, station"
+            cursor.execute(query, params)
+
+            # Group rows in a single pass over the cursor: a new alliance starts whenever the match or alliance changes
+            alliances = []
+            (previous, previous_key, teams) = (None, None, None)
+            read = 0
+            while chunk := cursor.fetchmany(PROGRESS_ROWS):
+                for (event_code, match_level, match_series, match_number, station, team_number, on_field, start_time) in chunk:
+                    alliance = (event_code, match_level, match_series, match_number, station[:-1])
+                    if alliance != previous:
+                        key = MatchKey(*alliance, season=season, start_time=start_time)
+                        # Link both alliances of a match so MatchKey.opposite() doesn't allocate
+                        if previous is not None and alliance[:4] == previous[:4]:
+                            MatchKey.pair(key, previous_key)
+                        teams = {}
+                        alliances.append((start_time, key, teams))
+                        (previous, previous_key) = (alliance, key)
+                    # Keep the first row if a team shows up twice in the same match
+                    if team_number not in teams:
+                        teams[team_number] = (station, on_field)
+                read += len(chunk)
+                if progress is not None:
+                    progress(read)
+
+            # Stable, so matches that start together stay in match order
+            alliances.sort(key=operator.itemgetter(0))
+            return {key: teams for (_, key, teams) in alliances}
+        except Exception as e:
+            print(e)
+            return {}
 
 def get_user_team(user_id: int) -> UserTeam:
-    conn = get_connection()
-    try:
+    with reading() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT u.team_id, t.name AS team_name, u.team_role, t.team_code, t.notes FROM users u INNER JOIN teams t ON u.team_id = t.rowid WHERE u.rowid = ?;", (user_id,))
         team = cursor.fetchone()
@@ -356,42 +940,31 @@ def get_user_team(user_id: int) -> UserTeam:
             return None 
         
         return {'id': team[0], 'name': team[1], 'role': team[2], 'code': team[3], 'notes': team[4]}
-    finally: 
-        release_connection(conn)
 
 def update_team(team: Team) -> bool:
-    conn = get_connection()
-    try:
+    with writing() as conn:
         cursor = conn.cursor()
         print(team['name'])
         cursor.execute("UPDATE teams SET name=? WHERE rowid=?", (team['name'], team['id'],))
         conn.commit()
 
         return True 
-    finally:
-        release_connection(conn)
 
 def remove_user(user_id: int) -> bool:
-    conn = get_connection()
-    try:
+    with writing() as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET team_id = NULL, team_role = NULL WHERE rowid=?", (user_id, ))
         conn.commit()
 
         return True 
-    finally:
-        release_connection(conn)
 
 def add_user(team: Team, email: str) -> bool:
-    conn = get_connection()
-    try:
+    with writing() as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET team_id = ?, team_role = 0 WHERE email=?", (team['id'], email, ))
         conn.commit()
 
         return True 
-    finally:
-        release_connection(conn)     
         
 def add_user_to_team(team_id: int, user_id: int) -> bool:
     """
@@ -404,32 +977,29 @@ def add_user_to_team(team_id: int, user_id: int) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    conn = get_connection()
-    try:
-        # Check if user already has a team
-        cursor = conn.cursor()
-        cursor.execute("SELECT team_id FROM users WHERE rowid=?", (user_id,))
-        user_data = cursor.fetchone()
+    with writing() as conn:
+        try:
+            # Check if user already has a team
+            cursor = conn.cursor()
+            cursor.execute("SELECT team_id FROM users WHERE rowid=?", (user_id,))
+            user_data = cursor.fetchone()
         
-        if user_data and user_data[0] is not None:
-            # User already has a team
-            return False
+            if user_data and user_data[0] is not None:
+                # User already has a team
+                return False
             
-        cursor.execute("UPDATE users SET team_id = ?, team_role = 0 WHERE rowid=?", (team_id, user_id))
-        conn.commit()
-        return cursor.rowcount > 0
-    except Exception as e:
-        print(f"Error adding user to team: {e}")
-        return False
-    finally:
-        release_connection(conn)
+            cursor.execute("UPDATE users SET team_id = ?, team_role = 0 WHERE rowid=?", (team_id, user_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Error adding user to team: {e}")
+            return False
 
 def get_user_by_id(user_id) -> UserTeam:
     """
     Get full user information from the database by ID
     """
-    conn = get_connection()
-    try:
+    with reading() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT rowid, name, email, team_id, team_role FROM users WHERE rowid=?", (user_id,))
         user_data = cursor.fetchone()
@@ -448,169 +1018,140 @@ def get_user_by_id(user_id) -> UserTeam:
             "email": user_data[2],
             "team": user_team
         }
-    finally:
-        release_connection(conn)
 
 def get_event_codes() -> list[str]:
     """
     Returns a list of all events for which matches are stored.
     """
 
-    conn = get_connection()
+    with reading() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT eventCode FROM scores;")
+            event_codes = cursor.fetchall()
+            return list(map(lambda t: t[0], event_codes))
+        except:
+            return []
 
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT eventCode FROM scores;")
-        event_codes = cursor.fetchall()
-        return list(map(lambda t: t[0], event_codes))
-    
-    except:
-        return []
-    
 def get_team_by_code(team_code: str) -> dict:
     """
     Returns a team with the given team code.
     """
 
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT rowid, name, team_code, team_number FROM teams WHERE team_code=?", (team_code,))
-        team = cursor.fetchone()
+    with reading() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT rowid, name, team_code, team_number FROM teams WHERE team_code=?", (team_code,))
+            team = cursor.fetchone()
         
-        if team is None:
-            return None
+            if team is None:
+                return None
             
-        return {
-            'id': team[0],
-            'name': team[1],
-            'code': team[2],
-            'number': team[3]
-        }
-    except Exception as e:
-        print(f"Error finding team by code: {e}")
-        return None
-    finally:
-        release_connection(conn)
+            return {
+                'id': team[0],
+                'name': team[1],
+                'code': team[2],
+                'number': team[3]
+            }
+        except Exception as e:
+            print(f"Error finding team by code: {e}")
+            return None
 
 def promote_user(user_id: int, promoter_id: int):
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        # First check if user is in the same team as admin
-        cursor.execute("""
-            SELECT u.rowid, u.team_id 
-            FROM users u 
-            INNER JOIN users admin 
-            ON u.team_id = admin.team_id 
-            WHERE u.rowid = ? AND admin.rowid = ?
-        """, (user_id, promoter_id))
+    with writing() as conn:
+        try:
+            cursor = conn.cursor()
+            # First check if user is in the same team as admin
+            cursor.execute("""
+                SELECT u.rowid, u.team_id 
+                FROM users u 
+                INNER JOIN users admin 
+                ON u.team_id = admin.team_id 
+                WHERE u.rowid = ? AND admin.rowid = ?
+            """, (user_id, promoter_id))
         
-        user_data = cursor.fetchone()
-        if not user_data:
-            return None
+            user_data = cursor.fetchone()
+            if not user_data:
+                return None
         
-        # Promote the user to admin (role=1)
-        cursor.execute("UPDATE users SET team_role = 1 WHERE rowid = ?", (user_id,))
-        conn.commit()
-    except Exception as e:
-        print(f"Error promoting user: {e}")
-    finally:
-        release_connection(conn)
-
-def get_event_codes() -> list[str]:
-    """
-    Returns a list of all events for which matches are stored.
-    """
-
-    conn = get_connection()
-
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT eventCode FROM scores;")
-        event_codes = cursor.fetchall()
-        return list(map(lambda t: t[0], event_codes))
-    
-    except:
-        return []
+            # Promote the user to admin (role=1)
+            cursor.execute("UPDATE users SET team_role = 1 WHERE rowid = ?", (user_id,))
+            conn.commit()
+        except Exception as e:
+            print(f"Error promoting user: {e}")
 
-    
 def get_team_members(user_id: int) -> list[dict]:
     """
     Returns a list of all members in the same team as the given user.
     """
 
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
+    with reading() as conn:
+        try:
+            cursor = conn.cursor()
         
-        # First, get the user's team_id
-        cursor.execute("SELECT team_id FROM users WHERE rowid=?", (user_id,))
-        result = cursor.fetchone()
+            # First, get the user's team_id
+            cursor.execute("SELECT team_id FROM users WHERE rowid=?", (user_id,))
+            result = cursor.fetchone()
         
-        if not result or result[0] is None:
-            # User is not in a team
-            return []
+            if not result or result[0] is None:
+                # User is not in a team
+                return []
             
-        team_id = result[0]
+            team_id = result[0]
         
-        # Get all members of that team
-        cursor.execute("""
-            SELECT rowid, name, email, team_role 
-            FROM users 
-            WHERE team_id=? 
-            ORDER BY team_role DESC, name
-        """, (team_id,))
+            # Get all members of that team
+            cursor.execute("""
+                SELECT rowid, name, email, team_role 
+                FROM users 
+                WHERE team_id=? 
+                ORDER BY team_role DESC, name
+            """, (team_id,))
         
-        members = cursor.fetchall()
+            members = cursor.fetchall()
         
-        # Convert to list of dictionaries
-        return [
-            {
-                "id": member[0],
-                "name": member[1],
-                "email": member[2],
-                "role": member[3]  # 0: regular member, 1: admin
-            } 
-            for member in members
-        ]
+            # Convert to list of dictionaries
+            return [
+                {
+                    "id": member[0],
+                    "name": member[1],
+                    "email": member[2],
+                    "role": member[3]  # 0: regular member, 1: admin
+                } 
+                for member in members
+            ]
         
-    except Exception as e:
-        print(f"Error getting team members: {e}")
-        return []
-    finally:
-        release_connection(conn)
+        except Exception as e:
+            print(f"Error getting team members: {e}")
+            return []
 
 def promote_user_to_admin(user_id: int, admin_id: int) -> bool:
     """
     Promotes a user to admin role within their team
     """
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
+    with writing() as conn:
+        try:
+            cursor = conn.cursor()
         
-        # First check if both users are in the same team and admin has admin privileges
-        cursor.execute("""
-            SELECT u.rowid, u.team_id, a.team_id, a.team_role
-            FROM users u
-            JOIN users a ON u.team_id = a.team_id
-            WHERE u.rowid = ? AND a.rowid = ? AND a.team_role = 1
-        """, (user_id, admin_id))
+            # First check if both users are in the same team and admin has admin privileges
+            cursor.execute("""
+                SELECT u.rowid, u.team_id, a.team_id, a.team_role
+                FROM users u
+                JOIN users a ON u.team_id = a.team_id
+                WHERE u.rowid = ? AND a.rowid = ? AND a.team_role = 1
+            """, (user_id, admin_id))
         
-        result = cursor.fetchone()
-        if not result:
-            # Either users aren't in the same team or requestor isn't an admin
-            return False
+            result = cursor.fetchone()
+            if not result:
+                # Either users aren't in the same team or requestor isn't an admin
+                return False
             
-        # Update the user's role to admin
-        cursor.execute("UPDATE users SET team_role = 1 WHERE rowid = ?", (user_id,))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error promoting user: {e}")
-        return False
-    finally:
-        release_connection(conn)
+            # Update the user's role to admin
+            cursor.execute("UPDATE users SET team_role = 1 WHERE rowid = ?", (user_id,))
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error promoting user: {e}")
+            return False
 
 def append_notes(team_id: int, notes: str) -> bool:
     """
@@ -618,33 +1159,31 @@ def append_notes(team_id: int, notes: str) -> bool:
     """
 
 
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
+    with writing() as conn:
+        try:
+            cursor = conn.cursor()
         
-        # First check if both users are in the same team and admin has admin privileges
-        cursor.execute("""
-            SELECT notes FROM teams WHERE rowid=?
-        """, (team_id,))
+            # First check if both users are in the same team and admin has admin privileges
+            cursor.execute("""
+                SELECT notes FROM teams WHERE rowid=?
+            """, (team_id,))
         
-        result = cursor.fetchone()
-        if not result:
-            # Smth is up
-            return False
+            result = cursor.fetchone()
+            if not result:
+                # Smth is up
+                return False
         
-        existing_notes = ""
-        if result[0] is not None:
-            existing_notes = result[0]
+            existing_notes = ""
+            if result[0] is not None:
+                existing_notes = result[0]
             
-        # Update the existing notes
-        cursor.execute("UPDATE teams SET notes=? WHERE rowid = ?", (existing_notes + "\n\n" + notes, team_id, ))
-        conn.commit()
-        return cursor.rowcount > 0
-    except Exception as e:
-        print(f"Error promoting user: {e}")
-        return False
-    finally:
-        release_connection(conn)
+            # Update the existing notes
+            cursor.execute("UPDATE teams SET notes=? WHERE rowid = ?", (existing_notes + "\n\n" + notes, team_id, ))
+            conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Error promoting user: {e}")
+            return False
 
 def add_match_to_database(owning_team: int, team: str, auto_high_sample: int, 
                           auto_low_sample: int, auto_high_specimen: int, auto_low_specimen: int, 
@@ -654,66 +1193,62 @@ def add_match_to_database(owning_team: int, team: str, auto_high_sample: int,
     Adds a match to the database.
     """
 
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO scouting_match_data (owning_team, team, auto_high_sample, auto_low_sample,
-                       auto_high_specimen, auto_low_specimen, high_sample, low_sample,
-                       high_specimen, low_specimen, climb_level, additional_points) VALUES 
-                       (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (owning_team, team, auto_high_sample, auto_low_sample, auto_high_specimen, 
-              auto_low_specimen, high_sample, low_sample, high_specimen, low_specimen,
-              climb_level, additional_points,))
+    with writing() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO scouting_match_data (owning_team, team, auto_high_sample, auto_low_sample,
+                           auto_high_specimen, auto_low_specimen, high_sample, low_sample,
+                           high_specimen, low_specimen, climb_level, additional_points) VALUES 
+                           (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (owning_team, team, auto_high_sample, auto_low_sample, auto_high_specimen, 
+                  auto_low_specimen, high_sample, low_sample, high_specimen, low_specimen,
+                  climb_level, additional_points,))
         
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error adding match: {e}")
-        return False
-    finally:
-        release_connection(conn)
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error adding match: {e}")
+            return False
 
 def get_scouted_matches_for_team(team_id: int):
     """
     Get all of a team's scouting data.
     """
 
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-
-        # Get all scouting data for the team
-        cursor.execute("""
-            SELECT team, auto_high_sample, auto_low_sample,
-                    auto_high_specimen, auto_low_specimen, high_sample, low_sample,
-                    high_specimen, low_specimen, climb_level, additional_points
-            FROM scouting_match_data
-            WHERE owning_team=? 
-            ORDER BY created_at DESC
-        """, (team_id,))
+    with reading() as conn:
+        try:
+            cursor = conn.cursor()
+
+            # Get all scouting data for the team
+            cursor.execute("""
+                SELECT team, auto_high_sample, auto_low_sample,
+                        auto_high_specimen, auto_low_specimen, high_sample, low_sample,
+                        high_specimen, low_specimen, climb_level, additional_points
+                FROM scouting_match_data
+                WHERE owning_team=? 
+                ORDER BY created_at DESC
+            """, (team_id,))
         
-        matches = cursor.fetchall()
+            matches = cursor.fetchall()
         
-        # Convert to list of dictionaries
-        return [
-            {
-                "team": m[0],
-                "auto_high_sample": m[1],
-                "auto_low_sample": m[2],
-                "auto_high_specimen": m[3],
-                "auto_low_specimen": m[4],
-                "high_sample": m[5],
-                "low_sample": m[6],
-                "high_specimen": m[7],
-                "low_specimen": m[8],
-                "climb_level": m[9],
-                "additional_points": m[10]
-            } 
-            for m in matches
-        ]
-    except Exception as e:
-        print(f"Error retrieving scouting data: {e}")
-        return []
-    finally:
-        release_connection(conn)
\ No newline at end of file
+            # Convert to list of dictionaries
+            return [
+                {
+                    "team": m[0],
+                    "auto_high_sample": m[1],
+                    "auto_low_sample": m[2],
+                    "auto_high_specimen": m[3],
+                    "auto_low_specimen": m[4],
+                    "high_sample": m[5],
+                    "low_sample": m[6],
+                    "high_specimen": m[7],
+                    "low_specimen": m[8],
+                    "climb_level": m[9],
+                    "additional_points": m[10]
+                } 
+                for m in matches
+            ]
+        except Exception as e:
+            print(f"Error retrieving scouting data: {e}")
+            return []
\ No newline at end of file
@@ -0,0 +1,17 @@
+-- Indexes for the queries that run on every page load or EPA/OPR computation
+
+-- get_match_teams: filter by season (and event), ordered by start time
+CREATE INDEX IF NOT EXISTS matches_season_start ON matches (season, actualStartTime);
+CREATE INDEX IF NOT EXISTS matches_event_start ON matches (season, eventCode, actualStartTime);
+
+-- store_scheduled_matches clears a match before rewriting it
+CREATE INDEX IF NOT EXISTS schedule_event_match ON schedule (season, eventCode, tournamentLevel, series, matchNumber);
+
+-- get_scouted_matches_for_team: filter by owning team, newest first
+CREATE INDEX IF NOT EXISTS scouting_match_data_owner_created ON scouting_match_data (owning_team, created_at);
+
+-- get_team_by_code (joining a team by its invite code)
+CREATE INDEX IF NOT EXISTS teams_code ON teams (team_code);
+
+-- get_team_members
+CREATE INDEX IF NOT EXISTS users_team ON users (team_id);
@@ -0,0 +1,10 @@
+-- Store match start times as UTC epoch seconds, so loaders don't parse date strings on every read
+
+ALTER TABLE matches ADD COLUMN startTimestamp INTEGER;
+
+UPDATE matches SET startTimestamp = CAST(strftime('%s', actualStartTime) AS INTEGER) WHERE actualStartTime IS NOT NULL;
+
+DROP INDEX IF EXISTS matches_season_start;
+DROP INDEX IF EXISTS matches_event_start;
+CREATE INDEX IF NOT EXISTS matches_season_start ON matches (season, startTimestamp);
+CREATE INDEX IF NOT EXISTS matches_event_start ON matches (season, eventCode, startTimestamp);
@@ -0,0 +1,12 @@
+-- A version number per event that goes up whenever its matches or scores are written, so a long-running
+-- process (EPA, OPR caches) can find out what changed since it last looked with one indexed query.
+-- Versions come from one counter shared by every event, so "version > N" finds everything newer than N.
+
+CREATE TABLE IF NOT EXISTS event_versions (
+    season               INTEGER NOT NULL,
+    eventCode            TEXT NOT NULL,
+    version              INTEGER NOT NULL,
+    PRIMARY KEY (season, eventCode)
+);
+
+CREATE INDEX IF NOT EXISTS event_versions_season_version ON event_versions (season, version);
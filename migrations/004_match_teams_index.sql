@@ -0,0 +1,4 @@
+-- get_match_teams: every column it reads, ordered by match and station, so it walks this index alone
+-- and the rows of each alliance come out next to each other
+
+CREATE INDEX IF NOT EXISTS matches_teams ON matches (season, eventCode, tournamentLevel, series, matchNumber, station, teamNumber, onField, startTimestamp);
@@ -0,0 +1,5 @@
+-- get_match_teams reads matches in match order through matches_teams (004) and no longer orders them by start
+-- time, so nothing reads these two indexes any more. They only slowed down every match write.
+
+DROP INDEX IF EXISTS matches_season_start;
+DROP INDEX IF EXISTS matches_event_start;
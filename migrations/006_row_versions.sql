@@ -0,0 +1,6 @@
+-- The event version (see 003) of the write that last changed each match and score row, so a process that has
+-- seen an event up to some version can read just the matches changed since. Rows stored before this are NULL,
+-- which counts as older than any version.
+
+ALTER TABLE matches ADD COLUMN version INTEGER;
+ALTER TABLE scores ADD COLUMN version INTEGER;
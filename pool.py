@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+A thread-safe pool of SQLite connections.
+
+Flask handles requests on separate threads, and a sqlite3 connection shouldn't be used by two threads at
+once, so each thread borrows a connection for as long as it needs one:
+
+    with pool.connection() as conn:
+        conn.execute(...)
+
+The connection always goes back to the pool when the block ends, even if it raised. A thread that asks
+for a connection while it already holds one from the same pool gets the same connection back instead of
+waiting on itself.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import Queue, Empty
+from typing import Callable
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection became free within the pool's acquire timeout.
+    """
+
+class ConnectionPool:
+    """
+    A fixed-size pool of connections created by `connect`.
+
+    Args:
+        name: shown in errors and metrics (e.g. reader, writer)
+        connect: creates a new connection
+        size: the number of connections in the pool
+        timeout: seconds to wait for a free connection before raising PoolTimeout
+    """
+
+    def __init__(self, name: str, connect: Callable[[], sqlite3.Connection], size: int = 5, timeout: float = 10.0):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.__connect = connect
+        self.__free = Queue(maxsize=size)
+        self.__created = 0
+        self.__create_lock = threading.Lock()
+        self.__metrics_lock = threading.Lock()
+        self.__held = threading.local()
+
+        self.__checkouts = 0
+        self.__exhausted = 0
+        self.__timeouts = 0
+        self.__in_use = 0
+        self.__wait_total = 0.0
+        self.__wait_max = 0.0
+
+    def acquire(self, timeout: float = None) -> sqlite3.Connection:
+        """
+        Borrows a connection. Every acquire must be matched by a `release`; prefer `connection()`.
+
+        Args:
+            timeout (optional): seconds to wait for a free connection, defaults to the pool's timeout
+
+        Raises PoolTimeout if no connection became free in time.
+        """
+        held = getattr(self.__held, "conn", None)
+        if held is not None:
+            self.__held.depth += 1
+            return held
+
+        start = time.perf_counter()
+        conn = self.__take(self.timeout if timeout is None else timeout, start)
+        waited = time.perf_counter() - start
+
+        with self.__metrics_lock:
+            self.__checkouts += 1
+            self.__in_use += 1
+            self.__wait_total += waited
+            self.__wait_max = max(self.__wait_max, waited)
+
+        self.__held.conn = conn
+        self.__held.depth = 1
+        return conn
+
+    def __take(self, timeout: float, start: float) -> sqlite3.Connection:
+        try:
+            return self.__free.get_nowait()
+        except Empty:
+            pass
+
+        # Connections are opened lazily, up to the pool's size
+        with self.__create_lock:
+            if self.__created < self.size:
+                self.__created += 1
+                try:
+                    return self.__connect()
+                except:
+                    self.__created -= 1
+                    raise
+
+        with self.__metrics_lock:
+            self.__exhausted += 1
+        try:
+            return self.__free.get(timeout=timeout)
+        except Empty:
+            with self.__metrics_lock:
+                self.__timeouts += 1
+            raise PoolTimeout(f"no {self.name} connection became free within {timeout}s ({self.size} in use)")
+
+    def release(self, conn: sqlite3.Connection):
+        """
+        Returns a connection borrowed with `acquire`.
+        """
+        if getattr(self.__held, "conn", None) is not conn:
+            raise ValueError(f"connection was not acquired from the {self.name} pool by this thread")
+
+        self.__held.depth -= 1
+        if self.__held.depth > 0:
+            return
+        self.__held.conn = None
+
+        # Don't hand the next borrower a half-finished transaction (or the locks it holds)
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self.__metrics_lock:
+            self.__in_use -= 1
+        self.__free.put(conn)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Borrows a connection for the duration of a `with` block.
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        """
+        Returns counters for monitoring: checkouts, how often the pool was exhausted (a borrower had to wait),
+        timeouts, connections in use, and total/average/maximum wait time in milliseconds.
+        """
+        with self.__metrics_lock:
+            return {
+                "size": self.size,
+                "open": self.__created,
+                "in_use": self.__in_use,
+                "checkouts": self.__checkouts,
+                "exhausted": self.__exhausted,
+                "timeouts": self.__timeouts,
+                "wait_total_ms": self.__wait_total * 1000,
+                "wait_avg_ms": self.__wait_total * 1000 / self.__checkouts if self.__checkouts else 0.0,
+                "wait_max_ms": self.__wait_max * 1000,
+            }
@@ -1,17 +1,24 @@
+import math
 import uuid
 from flask import Blueprint, make_response, request, jsonify
 
 import R
 import database
-from stats import opr, epa
+from stats import opr, epa, predictions, rolling_opr
 
 # Create a Blueprint instance
 stats = Blueprint('stats', __name__, static_folder="../static")
 
+# The most teams /epa/<season>/teams looks up, and the longest page /epa/<season>/leaderboard returns
+MAX_BATCH_TEAMS = 500
+MAX_LEADERBOARD_PAGE = 1000
+
 @stats.route("/opr/<season>/<event_code>/<statistic>", methods=["GET"])
 def opr_route(season: str, event_code: str, statistic: str):
     """
     Calculates the OPR for all teams at an event.
+
+    Responses carry the event's version as their ETag, so browsers can revalidate instead of downloading it again.
     """
     try:
         if season != "2024":
@@ -26,7 +33,140 @@ def opr_route(season: str, event_code: str, statistic: str):
         if statistic not in database.SCORE_FIELDS_2024:
             return make_response(f"statistic is invalid, must be one of {database.SCORE_FIELDS_2024}", 400)
         
-        return jsonify(opr.calc_single_stat_opr(event_code=event_code, statistic=statistic, season=2024))
+        version = database.get_event_version(event_code, season=2024)
+        response = jsonify(opr.calc_single_stat_opr(event_code=event_code, statistic=statistic, season=2024))
+        response.set_etag(str(version))
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+def __epa_not_ready(season: int):
+    """
+    Starts loading a season's EPAs in the background if nothing is loading them yet.
+
+    Returns a 503 response with the season's loading status, and a Retry-After header for when it should be ready.
+    """
+    epa.start_loading(season)
+    status = epa.get_status(season)
+    response = make_response(jsonify(status), 503)
+    # Ask again when the load should be done, but at least once a minute
+    eta = status["eta"]
+    response.headers["Retry-After"] = str(min(60, max(1, math.ceil(eta)))) if eta is not None else "5"
+    return response
+
+@stats.route("/opr/<season>/<event_code>", methods=["GET"])
+def opr_all_route(season: str, event_code: str):
+    """
+    Calculates the OPR of every numeric score statistic for all teams at an event in one solve.
+
+    Returns a dictionary where key = team and value = dictionary where key = statistic and value = OPR.
+    Responses carry the event's version as their ETag, like the single statistic route.
+    """
+    try:
+        if season != "2024":
+            return make_response("2024 is the only season supported", 400)
+
+        version = database.get_event_version(event_code, season=2024)
+        response = jsonify(opr.calc_all_stats_opr(event_code=event_code, season=2024))
+        response.set_etag(str(version))
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+@stats.route("/ratings/<season>/<event_code>", methods=["GET"])
+def ratings_route(season: str, event_code: str):
+    """
+    Calculates OPR, DPR and CCWM for all teams at an event from one load and one solve (see opr.calc_event_ratings).
+
+    Query string parameter statistic (optional) returns only that statistic.
+
+    Returns a dictionary where key = team and value = dictionary where key = rating (opr, dpr or ccwm) and
+    value = dictionary where key = statistic and value = rating, or value = rating if statistic is given.
+    Responses carry the event's version as their ETag.
+    """
+    try:
+        if season != "2024":
+            return make_response("2024 is the only season supported", 400)
+
+        statistic = request.args.get("statistic")
+        if statistic is not None and statistic not in database.NUMERIC_SCORE_FIELDS_2024:
+            return make_response(f"statistic is invalid, must be one of {database.NUMERIC_SCORE_FIELDS_2024}", 400)
+
+        version = database.get_event_version(event_code, season=2024)
+        ratings = opr.calc_event_ratings(event_code=event_code, season=2024)
+        if statistic is not None:
+            ratings = {team: {rating: values[statistic] for (rating, values) in team_ratings.items()} for (team, team_ratings) in ratings.items()}
+        response = jsonify(ratings)
+        response.set_etag(str(version))
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+@stats.route("/opr-trajectory/<season>/<event_code>", methods=["GET"])
+def opr_trajectory_route(season: str, event_code: str):
+    """
+    Returns how the OPRs at an event moved match by match, updated live as matches are scored (see rolling_opr).
+
+    Query string parameter statistic selects the statistic (default totalPoints), and teams (optional) is a
+    comma separated list of team numbers to return instead of everyone at the event.
+
+    Returns a dictionary with matches = a list of the level, series, number and start_time of every scored match in order,
+    and teams = a dictionary where key = team and value = its OPR after each match (null before its first match).
+    Responses carry the event's version as their ETag.
+    """
+    try:
+        if season != "2024":
+            return make_response("2024 is the only season supported", 400)
+
+        statistic = request.args.get("statistic", "totalPoints")
+        if statistic not in database.NUMERIC_SCORE_FIELDS_2024:
+            return make_response(f"statistic is invalid, must be one of {database.NUMERIC_SCORE_FIELDS_2024}", 400)
+
+        teams = [team.strip() for team in request.args.get("teams", "").split(",") if team.strip()]
+        if not all(team.isnumeric() for team in teams):
+            return make_response("teams must be a comma separated list of team numbers", 400)
+
+        version = database.get_event_version(event_code, season=2024)
+        response = jsonify(rolling_opr.get_trajectory(event_code, statistic=statistic, teams=[int(team) for team in teams] or None, season=2024))
+        response.set_etag(str(version))
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+@stats.route("/opr/<season>", methods=["GET"])
+def opr_season_route(season: str):
+    """
+    Calculates a season-wide OPR for every team from every event's matches in one solve (see opr.calc_season_opr).
+
+    Query string parameter statistic (optional) returns only that statistic.
+
+    Returns a dictionary where key = team and value = dictionary where key = statistic and value = OPR,
+    or value = OPR if statistic is given. Responses carry the season's latest event version as their ETag.
+    """
+    try:
+        if season != "2024":
+            return make_response("2024 is the only season supported", 400)
+
+        statistic = request.args.get("statistic")
+        if statistic is not None and statistic not in database.NUMERIC_SCORE_FIELDS_2024:
+            return make_response(f"statistic is invalid, must be one of {database.NUMERIC_SCORE_FIELDS_2024}", 400)
+
+        version = max(database.get_event_versions(2024).values(), default=0)
+        oprs = opr.calc_season_opr(season=2024)
+        if statistic is not None:
+            oprs = {team: values[statistic] for (team, values) in oprs.items()}
+        response = jsonify(oprs)
+        response.set_etag(str(version))
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as err:
         print(err)
         return make_response("internal server error", 500)
@@ -38,19 +178,34 @@ def epa_route(season: str, team: str):
      
     If query string parameter time is provided, returns the EPA at that time.
     Otherwise, returns a dictionary where key = time and value = EPA at that time.
+    Query string parameter component selects the EPA: total (default), auto, teleop or endgame,
+    or all for a dictionary where key = component and value = EPA (only with time).
     """
     try:
-        if season != "2024":
-            return make_response("2024 is the only season supported", 400)
+        if not season.isnumeric():
+            return make_response("season is not numeric", 400)
+
+        if not database.has_season(int(season)):
+            return make_response(f"no matches stored for {season}", 404)
         
         if not team.isnumeric():
             return make_response("team is not numeric", 400)
+
+        if not epa.is_ready(int(season)):
+            return __epa_not_ready(int(season))
         
         t = request.args.get("time", type=float)
+        component = request.args.get("component", "total")
+        if component == "all" and t is not None:
+            return jsonify(epa.get_component_epas(int(team), time=t, season=int(season)))
+
+        if component not in epa.COMPONENTS:
+            return make_response(f"component is invalid, must be one of {epa.COMPONENT_NAMES}", 400)
+
         if t is None:
-            return jsonify(epa.get_all_epas(int(team)))
+            return jsonify(epa.get_all_epas(int(team), component=component, season=int(season)))
         else:
-            return jsonify(epa.get_epa(int(team), time=t))
+            return jsonify(epa.get_epa(int(team), time=t, component=component, season=int(season)))
     except Exception as err:
         print(err)
         return make_response("internal server error", 500)
@@ -59,14 +214,180 @@ def epa_route(season: str, team: str):
 def epa_ranks_route(season: str):
     """
     Returns current EPA rankings.
+
+    If query string parameter time is provided, returns the rankings as they stood at that time.
+    Query string parameter component ranks by one EPA component: total (default), auto, teleop or endgame.
      
     Returns a dictionary where key = team and value = their EPA rank (1 = first).
     """
     try:
-        if season != "2024":
-            return make_response("2024 is the only season supported", 400)
+        if not season.isnumeric():
+            return make_response("season is not numeric", 400)
+
+        if not database.has_season(int(season)):
+            return make_response(f"no matches stored for {season}", 404)
         
-        return jsonify(epa.get_ranks())
+        component = request.args.get("component", "total")
+        if component not in epa.COMPONENTS:
+            return make_response(f"component is invalid, must be one of {epa.COMPONENT_NAMES}", 400)
+
+        if not epa.is_ready(int(season)):
+            return __epa_not_ready(int(season))
+
+        return jsonify(epa.get_ranks(time=request.args.get("time", type=float), component=component, season=int(season)))
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+@stats.route("/epa/<season>/leaderboard", methods=["GET"])
+def epa_leaderboard_route(season: str):
+    """
+    Returns one page of the EPA rankings, so clients don't have to download every team's rank.
+
+    Query string parameters offset (default 0) and limit (default 100) select the page, time ranks by the EPAs
+    as of that time and component ranks by one EPA component: total (default), auto, teleop or endgame.
+
+    Returns a dictionary with teams = the number of ranked teams and ranks = a list of dictionaries with the
+    team, rank, epa and percentile (rank / number of ranked teams, near 0 = best).
+    """
+    try:
+        if not season.isnumeric():
+            return make_response("season is not numeric", 400)
+
+        if not database.has_season(int(season)):
+            return make_response(f"no matches stored for {season}", 404)
+
+        offset = request.args.get("offset", 0, type=int)
+        limit = request.args.get("limit", 100, type=int)
+        if offset < 0 or not 0 < limit <= MAX_LEADERBOARD_PAGE:
+            return make_response(f"offset must not be negative and limit must be between 1 and {MAX_LEADERBOARD_PAGE}", 400)
+
+        component = request.args.get("component", "total")
+        if component not in epa.COMPONENTS:
+            return make_response(f"component is invalid, must be one of {epa.COMPONENT_NAMES}", 400)
+
+        if not epa.is_ready(int(season)):
+            return __epa_not_ready(int(season))
+
+        return jsonify(epa.get_leaderboard(offset=offset, limit=limit, time=request.args.get("time", type=float), component=component, season=int(season)))
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+@stats.route("/epa/<season>/teams", methods=["GET"])
+def epa_teams_route(season: str):
+    """
+    Gets the current EPA, rank and percentile of many teams in one request.
+
+    Query string parameter teams is a comma separated list of team numbers, component selects the EPA: total (default),
+    auto, teleop or endgame, and history (optional) also returns up to that many historical EPAs per team.
+
+    Returns a dictionary where key = team and value = a dictionary with epa, rank, percentile
+    (and history, where key = time and value = EPA at that time). Teams that haven't played are left out.
+    """
+    try:
+        if not season.isnumeric():
+            return make_response("season is not numeric", 400)
+
+        if not database.has_season(int(season)):
+            return make_response(f"no matches stored for {season}", 404)
+
+        teams = [team.strip() for team in request.args.get("teams", "").split(",") if team.strip()]
+        if not teams or not all(team.isnumeric() for team in teams):
+            return make_response("teams must be a comma separated list of team numbers", 400)
+
+        if len(teams) > MAX_BATCH_TEAMS:
+            return make_response(f"at most {MAX_BATCH_TEAMS} teams can be looked up at once", 400)
+
+        component = request.args.get("component", "total")
+        if component not in epa.COMPONENTS:
+            return make_response(f"component is invalid, must be one of {epa.COMPONENT_NAMES}", 400)
+
+        history = request.args.get("history", 0, type=int)
+        if history < 0:
+            return make_response("history must not be negative", 400)
+
+        if not epa.is_ready(int(season)):
+            return __epa_not_ready(int(season))
+
+        return jsonify(epa.get_teams([int(team) for team in teams], component=component, history=history, season=int(season)))
     except Exception as err:
         print(err)
-        return make_response("internal server error", 500)
\ No newline at end of file
+        return make_response("internal server error", 500)
+
+@stats.route("/predictions/<season>/<event_code>", methods=["GET"])
+def predictions_route(season: str, event_code: str):
+    """
+    Predicts every upcoming match at an event from its schedule and the current EPAs.
+
+    Query string parameter played=true also predicts matches that already have scores.
+
+    Returns a list with one dictionary per match in start time order: level, series, number, description, start_time,
+    red and blue (the scheduled teams), red_score and blue_score (where key = EPA component and value = predicted points)
+    and red_win_probability.
+    """
+    try:
+        if not season.isnumeric():
+            return make_response("season is not numeric", 400)
+
+        if not database.has_season(int(season)):
+            return make_response(f"no matches stored for {season}", 404)
+
+        if not epa.is_ready(int(season)):
+            return __epa_not_ready(int(season))
+
+        include_played = request.args.get("played", "false").lower() == "true"
+        return jsonify(predictions.predict_event(event_code, season=int(season), include_played=include_played))
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+@stats.route("/epa/<season>/status", methods=["GET"])
+def epa_status_route(season: str):
+    """
+    Returns how far along loading a season's EPAs is, without waiting for it: the phase, rows loaded,
+    matches replayed, a rough ETA in seconds and whether the EPAs are ready (see epa.get_status).
+    """
+    try:
+        if not season.isnumeric():
+            return make_response("season is not numeric", 400)
+
+        if not database.has_season(int(season)):
+            return make_response(f"no matches stored for {season}", 404)
+
+        return jsonify(epa.get_status(int(season)))
+    except Exception as err:
+        print(err)
+        return make_response("internal server error", 500)
+
+@stats.route("/epa/status", methods=["GET"])
+def epa_statuses_route():
+    """
+    Returns a dictionary where key = every season that has been loaded or requested and value = its loading status.
+    """
+    return jsonify(epa.get_status())
+
+@stats.route("/epa/seasons", methods=["GET"])
+def epa_seasons_route():
+    """
+    Returns the seasons whose EPAs are loaded, for monitoring the EPA memory budget.
+
+    Returns a dictionary where key = season (least recently used first) and value = the approximate bytes it uses.
+    """
+    return jsonify(epa.get_loaded_seasons())
+
+@stats.route("/opr/cache", methods=["GET"])
+def opr_cache_route():
+    """
+    Returns the OPR cache's hit, miss and stale counters and size, for monitoring.
+    """
+    return jsonify(opr.get_cache_stats())
+
+@stats.route("/database", methods=["GET"])
+def database_route():
+    """
+    Returns the database connection pools' counters for monitoring.
+
+    Returns a dictionary where key = pool (reader or writer) and value = its checkouts, exhaustion count, timeouts and wait times.
+    """
+    return jsonify(database.get_pool_stats())
@@ -118,4 +118,24 @@ CREATE TABLE IF NOT EXISTS schedule (
     surrogate            BOOLEAN NOT NULL,
     noShow               BOOLEAN NOT NULL,
     modifiedOn           TEXT
-);
\ No newline at end of file
+);
+
+-- Events that a season crawl has finished caching, so an interrupted crawl can resume
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    season               INTEGER NOT NULL,
+    eventCode            TEXT NOT NULL,
+    completed_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (season, eventCode)
+);
+
+-- What an incremental sync last saw for each endpoint of an event
+-- endpoint = 'event' marks an event whose endpoints have all been synced at least once
+CREATE TABLE IF NOT EXISTS sync_state (
+    season               INTEGER NOT NULL,
+    eventCode            TEXT NOT NULL,
+    endpoint             TEXT NOT NULL,
+    lastModified         TEXT, -- Last-Modified header, sent back as If-Modified-Since
+    watermark            TEXT, -- latest modifiedOn among the rows received
+    synced_at            TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (season, eventCode, endpoint)
+);
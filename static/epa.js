@@ -1,14 +1,65 @@
+async function fetchEPA(url) {
+    /**
+     * Fetches JSON from the EPA API, waiting and asking again while the season is still loading.
+     * 
+     * @param url the EPA API URL
+     * 
+     * @returns the parsed response
+     * @throws an Error with the server's message if the request fails or the response isn't JSON
+     */
+    while (true) {
+        let response = await fetch(url, {
+            method: 'GET'
+        })
+        if (response.status == 503) {
+            // The server says how long loading should take
+            let wait = Number(response.headers.get('Retry-After') || 5);
+            await new Promise((resolve) => setTimeout(resolve, wait * 1000));
+            continue;
+        }
+        let contentType = response.headers.get('Content-Type') || '';
+        if (response.ok) {
+            if (contentType.includes('application/json')) {
+                return await response.json();
+            }
+            throw new Error(`${response.status} expected JSON but got ${contentType || 'no content type'}`);
+        }
+        // The API explains bad requests in a short text body; an HTML error page only gets its status text
+        let message = (await response.text()).trim();
+        if (message.startsWith('<')) {
+            message = response.statusText;
+        }
+        throw new Error(`${response.status} ${message || 'unexpected response'}`);
+    }
+}
+
+async function getTeamEPAs(season, teams, history = 0) {
+    /**
+     * Returns the current EPA, rank and percentile of several teams in one request.
+     * 
+     * @param season the season to get EPAs for
+     * @param teams a list of team numbers
+     * @param history if set, also returns up to this many historical EPAs per team
+     * 
+     * @returns a dictionary where key = team and value = {epa, rank, percentile, history}. Teams that haven't played are left out.
+     */
+    return await fetchEPA(`/api/stats/epa/${season}/teams?teams=${teams.join(',')}&history=${history}`);
+}
+
 async function plotEPAs(season, team) {
     /**
-     * Plots the historical EPAs for a team in the div with id `epaChart` and returns their current EPA.
+     * Plots the historical EPAs for a team in the div with id `epaChart`.
      * 
      * @param season the season to fetch EPAs for
      * @param team the team to get EPA for
+     * 
+     * @returns the team's {epa, rank, percentile}, or undefined if they haven't played
      */
-    let response = await fetch(`/api/stats/epa/${season}/${team}`, {
-        method: 'GET'
-    })
-    let packet = await response.json();
+    let info = (await getTeamEPAs(season, [team], 500))[team];
+    if (info === undefined) {
+        return undefined;
+    }
+    let packet = info.history;
 
     let data = [
         {
@@ -35,25 +86,19 @@ async function plotEPAs(season, team) {
       
     Plotly.newPlot('epaChart', data, layout, config);
 
-    let lastKey = Object.keys(packet).sort().reverse()[0];
-    let lastValue = packet[lastKey];
-
-    return lastValue;
+    return info;
 }
 
-async function getEPARanks(season) {
+async function getEPALeaderboard(season, offset, limit) {
     /**
-     * Returns the EPA rankings for a given season.
+     * Returns one page of the EPA rankings for a given season.
      * @param season the season to get EPA ranks for
+     * @param offset how many of the best teams to skip
+     * @param limit the most teams to return
      * 
-     * @returns a dictionary where key = team and value = their EPA rank (1 = first).
+     * @returns {teams: the number of ranked teams, ranks: a list of {team, rank, epa, percentile}, best first}
      */
-    let response = await fetch(`/api/stats/epa/${season}/ranks`, {
-        method: 'GET'
-    })
-    let packet = await response.json();
-
-    return packet;
+    return await fetchEPA(`/api/stats/epa/${season}/leaderboard?offset=${offset}&limit=${limit}`);
 }
 
 function setElementColorForEPA(element, percentile) {
@@ -92,11 +137,24 @@ async function updateEPA() {
      * Reloads EPA chart and rank.
      */
     let team = document.getElementById('team').value;
-    let currentEPA = await plotEPAs(2024, team);
+    let info;
+    try {
+        info = await plotEPAs(2024, team);
+    } catch (error) {
+        console.error('Error:', error);
+        document.getElementById('epa').hidden = false;
+        document.getElementById('epa').innerText = `Couldn't load EPA for ${team} (${error.message})`;
+        document.getElementById('rank').hidden = true;
+        return;
+    }
     document.getElementById('epa').hidden = false;
+    if (info === undefined) {
+        document.getElementById('epa').innerText = `No EPA for ${team}`;
+        document.getElementById('rank').hidden = true;
+        return;
+    }
     document.getElementById('rank').hidden = false;
-    document.getElementById('epa').innerText = `EPA: ${Number(currentEPA).toFixed(1)}`;
-    let percentile = window.ranks[team][0] / Object.keys(window.ranks).length;
-    setElementColorForEPA(document.getElementById("rank"), percentile);
-    document.getElementById('rank').innerText = `World Rank: #${window.ranks[team][0]}`;
+    document.getElementById('epa').innerText = `EPA: ${Number(info.epa).toFixed(1)}`;
+    setElementColorForEPA(document.getElementById("rank"), info.percentile);
+    document.getElementById('rank').innerText = `World Rank: #${info.rank}`;
 }
\ No newline at end of file
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+A compressed, content-addressed archive of raw FTC Event API responses, so the database can be rebuilt
+without hitting the API again.
+
+Layout (under the archive root):
+    objects/ab/abcdef....json.gz            gzipped response body, named after the sha256 of the raw bytes
+    refs/<season>/<event code>/<endpoint>   hash of the latest body for that season, event and endpoint
+
+Endpoints are named like the API paths with "/" replaced by "-" (e.g. scores-qual, schedule-playoff, matches).
+The season's event listing is stored under the event code "_season", which can't clash with a real code.
+
+Usage:
+    python -m stats.archive --season 2024 --workers 8
+rebuilds database.db from the archive with no network access.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import database
+
+SEASON_LISTING = "_season"
+
+__root = None
+
+def init(root: str = "archive"):
+    """
+    Turns on archiving of API responses into the directory `root`.
+    """
+    global __root
+    __root = Path(root)
+
+def is_enabled() -> bool:
+    return __root is not None
+
+def __write_atomically(path: Path, data: bytes):
+    """
+    Writes a file so readers never see it half written.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def __ref_path(season: int, endpoint: str, event_code: str) -> Path:
+    return __root / "refs" / str(season) / (event_code or SEASON_LISTING) / endpoint.replace("/", "-")
+
+def __object_path(digest: str) -> Path:
+    return __root / "objects" / digest[:2] / f"{digest}.json.gz"
+
+def store(season: int, endpoint: str, event_code: str, raw: bytes) -> str:
+    """
+    Archives a raw response body. Identical bodies are only stored once.
+
+    Args:
+        season: the year the data is from
+        endpoint: the endpoint the body came from (e.g. matches, scores/qual)
+        event_code: the event the body is for, or None for the season's event listing
+        raw: the undecoded response body
+
+    Returns the sha256 hex digest the body is stored under.
+    """
+    digest = hashlib.sha256(raw).hexdigest()
+    obj = __object_path(digest)
+    if not obj.exists():
+        # mtime=0 keeps the compressed bytes identical for identical bodies
+        __write_atomically(obj, gzip.compress(raw, mtime=0))
+    __write_atomically(__ref_path(season, endpoint, event_code), digest.encode())
+    return digest
+
+def load(season: int, endpoint: str, event_code: str) -> bytes:
+    """
+    Returns the latest archived raw body for a season, endpoint and event, or None if there isn't one.
+    """
+    ref = __ref_path(season, endpoint, event_code)
+    if not ref.exists():
+        return None
+    return gzip.decompress(__object_path(ref.read_text().strip()).read_bytes())
+
+def load_json(season: int, endpoint: str, event_code: str) -> dict:
+    """
+    Returns the latest archived body for a season, endpoint and event decoded as JSON, or None if there isn't one.
+    """
+    raw = load(season, endpoint, event_code)
+    return json.loads(raw) if raw is not None else None
+
+def get_archived_events(season: int = 2024) -> list[str]:
+    """
+    Returns the codes of every event with at least one archived response.
+    """
+    season_dir = __root / "refs" / str(season)
+    if not season_dir.exists():
+        return []
+    return sorted(entry.name for entry in season_dir.iterdir() if entry.is_dir() and entry.name != SEASON_LISTING)
+
+def replay_event(event_code: str, season: int = 2024) -> int:
+    """
+    Rebuilds one event's rows in the database from the archive.
+
+    Returns the number of rows written, or None if there was an error.
+    """
+    try:
+        written = 0
+        for endpoint, key, store_rows in [("scores/qual", "matchScores", database.store_match_scores),
+                                          ("scores/playoff", "matchScores", database.store_match_scores),
+                                          ("schedule/qual", "schedule", database.store_scheduled_matches),
+                                          ("schedule/playoff", "schedule", database.store_scheduled_matches),
+                                          ("matches", "matches", database.store_matches)]:
+            body = load_json(season, endpoint, event_code)
+            if body is not None:
+                written += store_rows(event_code, body[key], season=season)
+        return written
+    except Exception as e:
+        print(f"Error replaying {event_code}: {e}")
+        return None
+
+def replay(season: int = 2024, workers: int = 8) -> bool:
+    """
+    Rebuilds the database from the archive without any network access, replaying events in parallel.
+
+    Args:
+        season: the year to replay
+        workers: the number of events replayed at the same time
+
+    Returns True if every archived event was replayed, False otherwise.
+    """
+    if not is_enabled():
+        raise RuntimeError("archive.init() has not been called")
+
+    database.init()
+    event_codes = get_archived_events(season)
+    print(f"Replaying {len(event_codes)} archived events")
+
+    start = time.perf_counter()
+    failed = []
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(replay_event, code, season): code for code in event_codes}
+        for future in as_completed(futures):
+            rows = future.result()
+            if rows is None:
+                failed.append(futures[future])
+            else:
+                written += rows
+
+    print(f"Wrote {written} rows in {time.perf_counter() - start:.2f}s")
+    if failed:
+        print(f"Failed to replay {len(failed)} events: {', '.join(failed)}")
+
+    return failed == []
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the database from archived FTC Event API responses")
+    parser.add_argument("--season", type=int, default=2024)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--archive", default="archive")
+    args = parser.parse_args()
+
+    init(args.archive)
+    exit(0 if replay(args.season, workers=args.workers) else 1)
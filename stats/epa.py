@@ -1,128 +1,1413 @@
 #!/usr/bin/env python3
+import bisect
+import os
+import sys
+import tempfile
+import threading
+import time as clock
+from collections import OrderedDict
+from pathlib import Path
 import database
 from database import MatchKey
 import numpy as np
 from helper import *
-import copy
-from collections import defaultdict
+from array import array
+from itertools import chain, count
 
-__epa_dict = {}
-__teams = {}
-__scores = {}
+# Every component is rated separately, from the margin of its own score field
+COMPONENTS = {"total": "totalPoints", "auto": "autoPoints", "teleop": "teleopPoints", "endgame": "endGamePoints"}
+COMPONENT_NAMES = list(COMPONENTS.keys())
 
-__done_initializing = False
-__season_loaded = False
+# Bumped whenever the snapshot layout changes, so old snapshots are ignored instead of misread
+SNAPSHOT_FORMAT = 4
+
+# The prior is averaged over this many seconds of matches from the start of the season
+PRIOR_WINDOW = 31 * 24 * 60 * 60
+# Teams start at the average score over the prior window divided by this (see tools/backtest_epa.py to compare settings)
+PRIOR_DIVISOR = 2
+# How far each match moves the EPAs of its teams towards the margin it actually ended with
+UPDATE_FACTOR = 36/250
+
+# What an engine can be doing while its season loads (see EpaEngine.get_status), in order
+LOADING_PHASES = ("loading_snapshot", "catching_up", "counting_rows", "loading_matches", "loading_scores", "compiling", "replaying", "saving_snapshot")
+# Seconds to wait after a season failed to load before requests start loading it again
+RETRY_FAILED_LOAD = 60
+
+class EpaHistory:
+    """
+    Every team's EPAs after each match it played, kept in compact arrays instead of a tuple per entry.
+
+    Every team gets a slot (a dense index) the first time it's seen, and keeps it. Each slot has three parallel,
+    growable arrays: the position of the match in the applied order (int32), the match's start time (float64)
+    and the EPA of every component after it (float64, `components` values per entry). Entries are appended
+    in applied order, so every team's times are sorted and can be binary searched.
+
+    Lookups never add teams; only `slot` does.
+    """
+
+    def __init__(self, components: int = 1):
+        self.components = components
+        self.__index = {}
+        self.__teams = []
+        self.__matches = []
+        self.__times = []
+        self.__epas = []
+
+    def __len__(self) -> int:
+        return sum(1 for matches in self.__matches if matches)
+
+    def __contains__(self, team: int) -> bool:
+        slot = self.__index.get(team)
+        return slot is not None and len(self.__matches[slot]) > 0
+
+    def slot(self, team: int) -> int:
+        """
+        Returns a team's slot, giving it one if it doesn't have one yet.
+        """
+        slot = self.__index.get(team)
+        if slot is None:
+            slot = self.__index[team] = len(self.__teams)
+            self.__teams.append(team)
+            self.__matches.append(array("i"))
+            self.__times.append(array("d"))
+            self.__epas.append(array("d"))
+        return slot
+
+    def find(self, team: int) -> int:
+        """
+        Returns a team's slot, or None if it doesn't have one.
+        """
+        return self.__index.get(team)
+
+    @property
+    def slots(self) -> int:
+        """
+        The number of slots handed out so far.
+        """
+        return len(self.__teams)
+
+    def extend(self, slot: int, matches: array, times: array, epas: array):
+        """
+        Appends entries for one team.
+
+        Args:
+            slot: the team's slot
+            matches: the applied match position of every entry
+            times: the start time of every entry
+            epas: `components` EPAs per entry, entry after entry
+        """
+        self.__matches[slot].extend(matches)
+        self.__times[slot].extend(times)
+        self.__epas[slot].extend(epas)
+
+    def truncate(self, slot: int, match: int) -> array:
+        """
+        Removes a team's entries for every match at position `match` or later.
+
+        Returns the team's latest remaining EPAs (one per component), or None if it has no entries left.
+        """
+        (matches, times, epas) = (self.__matches[slot], self.__times[slot], self.__epas[slot])
+        keep = bisect.bisect_left(matches, match)
+        del matches[keep:], times[keep:], epas[keep * self.components:]
+        return epas[-self.components:] if keep > 0 else None
+
+    def get(self, team: int) -> tuple[array, array, array]:
+        """
+        Returns a team's (match positions, start times, EPAs), or None if it hasn't played. Don't modify them.
+        """
+        slot = self.__index.get(team)
+        if slot is None or not self.__matches[slot]:
+            return None
+        return (self.__matches[slot], self.__times[slot], self.__epas[slot])
+
+    def at(self, team: int, time: float, component: int = 0) -> float:
+        """
+        Returns a team's EPA for one component as of `time` (after the last match that started at or before it),
+        or None if it hadn't played by then.
+        """
+        slot = self.__index.get(team)
+        if slot is None:
+            return None
+        position = bisect.bisect_right(self.__times[slot], time)
+        return self.__epas[slot][(position - 1) * self.components + component] if position > 0 else None
+
+    def teams(self) -> list[int]:
+        """
+        Returns every team with at least one entry.
+        """
+        return [team for (team, matches) in zip(self.__teams, self.__matches) if matches]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes used by the store, including the arrays' spare capacity and the team index.
+        """
+        return (sys.getsizeof(self.__index) + sum(sys.getsizeof(arrays) for arrays in (self.__teams, self.__matches, self.__times, self.__epas))
+                + sum(sys.getsizeof(a) for arrays in (self.__matches, self.__times, self.__epas) for a in arrays))
 
 # https://www.statbotics.io/blog/epa
 
-def init():
+def replay_levels(ratings: np.ndarray, rows: np.ndarray, margins: np.ndarray, levels: list[np.ndarray], update_factor: float = UPDATE_FACTOR,
+                  predicted: np.ndarray = None, progress: Callable[[int], None] = None) -> np.ndarray:
+    """
+    Applies compiled matches (see EpaEngine.export_season) level by level, updating `ratings` in place for every component at once.
+    This is the engine's replay, without the bookkeeping, so tools can replay a season under other parameters.
+
+    Args:
+        ratings: the current EPAs, one row per team and one column per component. Row 0 stands in for empty alliance positions and is kept at zero.
+        rows: the ratings rows of the teams in every alliance position (0 = nobody), of shape (matches, 2 alliances (red, blue), largest alliance)
+        margins: red score - blue score for every component, of shape (matches, components)
+        levels: the indices of the matches that can be applied together, level by level
+        update_factor (optional): how far each match moves the EPAs towards its actual margin
+        predicted (optional): filled with every alliance's predicted score (the sum of its EPAs) just before the match, of shape (matches, 2 alliances, components)
+        progress (optional): called with the number of matches in every level once it's applied
+
+    Returns every team's EPAs after each of its matches, of shape (matches, 2 alliances, largest alliance, components).
+    """
+    width = rows.shape[2]
+    new_epas = np.empty(rows.shape + (ratings.shape[1],), dtype=np.float64)
+    # Red gains what blue loses
+    sign = np.array([1.0, -1.0])[None, :, None, None]
+
+    for matches in levels:
+        level_rows = rows[matches]
+        epas = ratings[level_rows]
+        # Summed position by position, in the same order as adding up the teams one by one
+        alliance_epas = epas[:, :, 0]
+        for position in range(1, width):
+            alliance_epas = alliance_epas + epas[:, :, position]
+
+        if predicted is not None:
+            predicted[matches] = alliance_epas
+        predicted_score_margin = alliance_epas[:, 0] - alliance_epas[:, 1]
+        delta_epa = update_factor * (margins[matches] - predicted_score_margin) # if red does better, this is positive, so we need to invert for blue
+
+        epas += delta_epa[:, None, None, :] * sign
+        ratings[level_rows] = epas
+        # Empty positions were written to row 0
+        ratings[0] = 0
+        new_epas[matches] = epas
+        if progress is not None:
+            progress(len(matches))
+    return new_epas
+
+class EpaEngine:
+    """
+    The EPAs of one season: every team's current and historical EPAs, and the matches they came from.
+
+    Engines start out empty. `init` loads the season's matches and `season_epa` replays them, or `load`
+    does both (from the last snapshot if there is one).
+
+    Args:
+        season: the season the EPAs are for
+        update_factor (optional): how far each match moves the EPAs towards its actual margin
+        prior_divisor (optional): teams start at the average score over the prior window divided by this
+    """
+
+    # Revision numbers are shared by every engine and never reused, so a revision identifies one state of one season
+    __revisions = count(1)
+
+    def __init__(self, season: int = 2024, update_factor: float = UPDATE_FACTOR, prior_divisor: float = PRIOR_DIVISOR):
+        self.season = season
+        self.update_factor = update_factor
+        self.prior_divisor = prior_divisor
+        # Held while EPAs are being changed, so readers never see a half-applied update
+        self.__lock = threading.RLock()
+        # What the engine is doing and how far along it is. Replaced or updated in place without the lock,
+        # so get_status can be read while a load holds it.
+        self.__status = {"phase": "unloaded", "started": None, "finished": None, "rows_loaded": 0, "rows_total": 0,
+                         "matches_replayed": 0, "matches_total": 0, "error": None}
+        # The engine rebuilding the season while this one keeps serving its EPAs (see update), or None
+        self.__rebuilding = None
+        self.__reset()
+
+    def __reset(self):
+        self.__history = EpaHistory(len(COMPONENTS))
+        # Current EPAs, one row per history slot (row = slot + 1) and one column per component.
+        # Row 0 stands in for empty alliance positions and is always zero.
+        self.__ratings = np.zeros((1, len(COMPONENTS)), dtype=np.float64)
+        self.__prior = np.zeros(len(COMPONENTS), dtype=np.float64)
+        # The start and end time of the matches the prior was averaged over, and their average score in every component
+        self.__prior_window = (0.0, 0.0)
+        self.__window_average = np.zeros(len(COMPONENTS), dtype=np.float64)
+
+        # Key = red MatchKey of every match with scores for both alliances,
+        # value = (red teams on the field, blue teams on the field, red score - blue score for every component)
+        self.__results = {}
+
+        # Every applied match in the order it was applied. __applied_order holds sort keys (see __order_key)
+        # and __applied_keys the red MatchKeys, index for index; __applied_at maps a key to its sort key.
+        self.__applied_order = []
+        self.__applied_keys = []
+        self.__applied_at = {}
+
+        # The whole season compiled for the replay (see __compile), or None if __results changed since
+        self.__compiled = None
+        # Current rankings by component column (see __ranking) and the spread of match margins (see __spread),
+        # dropped whenever the ratings change
+        self.__ratings_changed()
+
+        # The newest event version (see database.get_event_versions) that has been applied
+        self.__version = 0
+        self.__done_initializing = False
+        self.__season_loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        """
+        True once the season's EPAs have been computed (or restored from a snapshot).
+        """
+        return self.__season_loaded
+
+    @property
+    def revision(self) -> int:
+        """
+        Changes whenever any EPA changes, so results computed from the EPAs can be cached until it does.
+        """
+        return self.__revision
+
+    def __ratings_changed(self):
+        self.__rankings = {}
+        self.__margin_spread = None
+        self.__revision = next(self.__revisions)
+
+    @property
+    def prior_window(self) -> tuple[float, float]:
+        """
+        The start and end time of the matches the season's initial EPAs were averaged over.
+        """
+        return self.__prior_window
+
+    def load(self) -> bool:
+        """
+        Gets the season's EPAs ready (see `warm_start`) unless they already are.
+
+        Returns True if they had to be loaded.
+        """
+        if self.__season_loaded:
+            return False
+        with self.__lock:
+            # Another thread may have loaded them while this one waited
+            if self.__season_loaded:
+                return False
+            try:
+                self.warm_start()
+            except Exception as e:
+                self.__set_phase("failed", finished=clock.time(), error=str(e))
+                raise
+            return True
+
+    def unload(self):
+        """
+        Frees the season's EPAs. They're loaded again the next time they're needed.
+        """
+        with self.__lock:
+            self.__reset()
+            self.__set_phase("unloaded", started=None, finished=None, rows_loaded=0, rows_total=0, matches_replayed=0, matches_total=0)
+
+    def __set_phase(self, phase: str, **progress):
+        self.__status = dict(self.__status, phase=phase, **progress)
+
+    def __begin(self, phase: str):
+        self.__set_phase(phase, started=clock.time(), finished=None, rows_loaded=0, rows_total=0, matches_replayed=0, matches_total=0, error=None)
+
+    def get_status(self) -> dict:
+        """
+        Returns what the engine is doing, as a dictionary with:
+            phase: unloaded, one of LOADING_PHASES, initialized (see `init`), ready or failed
+            ready: whether there are EPAs to serve. Stays True while an update rebuilds the season on the side,
+                   since the current EPAs are served until the rebuilt ones replace them.
+            reloading: True while an update rebuilds the season (the phase and progress are then the rebuild's)
+            started, finished: when the current (or last) load started and finished, in epoch seconds
+            rows_loaded, rows_total: database rows read so far and to read in total
+            matches_replayed, matches_total: matches replayed so far and to replay in total
+            eta: a rough estimate of the seconds left (from the rows and matches done so far), or None if unknown
+            error: why the last load failed, if it did
+        """
+        rebuilding = self.__rebuilding
+        status = dict(rebuilding.__status if rebuilding is not None else self.__status)
+        status["ready"] = self.__season_loaded
+        status["reloading"] = rebuilding is not None
+        status["eta"] = None
+        done = status["rows_loaded"] + status["matches_replayed"]
+        total = status["rows_total"] + status["matches_total"]
+        if status["phase"] in LOADING_PHASES and status["started"] is not None and done > 0:
+            status["eta"] = max(0.0, (clock.time() - status["started"]) * (total - done) / done)
+        return status
+
+    @staticmethod
+    def __component(component: str) -> int:
+        if component not in COMPONENTS:
+            raise ValueError(f"component must be one of {', '.join(COMPONENT_NAMES)}")
+        return COMPONENT_NAMES.index(component)
+
+    @staticmethod
+    def __order_key(match_key: MatchKey) -> tuple:
+        """
+        Matches are applied by start time. Matches that started at the same second are ordered by their identity,
+        so replaying from scratch and rewinding always apply them in the same order.
+        """
+        return (match_key.start_time, match_key.event_code, match_key.match_level, match_key.match_series, match_key.match_number)
+
+    @staticmethod
+    def __match_results(teams: dict[MatchKey, dict[int, tuple[str, bool]]], scores: database.ScoreColumns) -> dict[MatchKey, tuple[tuple[int], tuple[int], tuple[int]]]:
+        """
+        Pairs up both alliances of every match. Matches without scores for both alliances (e.g. still being played) are left out.
+
+        Returns a dictionary where key = red MatchKey and value = (red teams on the field, blue teams on the field, red score - blue score for every component).
+        """
+        columns = [scores.column(field) for field in COMPONENTS.values()]
+        results = {}
+        for (red_match_key, red_teams) in teams.items():
+            if red_match_key.alliance != "Red":
+                continue
+            blue_match_key = red_match_key.opposite()
+            red_row, blue_row = scores.index.get(red_match_key), scores.index.get(blue_match_key)
+            if red_row is None or blue_row is None or blue_match_key not in teams:
+                continue
+            results[red_match_key] = (tuple(team for (team, (_, on_field)) in red_teams.items() if on_field),
+                                      tuple(team for (team, (_, on_field)) in teams[blue_match_key].items() if on_field),
+                                      tuple(int(column[red_row]) - int(column[blue_row]) for column in columns))
+        return results
+
+    @staticmethod
+    def __find_prior_window(start_times: list[float]) -> tuple[float, float]:
+        """
+        FRC starts EPAs from Week 1 scores. FTC has only a few events in its first weeks, so the prior comes from
+        the season's first month of matches instead. Matches added later in the season don't move the window.
+
+        Returns the (start, end) time of the window.
+        """
+        if not start_times:
+            return (0.0, 0.0)
+        start = float(min(start_times))
+        return (start, start + PRIOR_WINDOW)
+
+    def init(self):
+        """
+        Performs initialization (loads matches from database, initializes all EPAs to default values).
+
+        Must be called before doing any EPA calculations. The database must already be initialized (see database.init).
+        """
+        self.__begin("counting_rows")
+        counts = database.get_row_counts(self.season)
+        self.__set_phase("loading_matches", rows_total=counts["matches"] + counts["scores"])
+
+        # Read the version before loading, so anything ingested while loading is applied again by update()
+        version = max(database.get_event_versions(self.season).values(), default=0)
+        teams = database.get_match_teams(season=self.season, progress=lambda read: self.__status.update(rows_loaded=read)) # should be sorted by time, not filtered by event code
+        self.__set_phase("loading_scores", rows_loaded=counts["matches"])
+        scores = database.get_match_score_columns(season=self.season, progress=lambda read: self.__status.update(rows_loaded=counts["matches"] + read))
+        self.__set_phase("compiling", rows_loaded=counts["matches"] + counts["scores"])
+
+        scored = [key for key in teams.keys() if key in scores.index]
+        (window_start, window_end) = self.__find_prior_window([key.start_time for key in scored])
+
+        # FRC: average of Week 1, guess for FTC: average of the first month
+        window_rows = [scores.index[key] for key in scored if window_start <= key.start_time <= window_end]
+        average_window_scores = np.array([np.average(scores.column(field)[window_rows]) if window_rows else 0.0 for field in COMPONENTS.values()], dtype=np.float64)
+        results = self.__match_results(teams, scores)
+
+        with self.__lock:
+            self.__reset()
+            # Set initial EPA to average "Week 1" score / PRIOR_DIVISOR
+            self.__prior = average_window_scores / self.prior_divisor
+            self.__prior_window = (window_start, window_end)
+            self.__window_average = average_window_scores
+            self.__results = results
+            # Compiled up front, so season_epa() only has to run the replay
+            self.__compiled = self.__compile(sorted(results.keys(), key=self.__order_key))
+            self.__version = version
+            self.__done_initializing = True
+            self.__set_phase("initialized")
+
+    def __rows(self, teams: list[int]) -> dict[int, int]:
+        """
+        Returns a dictionary where key = team and value = its rating row, giving teams that haven't been seen yet a row that starts at the prior.
+        """
+        rows = {team: self.__history.slot(team) + 1 for team in teams}
+        ratings = self.__ratings
+        if self.__history.slots + 1 > len(ratings):
+            # Grown by doubling, so adding a few teams at a time stays cheap
+            grown = np.empty((max(self.__history.slots + 1, 2 * len(ratings)), len(COMPONENTS)), dtype=np.float64)
+            grown[:len(ratings)] = ratings
+            grown[len(ratings):] = self.__prior
+            self.__ratings = grown
+        return rows
+
+    def __compile(self, match_keys: list[MatchKey]) -> tuple[list[MatchKey], np.ndarray, np.ndarray, list[np.ndarray]]:
+        """
+        Turns matches into integer arrays the replay can work on in bulk.
+
+        Args:
+            match_keys: red MatchKeys, in start time order
+
+        Returns (match keys, rows, margins, levels): the rating rows of the teams in every alliance position (0 = nobody), of shape
+        (matches, 2 alliances (red, blue), largest alliance), red score - blue score for every component, of shape (matches, components),
+        and the matches that can be applied together (see __levels).
+        """
+        results = [self.__results[match_key] for match_key in match_keys]
+        width = max([len(team_list) for result in results for team_list in result[:2]] + [1])
+        padding = [(None,) * i for i in range(width + 1)]
+        teams = [team for (red_teams, blue_teams, _) in results
+                 for team in red_teams + padding[width - len(red_teams)] + blue_teams + padding[width - len(blue_teams)]]
+        # In order of first appearance, so teams get their slots in the order they first played
+        rows = self.__rows([team for team in dict.fromkeys(teams) if team is not None])
+        rows[None] = 0
+        rows = np.fromiter(map(rows.__getitem__, teams), dtype=np.intp, count=len(teams)).reshape(len(results), 2, width)
+        margins = np.fromiter(chain.from_iterable(margins for (_, _, margins) in results), dtype=np.float64, count=len(results) * len(COMPONENTS)).reshape(len(results), len(COMPONENTS))
+        return match_keys, rows, margins, self.__levels(rows)
+
+    @staticmethod
+    def __levels(rows: np.ndarray) -> list[np.ndarray]:
+        """
+        Groups compiled matches into levels that can each be applied at once. A match goes one level after the last match
+        any of its teams played, so no team plays twice in a level and every team's matches stay in order. Applying
+        level by level gives exactly the EPAs of applying the matches one by one.
+
+        Returns the indices of the matches in every level, in order.
+        """
+        last = [-1] * (int(rows.max(initial=0)) + 1)
+        levels = []
+        for match_rows in rows.reshape(len(rows), 2 * rows.shape[2]).tolist():
+            # Row 0 (nobody) never holds anyone back
+            last[0] = -1
+            level = max(map(last.__getitem__, match_rows)) + 1
+            for row in match_rows:
+                last[row] = level
+            levels.append(level)
+        order = np.argsort(levels, kind="stable")
+        return np.split(order, np.flatnonzero(np.diff(np.asarray(levels)[order])) + 1)
+
+    def __replay(self, compiled: tuple[list[MatchKey], np.ndarray, np.ndarray, list[np.ndarray]]):
+        """
+        Applies compiled matches (see __compile) after the matches already applied, updating every component at once.
+        """
+        (match_keys, rows, margins, levels) = compiled
+        if not match_keys:
+            return
+
+        width = rows.shape[2]
+        # Only a full replay (see season_epa) reports its progress
+        progress = None
+        if self.__status["phase"] == "replaying":
+            status = self.__status
+            def progress(replayed: int):
+                status["matches_replayed"] += replayed
+        new_epas = replay_levels(self.__ratings, rows, margins, levels, update_factor=self.update_factor, progress=progress)
+
+        # Record the new EPAs team by team: every (row, match) entry, sorted by row and then by match
+        first = len(self.__applied_keys)
+        positions = np.repeat(np.arange(first, first + len(rows), dtype=np.int32), 2 * width)
+        (rows, epas) = (rows.ravel(), new_epas.reshape(-1, len(COMPONENTS)))
+        played = rows != 0
+        rows, positions, epas = rows[played], positions[played], epas[played]
+        order = np.lexsort((positions, rows))
+        rows, positions, epas = rows[order], positions[order], epas[order]
+        times = np.array([match_key.start_time for match_key in match_keys], dtype=np.float64)[positions - first]
+
+        bounds = (np.flatnonzero(np.diff(rows)) + 1).tolist()
+        for (start, end) in zip([0] + bounds, bounds + [len(rows)]):
+            self.__history.extend(int(rows[start]) - 1, array("i", positions[start:end].tobytes()),
+                                  array("d", times[start:end].tobytes()), array("d", epas[start:end].tobytes()))
+
+        self.__ratings_changed()
+        order_keys = list(map(self.__order_key, match_keys))
+        self.__applied_order.extend(order_keys)
+        self.__applied_keys.extend(match_keys)
+        self.__applied_at.update(zip(match_keys, order_keys))
+
+    def calc_epa(self, match_key: MatchKey):
+        """
+        Calculates the EPA updates from a single match. Matches must be applied in start time order.
+
+        Args:
+            match_key: the key of the relevant match
+
+        Returns nothing.
+        """
+        with self.__lock:
+            self.__replay(self.__compile([match_key if match_key.alliance == "Red" else match_key.opposite()]))
+
+    def __rewind(self, position: int):
+        """
+        Undoes every applied match from `position` onwards, putting each team back to the EPAs it had before them.
+        """
+        if position >= len(self.__applied_keys):
+            return
+
+        affected = set()
+        for match_key in self.__applied_keys[position:]:
+            (red_teams, blue_teams, _) = self.__results[match_key]
+            affected.update(red_teams)
+            affected.update(blue_teams)
+            del self.__applied_at[match_key]
+
+        for team in affected:
+            slot = self.__history.find(team)
+            epas = self.__history.truncate(slot, position)
+            # Back to the prior if the team has no matches left, as if it had never played
+            self.__ratings[slot + 1] = epas if epas is not None else self.__prior
+
+        del self.__applied_order[position:]
+        del self.__applied_keys[position:]
+        self.__ratings_changed()
+
+    def apply_results(self, changed: dict[MatchKey, tuple]) -> int:
+        """
+        Applies new, corrected or removed matches. Only matches from the earliest affected one onwards are replayed,
+        so a new match at the end of the season costs one update and a corrected older match costs a replay of everything after it.
+
+        Args:
+            changed: dictionary where key = red MatchKey and value = (red teams on the field, blue teams on the field, red score - blue score for every component),
+                     or None to remove the match
+
+        Returns the number of matches replayed.
+        """
+        with self.__lock:
+            self.__compiled = None
+            if not self.__season_loaded:
+                # The next season_epa() picks them up
+                for (match_key, result) in changed.items():
+                    self.__results.pop(match_key, None)
+                    if result is not None:
+                        self.__results[match_key] = result
+                return 0
+
+            position = len(self.__applied_keys)
+            for (match_key, result) in changed.items():
+                if match_key in self.__applied_at:
+                    position = min(position, bisect.bisect_left(self.__applied_order, self.__applied_at[match_key]))
+                if result is not None:
+                    position = min(position, bisect.bisect_left(self.__applied_order, self.__order_key(match_key)))
+
+            self.__rewind(position)
+
+            for (match_key, result) in changed.items():
+                # Removed first, so a key with a corrected start time replaces the old key object
+                self.__results.pop(match_key, None)
+                if result is not None:
+                    self.__results[match_key] = result
+
+            pending = sorted((match_key for match_key in self.__results if match_key not in self.__applied_at), key=self.__order_key)
+            self.__replay(self.__compile(pending))
+            return len(pending)
+
+    def update(self) -> int:
+        """
+        Applies every match ingested since the last update (or since init), without replaying the whole season.
+
+        Returns the number of matches replayed.
+        """
+        if not self.__season_loaded:
+            return 0
+
+        versions = database.get_event_versions(self.season, since=self.__version)
+        if not versions:
+            return 0
+
+        changed = {}
+        for event_code in versions:
+            results = self.__match_results(database.get_match_teams(event_code=event_code, season=self.season),
+                                           database.get_match_score_columns(event_code=event_code, season=self.season))
+            with self.__lock:
+                for (match_key, result) in results.items():
+                    if self.__results.get(match_key) != result or self.__applied_at.get(match_key) != self.__order_key(match_key):
+                        changed[match_key] = result
+                for match_key in self.__results:
+                    if match_key.event_code == event_code and match_key not in results:
+                        changed[match_key] = None
+
+        with self.__lock:
+            (_, window_end) = self.__prior_window
+            reload = not self.__results or any(match_key.start_time <= window_end for match_key in changed)
+        if reload:
+            # The prior comes from these matches, so every EPA changes. The season is rebuilt on the side and swapped
+            # in at the end, so readers keep getting the current EPAs meanwhile instead of waiting for the reload.
+            rebuilt = self.__rebuilding = EpaEngine(self.season, update_factor=self.update_factor, prior_divisor=self.prior_divisor)
+            try:
+                rebuilt.init()
+                rebuilt.season_epa()
+                self.__adopt(rebuilt)
+            finally:
+                self.__rebuilding = None
+            return len(rebuilt.__results)
+
+        replayed = self.apply_results(changed)
+        self.__version = max(self.__version, *versions.values())
+        return replayed
+
+    def __adopt(self, other: "EpaEngine"):
+        """
+        Takes over another engine's EPAs (and everything they were computed from) in one step under the lock.
+        """
+        with self.__lock:
+            (self.__history, self.__ratings, self.__prior) = (other.__history, other.__ratings, other.__prior)
+            (self.__prior_window, self.__window_average) = (other.__prior_window, other.__window_average)
+            (self.__results, self.__compiled) = (other.__results, other.__compiled)
+            (self.__applied_order, self.__applied_keys, self.__applied_at) = (other.__applied_order, other.__applied_keys, other.__applied_at)
+            (self.__version, self.__done_initializing, self.__season_loaded) = (other.__version, other.__done_initializing, other.__season_loaded)
+            self.__ratings_changed()
+
+    def season_epa(self):
+        """
+        Calculates the EPA by analyzing every match stored in the database.
+        """
+        with self.__lock:
+            self.__rewind(0)
+            if self.__compiled is None:
+                self.__compiled = self.__compile(sorted(self.__results.keys(), key=self.__order_key))
+            self.__set_phase("replaying", matches_replayed=0, matches_total=len(self.__compiled[0]))
+            self.__replay(self.__compiled)
+            self.__season_loaded = True
+            self.__set_phase("ready", finished=clock.time())
+
+    def export_season(self, scores: database.ScoreColumns = None) -> dict[str, np.ndarray]:
+        """
+        Returns the season compiled for the replay as plain arrays, so it can be replayed elsewhere with `replay_levels`
+        (e.g. under other parameters by tools/backtest_epa.py). Call `init` first.
+
+        Args:
+            scores (optional): the season's scores (see database.get_match_score_columns), to also return every alliance's actual score
+
+        Returns a dictionary with:
+            rows, margins: as taken by replay_levels, for every match in the order they're applied
+            level_order, level_bounds: the matches of every level back to back, and where each level starts (plus the end)
+            start_times: every match's start time
+            window_average: the average score of every component over the prior window (the prior before dividing)
+            scores: with `scores`, every alliance's score, of shape (matches, 2 alliances (red, blue), components)
+        """
+        with self.__lock:
+            if self.__compiled is None:
+                self.__compiled = self.__compile(sorted(self.__results.keys(), key=self.__order_key))
+            (match_keys, rows, margins, levels) = self.__compiled
+            season = {"rows": rows, "margins": margins,
+                      "level_order": np.concatenate(levels) if levels else np.zeros(0, dtype=np.intp),
+                      "level_bounds": np.cumsum([0] + [len(level) for level in levels]),
+                      "start_times": np.array([match_key.start_time for match_key in match_keys], dtype=np.float64),
+                      "window_average": self.__window_average.copy()}
+            if scores is not None:
+                alliances = [[scores.index[match_key], scores.index[match_key.opposite()]] for match_key in match_keys]
+                columns = np.stack([scores.column(field) for field in COMPONENTS.values()], axis=-1)
+                season["scores"] = columns[np.array(alliances, dtype=np.intp).reshape(len(match_keys), 2)].astype(np.float64)
+            return season
+
+    def save_snapshot(self, path: str = None) -> Path:
+        """
+        Saves the current EPA state (ratings, every team's history, the applied matches and the last applied event version)
+        to a compact NumPy file, so the next process can start from it instead of replaying the season.
+
+        Args:
+            path (optional): where to write the snapshot, defaults to `snapshot_file(season)`
+
+        Returns the path written to, or None if the season hasn't been computed yet.
+        """
+        path = Path(path) if path is not None else snapshot_file(self.season)
+
+        with self.__lock:
+            if not self.__season_loaded:
+                return None
+
+            keys = self.__applied_keys
+            events = sorted({match_key.event_code for match_key in keys})
+            levels = sorted({match_key.match_level for match_key in keys})
+            event_index = {event_code: i for (i, event_code) in enumerate(events)}
+            level_index = {level: i for (i, level) in enumerate(levels)}
+
+            # Alliances are padded to the largest one seen with -1
+            width = max([len(team_list) for match_key in keys for team_list in self.__results[match_key][:2]], default=0)
+            red = np.full((len(keys), width), -1, dtype=np.int32)
+            blue = np.full((len(keys), width), -1, dtype=np.int32)
+            for (i, match_key) in enumerate(keys):
+                (red_teams, blue_teams, _) = self.__results[match_key]
+                red[i, :len(red_teams)] = red_teams
+                blue[i, :len(blue_teams)] = blue_teams
+
+            # Histories are stored back to back, team by team, as (applied match index, EPAs after it)
+            teams = sorted(self.__history.teams())
+            histories = [self.__history.get(team) for team in teams]
+
+            arrays = {
+                "format": np.array([SNAPSHOT_FORMAT, self.season, self.__version], dtype=np.int64),
+                "components": np.array(COMPONENT_NAMES, dtype=np.str_),
+                "prior": self.__prior.copy(),
+                "prior_window": np.array(self.__prior_window, dtype=np.float64),
+                "window_average": self.__window_average.copy(),
+                "parameters": np.array([self.update_factor, self.prior_divisor], dtype=np.float64),
+                "events": np.array(events, dtype=np.str_),
+                "levels": np.array(levels, dtype=np.str_),
+                "match_event": np.array([event_index[k.event_code] for k in keys], dtype=np.int32),
+                "match_level": np.array([level_index[k.match_level] for k in keys], dtype=np.int8),
+                "match_series": np.array([k.match_series for k in keys], dtype=np.int32),
+                "match_number": np.array([k.match_number for k in keys], dtype=np.int32),
+                "match_start": np.array([k.start_time for k in keys], dtype=np.int64),
+                "match_margin": np.array([self.__results[k][2] for k in keys], dtype=np.int32).reshape(len(keys), len(COMPONENTS)),
+                "match_red": red,
+                "match_blue": blue,
+                "teams": np.array(teams, dtype=np.int32),
+                "history_offsets": np.cumsum([0] + [len(matches) for (matches, _, _) in histories], dtype=np.int64),
+                "history_match": np.concatenate([np.frombuffer(matches, dtype=np.int32) for (matches, _, _) in histories] or [np.zeros(0, dtype=np.int32)]),
+                "history_epa": np.concatenate([np.frombuffer(epas, dtype=np.float64) for (_, _, epas) in histories] or [np.zeros(0, dtype=np.float64)]).reshape(-1, len(COMPONENTS)),
+            }
+
+        # Written to a temporary file first, so a crash never leaves a half-written snapshot behind
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+        return path
+
+    def load_snapshot(self, path: str = None) -> bool:
+        """
+        Restores the EPA state saved by `save_snapshot`. Call `update` afterwards (or start the updater) to catch up
+        on matches ingested since the snapshot was taken.
+
+        Args:
+            path (optional): the snapshot to load, defaults to `snapshot_file(season)`
+
+        Returns True if the snapshot was loaded, False if there is no usable snapshot (missing, another format, season, set
+        of components or parameters, or newer than the database, e.g. because the database was rebuilt).
+        """
+        season = self.season
+        path = Path(path) if path is not None else snapshot_file(season)
+        if not path.exists():
+            return False
+
+        try:
+            with np.load(path, allow_pickle=False) as snapshot:
+                arrays = {name: snapshot[name] for name in snapshot.files}
+        except Exception as e:
+            print(f"Error reading EPA snapshot {path}: {e}")
+            return False
+
+        (snapshot_format, snapshot_season, version) = arrays["format"].tolist()
+        if snapshot_format != SNAPSHOT_FORMAT or snapshot_season != season or arrays["components"].tolist() != COMPONENT_NAMES:
+            return False
+        if arrays["parameters"].tolist() != [self.update_factor, self.prior_divisor]:
+            return False
+        if version > max(database.get_event_versions(season).values(), default=0):
+            return False
+
+        events, levels = arrays["events"].tolist(), arrays["levels"].tolist()
+        keys = [MatchKey(events[event], levels[level], series, number, "Red", season=season, start_time=start)
+                for (event, level, series, number, start) in zip(arrays["match_event"].tolist(), arrays["match_level"].tolist(),
+                                                                 arrays["match_series"].tolist(), arrays["match_number"].tolist(),
+                                                                 arrays["match_start"].tolist())]
+        results = {match_key: (tuple(team for team in red if team >= 0), tuple(team for team in blue if team >= 0), tuple(margins))
+                   for (match_key, red, blue, margins) in zip(keys, arrays["match_red"].tolist(), arrays["match_blue"].tolist(), arrays["match_margin"].tolist())}
+        order = [self.__order_key(match_key) for match_key in keys]
+
+        prior = arrays["prior"].astype(np.float64)
+        offsets = arrays["history_offsets"].tolist()
+        history_match = arrays["history_match"].astype(np.int32)
+        history_time = arrays["match_start"].astype(np.float64)[history_match]
+        history_epa = arrays["history_epa"].astype(np.float64)
+        history = EpaHistory(len(COMPONENTS))
+        teams = arrays["teams"].tolist()
+        ratings = np.zeros((len(teams) + 1, len(COMPONENTS)), dtype=np.float64)
+        for (i, team) in enumerate(teams):
+            (start, end) = (offsets[i], offsets[i + 1])
+            if start == end:
+                continue
+            slot = history.slot(team)
+            history.extend(slot, array("i", history_match[start:end].tobytes()), array("d", history_time[start:end].tobytes()), array("d", history_epa[start:end].tobytes()))
+            ratings[slot + 1] = history_epa[end - 1]
+
+        with self.__lock:
+            self.__reset()
+            self.__prior = prior
+            self.__prior_window = tuple(arrays["prior_window"].tolist())
+            self.__window_average = arrays["window_average"].astype(np.float64)
+            self.__ratings = ratings[:history.slots + 1]
+            self.__history = history
+            self.__results = results
+            self.__applied_order, self.__applied_keys, self.__applied_at = order, keys, dict(zip(keys, order))
+            self.__version = version
+            self.__done_initializing = True
+            self.__season_loaded = True
+            self.__set_phase("ready", finished=clock.time())
+        return True
+
+    def warm_start(self) -> bool:
+        """
+        Gets EPAs ready as fast as possible: loads the latest snapshot and catches up from the database,
+        or, without a usable snapshot, replays the whole season and saves a snapshot for next time.
+
+        Returns True if a snapshot was used.
+        """
+        with self.__lock:
+            self.__begin("loading_snapshot")
+            if self.load_snapshot():
+                self.__set_phase("catching_up")
+                self.update()
+                self.__set_phase("ready", finished=clock.time())
+                return True
+
+            self.init()
+            self.season_epa()
+            self.__set_phase("saving_snapshot")
+            self.save_snapshot()
+            self.__set_phase("ready", finished=clock.time())
+            return False
+
+    def get_epa(self, team: int, time: float = None, component: str = "total"):
+        """
+        Gets the EPA of a team.
+
+        Args:
+            team: the team whose EPA should be retrieved
+            time (optional): if set, will retrieve the team's latest EPA as of that time. if unset, will get the team's latest EPA.
+            component (optional): which EPA to get: total (default), auto, teleop or endgame
+
+        Returns a float storing the EPA of the team.
+        """
+        if not self.__season_loaded:
+            return None
+
+        column = self.__component(component)
+        with self.__lock:
+            if time == None:
+                # Teams that haven't played are at the prior
+                slot = self.__history.find(team)
+                return float(self.__ratings[slot + 1, column] if slot is not None else self.__prior[column])
+            else:
+                epa = self.__history.at(team, time, column)
+                return epa if epa is not None else 0
+
+    def get_component_epas(self, team: int, time: float = None) -> dict[str, float]:
+        """
+        Gets every component of a team's EPA.
+
+        Args:
+            team: the team whose EPAs should be retrieved
+            time (optional): if set, will retrieve the team's EPAs as of that time. if unset, will get the team's latest EPAs.
+
+        Returns a dict where the key is the component (total, auto, teleop, endgame) and the value is the EPA.
+        """
+        if not self.__season_loaded: return {}
+        with self.__lock:
+            return {component: self.get_epa(team, time, component) for component in COMPONENT_NAMES}
+
+    def get_all_epas(self, team: int, component: str = "total"):
+        """
+        Gets all historical EPAs for a team.
+
+        Args:
+            team: the team whose EPA should be retrieved
+            component (optional): which EPA to get: total (default), auto, teleop or endgame
+
+        Returns a dict where the key is the time and the value is the EPA at that time.
+        """
+        if not self.__season_loaded: return {}
+        column = self.__component(component)
+        with self.__lock:
+            history = self.__history.get(team)
+            if history is None:
+                return {}
+            (_, times, epas) = history
+            # Start times are whole seconds
+            return {int(t): epa for (t, epa) in zip(times, epas[column::len(COMPONENTS)])}
+
+    def predict(self, red: list[list[int]], blue: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predicts many matches at once from the current EPAs. An alliance's predicted score is the sum of its teams' EPAs,
+        and teams that haven't played yet count at the prior.
+
+        Red's win probability uses Statbotics' formula, 1 / (1 + 10^(-5/8 * predicted margin / score stddev)), with the score
+        stddev estimated from this season's total margins (margin stddev / √2, as the alliances score independently).
+
+        Args:
+            red: the teams on the red alliance of every match
+            blue: the teams on the blue alliance of every match, in the same order
+
+        Returns (predicted scores of shape (matches, 2 alliances (red, blue), components), red's win probability for every match).
+        """
+        with self.__lock:
+            width = max([len(teams) for teams in chain(red, blue)] + [1])
+            # One extra row at the end holds the prior, for teams that haven't played
+            ratings = np.vstack([self.__ratings, self.__prior])
+            find = self.__history.find
+            rows = np.zeros((len(red), 2, width), dtype=np.intp)
+            for (i, alliances) in enumerate(zip(red, blue)):
+                for (j, teams) in enumerate(alliances):
+                    rows[i, j, :len(teams)] = [slot + 1 if slot is not None else len(ratings) - 1 for slot in map(find, teams)]
+
+            scores = ratings[rows].sum(axis=2)
+            margins = scores[:, 0, 0] - scores[:, 1, 0]
+            return scores, 1 / (1 + 10 ** (-5/8 * margins / self.__spread()))
+
+    def __spread(self) -> float:
+        """
+        Estimates the stddev of alliance scores from the stddev of every match's total margin. Kept until the ratings change.
+        """
+        if self.__margin_spread is None:
+            margins = np.fromiter((margins[0] for (_, _, margins) in self.__results.values()), dtype=np.float64, count=len(self.__results))
+            spread = float(margins.std() / np.sqrt(2)) if len(margins) > 1 else 0.0
+            # No spread (e.g. a single match) would make every prediction certain, so fall back to one point
+            self.__margin_spread = spread if spread > 0 else 1.0
+        return self.__margin_spread
+
+    def get_memory_usage(self) -> dict[str, int]:
+        """
+        Returns the approximate bytes used by the season's EPA history store, current ratings, match results and
+        compiled season, their total, and the number of teams with EPAs.
+        """
+        with self.__lock:
+            compiled = 0
+            if self.__compiled is not None:
+                (_, rows, margins, levels) = self.__compiled
+                compiled = rows.nbytes + margins.nbytes + sum(level.nbytes for level in levels)
+            usage = {"history": self.__history.nbytes, "ratings": self.__ratings.nbytes, "results": self.__results_nbytes(), "compiled": compiled}
+            usage["total"] = sum(usage.values())
+            usage["teams"] = len(self.__history)
+            return usage
+
+    def __results_nbytes(self) -> int:
+        """
+        Estimates the size of the match results and the applied match lists from a sample of matches,
+        since measuring every object would take about as long as a replay.
+        """
+        sample = list(self.__results.items())[:100]
+        containers = sys.getsizeof(self.__results) + sys.getsizeof(self.__applied_at) + sys.getsizeof(self.__applied_order) + sys.getsizeof(self.__applied_keys)
+        if not sample:
+            return containers
+        # The key, the result, both alliances, the margins and the key's sort key
+        per_match = sum(sys.getsizeof(key) + sys.getsizeof(result) + sum(sys.getsizeof(part) for part in result) + sys.getsizeof(self.__order_key(key))
+                        for (key, result) in sample) / len(sample)
+        return containers + int(per_match * len(self.__results))
+
+    def get_ranks(self, time: float = None, component: str = "total"):
+        """
+        Returns a dictionary where the key is the team and the value is a tuple of (their EPA rank, their EPA).
+
+        Args:
+            time (optional): if set, ranks every team that had played by then by their EPA as of that time (e.g. the leaderboard
+                             the week before an event). if unset, ranks by the latest EPAs.
+            component (optional): which EPA to rank by: total (default), auto, teleop or endgame
+        """
+        if not self.__season_loaded: return {}
+        column = self.__component(component)
+        with self.__lock:
+            if time == None:
+                (teams, epas, _) = self.__ranking(column)
+                return {team: (idx + 1, epa) for (idx, (team, epa)) in enumerate(zip(teams, epas))}
+            else:
+                epas = []
+                for team in self.__history.teams():
+                    epa = self.__history.at(team, time, column)
+                    if epa is not None:
+                        epas.append((team, epa))
+                return {team: (idx + 1, epa) for (idx, (team, epa)) in enumerate(sorted(epas, key=lambda t: t[1], reverse=True))}
+
+    def __ranking(self, column: int) -> tuple[list[int], list[float], dict[int, int]]:
+        """
+        Ranks every team that has played by its current EPA in one component column. Kept until the ratings change,
+        so pages of the leaderboard and batches of teams don't sort the whole season each time.
+
+        Returns (teams best first, their EPAs, a dictionary where key = team and value = rank).
+        """
+        ranking = self.__rankings.get(column)
+        if ranking is None:
+            teams = self.__history.teams()
+            epas = self.__ratings[[self.__history.find(team) + 1 for team in teams], column]
+            # Ties keep the history's order, like sorting the (team, EPA) pairs would
+            order = np.argsort(-epas, kind="stable")
+            teams = [teams[i] for i in order.tolist()]
+            ranking = self.__rankings[column] = (teams, epas[order].tolist(), {team: rank for (rank, team) in enumerate(teams, 1)})
+        return ranking
+
+    def get_leaderboard(self, offset: int = 0, limit: int = 100, time: float = None, component: str = "total") -> dict:
+        """
+        Returns one page of the EPA rankings (see `get_ranks`), as a dictionary with:
+            teams: the number of ranked teams
+            ranks: up to `limit` dictionaries with the team, rank, epa and percentile, starting at rank `offset` + 1
+
+        Percentile is rank / number of ranked teams (near 0 = best, 1 = last).
+
+        Args:
+            offset (optional): how many of the best teams to skip
+            limit (optional): the most teams to return
+            time (optional): if set, ranks by the EPAs as of that time. if unset, ranks by the latest EPAs.
+            component (optional): which EPA to rank by: total (default), auto, teleop or endgame
+        """
+        if not self.__season_loaded: return {"teams": 0, "ranks": []}
+        column = self.__component(component)
+        with self.__lock:
+            if time == None:
+                (teams, epas, _) = self.__ranking(column)
+            else:
+                ranks = self.get_ranks(time=time, component=component)
+                (teams, epas) = (list(ranks.keys()), [epa for (_, epa) in ranks.values()])
+            page = range(offset, min(offset + limit, len(teams)))
+            return {"teams": len(teams),
+                    "ranks": [{"team": teams[i], "rank": i + 1, "epa": epas[i], "percentile": (i + 1) / len(teams)} for i in page]}
+
+    def get_teams(self, teams: list[int], component: str = "total", history: int = 0) -> dict[int, dict]:
+        """
+        Gets the current EPA, rank and percentile (see `get_leaderboard`) of many teams at once.
+
+        Args:
+            teams: the teams to look up
+            component (optional): which EPA to get and rank by: total (default), auto, teleop or endgame
+            history (optional): if set, also returns up to this many historical EPAs per team, evenly spread
+                                over its matches (always including the latest)
+
+        Returns a dictionary where key = team and value = a dictionary with epa, rank, percentile (and history, as in
+        `get_all_epas`). Teams that haven't played are left out.
+        """
+        if not self.__season_loaded: return {}
+        column = self.__component(component)
+        with self.__lock:
+            (ranked, _, rank_of) = self.__ranking(column)
+            found = {}
+            for team in teams:
+                rank = rank_of.get(team)
+                if rank is None:
+                    continue
+                found[team] = {"epa": float(self.__ratings[self.__history.find(team) + 1, column]), "rank": rank, "percentile": rank / len(ranked)}
+                if history > 0:
+                    (_, times, epas) = self.__history.get(team)
+                    picked = np.unique(np.linspace(len(times) - 1, 0, min(history, len(times))).round().astype(np.int64)).tolist()
+                    found[team]["history"] = {int(times[i]): epas[i * len(COMPONENTS) + column] for i in picked}
+            return found
+
+# Every season's engine, least recently used first. The lock is never held while waiting for an engine
+# (saving, unloading or measuring one), so a busy season doesn't block requests for every other season.
+__engines = OrderedDict()
+__engines_lock = threading.Lock()
+# Loading a season evicts the least recently used other seasons until the loaded ones fit
+__memory_budget = 512 * 2**20
+# Seasons that are never evicted (the one the updater keeps current)
+__pinned = set()
+# Seasons chosen for eviction whose snapshots are being saved. Using one again (see get_engine) keeps it loaded.
+__evicting = set()
+
+# Background threads loading seasons (see start_loading), by season
+__loaders = {}
+
+__updater = None
+__stop_updater = threading.Event()
+
+def configure(memory_budget: int = 512 * 2**20):
+    """
+    Sets how much memory loaded seasons may use together. The season being loaded and the season the updater
+    keeps current are never evicted, so they can go over the budget on their own.
+
+    Args:
+        memory_budget: bytes, as estimated by EpaEngine.get_memory_usage
+    """
+    global __memory_budget
+    __memory_budget = memory_budget
+    __evict()
+
+def get_engine(season: int = 2024) -> EpaEngine:
+    """
+    Returns a season's engine (loaded or not), creating it if there isn't one yet, and marks it as recently used.
+    """
+    with __engines_lock:
+        engine = __engines.get(season)
+        if engine is None:
+            engine = __engines[season] = EpaEngine(season)
+        __engines.move_to_end(season)
+        __evicting.discard(season)
+        return engine
+
+def load(season: int = 2024) -> EpaEngine:
+    """
+    Returns a season's engine, loading its EPAs first if needed (see EpaEngine.load). Loading a season
+    evicts the least recently used other seasons if the loaded ones no longer fit the memory budget.
+    """
+    engine = get_engine(season)
+    if engine.load():
+        __evict(keep=season)
+    return engine
+
+def start_loading(season: int = 2024) -> threading.Thread:
+    """
+    Loads a season's EPAs (see `load`) on a background thread with its own database connection, so requests can
+    report progress (see `get_status`) instead of waiting for it or taking connections from the reader pool.
+    Does nothing if the season is already loaded or loading, or if it failed to load less than RETRY_FAILED_LOAD seconds ago.
+
+    Returns the loading thread, or None if no thread is loading the season.
     """
-    Performs initialization (loads matches from database, initializes all EPAs to default values).
+    engine = get_engine(season)
+    if engine.loaded:
+        return None
+
+    def run():
+        try:
+            with database.dedicated():
+                load(season)
+        except Exception as e:
+            print(f"Error loading EPA for {season}: {e}")
+
+    with __engines_lock:
+        loader = __loaders.get(season)
+        if loader is not None and loader.is_alive():
+            return loader
+
+        status = engine.get_status()
+        if status["phase"] == "failed" and clock.time() - status["finished"] < RETRY_FAILED_LOAD:
+            return None
+
+        loader = __loaders[season] = threading.Thread(target=run, name=f"epa-load-{season}", daemon=True)
+        loader.start()
+        return loader
+
+def is_ready(season: int = 2024) -> bool:
+    """
+    Returns True if a season has EPAs to serve, so reading them won't have to wait for a load. Seasons stay ready
+    while an update rebuilds them (see EpaEngine.update), since their current EPAs are served until then.
+    """
+    with __engines_lock:
+        engine = __engines.get(season)
+    return engine is not None and engine.loaded
 
-    Must be called before doing any EPA calculations.
+def get_status(season: int = None) -> dict:
+    """
+    Returns how far along loading a season is (see EpaEngine.get_status). Never waits for a load.
+
+    Args:
+        season (optional): the season to report on. if unset, reports on every season with an engine.
+
+    Returns the season's status, or a dictionary where key = season and value = its status.
+    """
+    if season is not None:
+        return get_engine(season).get_status()
+    with __engines_lock:
+        engines = list(__engines.items())
+    return {season: engine.get_status() for (season, engine) in engines}
+
+def get_loaded_seasons() -> dict[int, int]:
+    """
+    Returns a dictionary where key = every loaded season (least recently used first) and value = the approximate bytes it uses.
     """
-    global __teams, __scores, __epa_dict, __done_initializing
-    database.init()
-    __teams = database.get_match_teams() # should be sorted by time, not filtered by event code
-    __scores = database.get_match_scores()
+    with __engines_lock:
+        engines = list(__engines.items())
+    return {season: engine.get_memory_usage()["total"] for (season, engine) in engines if engine.loaded}
 
-    start_of_january = 1735707600
-    end_of_january = 1738299600
-    
-    january_matches = list(filter(lambda key: start_of_january <= key.start_time <= end_of_january, __teams.keys()))
+def __evict(keep: int = None):
+    """
+    Unloads the least recently used seasons until the loaded ones fit the memory budget. Evicted seasons
+    are saved to a snapshot first, so loading them again is quick.
 
-    # FRC: stddev of Week 1, guess for FTC: stddev of January
-    january_scores = [__scores[key]["totalPoints"] for key in january_matches]
+    Seasons are chosen and marked as evicting under the registry lock, then saved and unloaded after it's released,
+    so a slow snapshot doesn't hold up requests for other seasons. A season requested while its snapshot was being
+    saved is kept, and seasons another eviction is already unloading aren't counted or chosen twice.
+    """
+    usage = get_loaded_seasons()
+    victims = []
+    with __engines_lock:
+        total = sum(size for (season, size) in usage.items() if season not in __evicting)
+        for (season, size) in usage.items():
+            if total <= __memory_budget:
+                break
+            if season == keep or season in __pinned or season in __evicting:
+                continue
+            __evicting.add(season)
+            victims.append((season, __engines[season]))
+            total -= size
 
-    average_january_score = float(np.average(january_scores))
+    for (season, engine) in victims:
+        try:
+            engine.save_snapshot()
+        except Exception as e:
+            print(f"Error saving EPA snapshot for {season}: {e}")
+        with __engines_lock:
+            if season not in __evicting:
+                continue
+            __evicting.discard(season)
+        engine.unload()
 
-    # Set initial EPA to average "Week 1" score / 3
-    __epa_dict = defaultdict(lambda: average_january_score / 2)
+def snapshot_file(season: int = 2024) -> Path:
+    """
+    Returns where the EPA snapshot for a season is kept (next to the database).
+    """
+    return Path(database.database_file).resolve().parent / f"epa-{season}.npz"
 
-    __done_initializing = True
+def init(season: int = 2024):
+    """
+    Performs initialization for a season (loads matches from database, initializes all EPAs to default values).
 
-__historical_epas = defaultdict(lambda: [])
+    Must be called before doing any EPA calculations, unless the season is loaded with `load` or `warm_start`.
+    """
+    get_engine(season).init()
 
 def calc_epa(match_key: MatchKey):
     """
-    Calculates the EPA updates from a single match.
+    Calculates the EPA updates from a single match, in the match's season. Matches must be applied in start time order.
 
     Args:
         match_key: the key of the relevant match
-    
+
     Returns nothing.
     """
-    global __epa_dict
+    get_engine(match_key.season).calc_epa(match_key)
 
-    red_match_key = copy.deepcopy(match_key)
-    red_match_key.alliance = "Red"
-    blue_match_key = copy.deepcopy(match_key)
-    blue_match_key.alliance = "Blue"
+def apply_results(changed: dict[MatchKey, tuple], season: int = 2024) -> int:
+    """
+    Applies new, corrected or removed matches to a season (see EpaEngine.apply_results).
 
-    red_teams = list(filter(lambda t: __teams[red_match_key][t][1], __teams[red_match_key].keys()))
-    blue_teams = list(filter(lambda t: __teams[blue_match_key][t][1], __teams[blue_match_key].keys()))
+    Returns the number of matches replayed.
+    """
+    return get_engine(season).apply_results(changed)
 
-    predicted_score_margin = sum(map(lambda team: __epa_dict[team], red_teams)) - sum(map(lambda team: __epa_dict[team], blue_teams))
-    actual_score_margin = __scores[red_match_key]["totalPoints"] - __scores[blue_match_key]["totalPoints"]
-    delta_epa = 36/250 * (actual_score_margin - predicted_score_margin) # if red does better, this is positive, so we need to invert for blue
+def update(season: int = 2024) -> int:
+    """
+    Applies every match ingested since the last update (or since init), without replaying the whole season.
+    Seasons that aren't loaded are left alone; they're up to date as soon as they're loaded.
 
-    for team in red_teams:
-        __epa_dict[team] += delta_epa
-        __historical_epas[team].append((match_key, __epa_dict[team]))
+    Args:
+        season: the season to check for new matches
 
-    for team in blue_teams:
-        __epa_dict[team] -= delta_epa
-        __historical_epas[team].append((match_key, __epa_dict[team]))
+    Returns the number of matches replayed.
+    """
+    with __engines_lock:
+        engine = __engines.get(season)
+    return engine.update() if engine is not None else 0
 
-def season_epa():
+def season_epa(season: int = 2024):
+    """
+    Calculates a season's EPA by analyzing every match stored in the database.
     """
-    Calculates the EPA by analyzing every match stored in the database.
+    get_engine(season).season_epa()
+    __evict(keep=season)
+
+def save_snapshot(path: str = None, season: int = 2024) -> Path:
     """
-    global __teams, __season_loaded
-    sorted_match_keys = sorted(filter(lambda k: k.alliance == "Red", __teams.keys()), key=lambda k: k.start_time)
-    for match_key in sorted_match_keys:
-        calc_epa(match_key)
-    __season_loaded = True
+    Saves a season's EPA state to a compact NumPy file (see EpaEngine.save_snapshot).
 
-def get_epa(team: int, time: float = None):
+    Returns the path written to, or None if the season hasn't been computed yet.
     """
-    Gets the EPA of a team.
+    return get_engine(season).save_snapshot(path)
+
+def load_snapshot(path: str = None, season: int = 2024) -> bool:
+    """
+    Restores a season's EPA state saved by `save_snapshot` (see EpaEngine.load_snapshot).
+
+    Returns True if the snapshot was loaded.
+    """
+    loaded = get_engine(season).load_snapshot(path)
+    __evict(keep=season)
+    return loaded
+
+def warm_start(season: int = 2024) -> bool:
+    """
+    Gets a season's EPAs ready as fast as possible (see EpaEngine.warm_start).
+
+    Returns True if a snapshot was used.
+    """
+    used = get_engine(season).warm_start()
+    __evict(keep=season)
+    return used
+
+def start_updater(interval: float = 5.0, season: int = 2024, snapshot_interval: float = 300.0) -> threading.Thread:
+    """
+    Keeps a season's EPAs up to date by calling `update` every `interval` seconds on a background thread.
+    The season isn't evicted while the updater runs. Does nothing if the updater is already running.
+
+    Args:
+        interval: seconds between checks for new matches
+        season: the season to check for new matches
+        snapshot_interval: after an update changed something, save a snapshot if the last one is at least this old (in seconds)
+
+    Returns the updater thread.
+    """
+    global __updater
+
+    def run():
+        saved_at = clock.monotonic()
+        unsaved = False
+        # Updates read on their own connection, like loads (see start_loading)
+        with database.dedicated():
+            while not __stop_updater.wait(interval):
+                try:
+                    unsaved = update(season) > 0 or unsaved
+                    if unsaved and clock.monotonic() - saved_at >= snapshot_interval:
+                        save_snapshot(season=season)
+                        saved_at, unsaved = clock.monotonic(), False
+                except Exception as e:
+                    print(f"Error updating EPA: {e}")
+        __pinned.discard(season)
+
+    if __updater is None or not __updater.is_alive():
+        __pinned.add(season)
+        __stop_updater.clear()
+        __updater = threading.Thread(target=run, name="epa-updater", daemon=True)
+        __updater.start()
+    return __updater
+
+def stop_updater():
+    """
+    Stops the background thread started by `start_updater`.
+    """
+    __stop_updater.set()
+
+def get_epa(team: int, time: float = None, component: str = "total", season: int = 2024):
+    """
+    Gets the EPA of a team, loading the season first if needed.
 
     Args:
         team: the team whose EPA should be retrieved
         time (optional): if set, will retrieve the team's latest EPA as of that time. if unset, will get the team's latest EPA.
-    
+        component (optional): which EPA to get: total (default), auto, teleop or endgame
+        season (optional): the season to get the EPA for
+
     Returns a float storing the EPA of the team.
     """
-    if not __season_loaded:
-        return None
-    
-    if time == None:
-        return __epa_dict[team]
-    else:
-        latest_epa = 0
-        for (match_key, epa) in __historical_epas[team]:
-            if match_key.start_time > time:
-                break
-            else:
-                latest_epa = epa
-        return latest_epa
+    return load(season).get_epa(team, time=time, component=component)
 
-def get_all_epas(team: int):
+def get_component_epas(team: int, time: float = None, season: int = 2024) -> dict[str, float]:
     """
-    Gets all historical EPAs for a team.
+    Gets every component of a team's EPA, loading the season first if needed.
+
+    Returns a dict where the key is the component (total, auto, teleop, endgame) and the value is the EPA.
+    """
+    return load(season).get_component_epas(team, time=time)
+
+def get_all_epas(team: int, component: str = "total", season: int = 2024):
+    """
+    Gets all historical EPAs for a team, loading the season first if needed.
 
-    Args:
-        team: the team whose EPA should be retrieved
-    
     Returns a dict where the key is the time and the value is the EPA at that time.
     """
-    if not __season_loaded: return {}
-    return {k.start_time: epa for (k, epa) in __historical_epas[team]}
+    return load(season).get_all_epas(team, component=component)
+
+def get_memory_usage(season: int = 2024) -> dict[str, int]:
+    """
+    Returns the approximate bytes used by a season (see EpaEngine.get_memory_usage).
+    """
+    return get_engine(season).get_memory_usage()
+
+def get_ranks(time: float = None, component: str = "total", season: int = 2024):
+    """
+    Returns a dictionary where the key is the team and the value is a tuple of (their EPA rank, their EPA),
+    loading the season first if needed.
+
+    Args:
+        time (optional): if set, ranks by the EPAs as of that time. if unset, ranks by the latest EPAs.
+        component (optional): which EPA to rank by: total (default), auto, teleop or endgame
+        season (optional): the season to rank
+    """
+    return load(season).get_ranks(time=time, component=component)
+
+def predict(red: list[list[int]], blue: list[list[int]], season: int = 2024) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Predicts many matches at once from a season's current EPAs (see EpaEngine.predict), loading the season first if needed.
+
+    Returns (predicted scores of shape (matches, 2 alliances (red, blue), components), red's win probability for every match).
+    """
+    return load(season).predict(red, blue)
+
+def get_leaderboard(offset: int = 0, limit: int = 100, time: float = None, component: str = "total", season: int = 2024) -> dict:
+    """
+    Returns one page of a season's EPA rankings (see EpaEngine.get_leaderboard), loading the season first if needed.
+    """
+    return load(season).get_leaderboard(offset=offset, limit=limit, time=time, component=component)
 
-def get_ranks():
+def get_teams(teams: list[int], component: str = "total", history: int = 0, season: int = 2024) -> dict[int, dict]:
     """
-    Returns a dictionary where the key is the team and the value is a tuple of (their EPA rank, their EPA).
+    Gets the current EPA, rank and percentile of many teams at once (see EpaEngine.get_teams), loading the season first if needed.
     """
-    if not __season_loaded: return {}
-    return {team: (idx + 1, __epa_dict[team]) for (idx, team) in enumerate(list(map(lambda t: t[0], sorted(__epa_dict.items(), key=lambda t: t[1], reverse=True))))}
\ No newline at end of file
+    return load(season).get_teams(teams, component=component, history=history)
@@ -1,33 +1,158 @@
 #!/usr/bin/env python3
 import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import dotenv_values
 from pathlib import Path
 import database
+from stats import archive
+
+API_URL = "https://ftc-api.firstinspires.org/v2.0"
+
+# Responses with these status codes are worth trying again (rate limited or server trouble)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 __auth = None
+__api_url = API_URL
+__session = None
+__rate_limiter = None
+__max_retries = 4
+__backoff = 1.0
 
-def init():
+class RateLimiter:
     """
-    Reads config files from .env and sets up authentication.
+    Spaces out calls so that no more than `rate` happen per second, across every thread using it.
     """
-    global __auth
-    # Load secrets from .env file
-    # Required secrets: USERNAME, TOKEN
-    # Used to interact with the FTC Event API
-    script_dir = Path(__name__).resolve().parent
-    config = dotenv_values(dotenv_path=script_dir/".env")
 
-    if "USERNAME" not in config:
-        raise ValueError("USERNAME not provided in .env")
-    if "TOKEN" not in config:
-        raise ValueError("TOKEN not provided in .env")
-    
-    __auth = HTTPBasicAuth(username=config["USERNAME"], password=config["TOKEN"])
+    def __init__(self, rate: float = None):
+        self.__interval = 1 / rate if rate else 0
+        self.__next_slot = 0.0
+        self.__lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the caller is allowed to make its next call.
+        """
+        if self.__interval == 0:
+            return
+
+        with self.__lock:
+            now = time.monotonic()
+            slot = max(now, self.__next_slot)
+            self.__next_slot = slot + self.__interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+def init(api_url: str = API_URL, username: str = None, token: str = None, requests_per_second: float = 10, pool_size: int = 8, max_retries: int = 4, backoff: float = 1.0, archive_dir: str = None):
+    """
+    Reads config files from .env and sets up authentication and the shared HTTP session.
+
+    Args:
+        api_url: the base URL of the FTC Event API (can point at a local stand-in server for testing)
+        username (optional): FTC Event API username, read from .env if unset
+        token (optional): FTC Event API token, read from .env if unset
+        requests_per_second: the maximum number of requests sent to the API per second (0 = no limit)
+        pool_size: the number of keep-alive connections kept open to the API
+        max_retries: how many times a failed request is retried before giving up
+        backoff: seconds to wait before the first retry, doubled on every following retry
+        archive_dir (optional): if set, every raw response is also archived there (see stats.archive)
+    """
+    global __auth, __api_url, __session, __rate_limiter, __max_retries, __backoff
+
+    if username is None or token is None:
+        # Load secrets from .env file
+        # Required secrets: USERNAME, TOKEN
+        # Used to interact with the FTC Event API
+        script_dir = Path(__name__).resolve().parent
+        config = dotenv_values(dotenv_path=script_dir/".env")
+
+        if "USERNAME" not in config:
+            raise ValueError("USERNAME not provided in .env")
+        if "TOKEN" not in config:
+            raise ValueError("TOKEN not provided in .env")
+
+        username, token = config["USERNAME"], config["TOKEN"]
+
+    __auth = HTTPBasicAuth(username=username, password=token)
+    __api_url = api_url.rstrip("/")
+    __rate_limiter = RateLimiter(requests_per_second)
+    __max_retries = max_retries
+    __backoff = backoff
+
+    # One session shares keep-alive connections between every request (and every crawler thread)
+    __session = requests.Session()
+    __session.auth = __auth
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    __session.mount("http://", adapter)
+    __session.mount("https://", adapter)
+
+    if archive_dir is not None:
+        archive.init(archive_dir)
 
     database.init()
 
+def fetch_response(path: str, params: dict = None, modified_since: str = None, archive_as: tuple[int, str, str] = None) -> requests.Response:
+    """
+    Sends a rate-limited GET request to the FTC Event API, retrying with exponential backoff on failure.
+
+    Args:
+        path: the path of the endpoint relative to the API URL (e.g. 2024/matches/FTCCMP1OCHO)
+        params (optional): query string parameters
+        modified_since (optional): a Last-Modified header from an earlier response; if nothing changed since then, the API answers 304
+        archive_as (optional): (season, endpoint, event code) to archive the raw body under, if archiving is enabled
+
+    Returns the response (status 200, or 304 if `modified_since` was set). Raises an exception if the request still fails after every retry.
+    """
+    if __session is None:
+        raise RuntimeError("events_api.init() has not been called")
+
+    headers = {"If-Modified-Since": modified_since} if modified_since else None
+
+    for attempt in range(__max_retries + 1):
+        __rate_limiter.wait()
+        delay = __backoff * 2**attempt
+        try:
+            response = __session.get(f"{__api_url}/{path}", params=params, headers=headers, timeout=30)
+            if response.status_code not in RETRY_STATUS_CODES:
+                if response.status_code != 304:
+                    response.raise_for_status()
+                    if archive_as is not None and archive.is_enabled():
+                        archive.store(*archive_as, response.content)
+                return response
+
+            # Respect the server if it tells us how long to back off for
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None and retry_after.isnumeric():
+                delay = max(delay, float(retry_after))
+            error = requests.HTTPError(f"{response.status_code} from {path}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        if attempt < __max_retries:
+            time.sleep(delay)
+
+    raise error
+
+def fetch(path: str, params: dict = None, archive_as: tuple[int, str, str] = None) -> dict:
+    """
+    Sends a rate-limited GET request to the FTC Event API (see `fetch_response`).
+
+    Returns the decoded JSON body. Raises an exception if the request still fails after every retry.
+    """
+    return fetch_response(path, params, archive_as=archive_as).json()
+
+def is_valid_event_code(event_code: str) -> bool:
+    """
+    Returns True if the event code is safe to put into an API path.
+    """
+    return event_code.replace("'", "").replace("-", "").replace("(","").replace(")","").isalnum()
+
 def cache_scores(event_code: str, season: int = 2024, qual_matches: bool = True) -> bool:
     """
     Retrieves match scores from the FTC Event API and caches them in the local SQL database.
@@ -36,28 +161,31 @@ def cache_scores(event_code: str, season: int = 2024, qual_matches: bool = True)
         event_code: the event code of the event to retrieve data for (e.g. FTCCMP1OCHO)
         season: the year that the event happened
         qual_matches: True = get qualification match data, False = get elimination match data
-    
+
     Returns True if success, False if there was an error.
     """
 
     season = int(season)
-    
-    if not event_code.replace("'", "").replace("-", "").replace("(","").replace(")","").isalnum():
+
+    if not is_valid_event_code(event_code):
         return False
-    
+
     if __auth is None:
         return False
-    
+
     try:
-        score_data = requests.get(f"https://ftc-api.firstinspires.org/v2.0/{season}/scores/{event_code}/{'qual' if qual_matches else 'playoff'}", auth=__auth).json()
+        level = 'qual' if qual_matches else 'playoff'
+        score_data = fetch(f"{season}/scores/{event_code}/{level}", archive_as=(season, f"scores/{level}", event_code))
     except:
         return False
 
-    is_good = True
-    for match_score in score_data['matchScores']:
-        is_good = is_good and database.store_match_score(event_code, match_score, season=season)
+    try:
+        rows = database.store_match_scores(event_code, score_data['matchScores'], season=season)
+    except Exception as e:
+        print(e)
+        return False
 
-    return is_good
+    return rows is not None
 
 def cache_matches(event_code: str, season: int = 2024) -> bool:
     """
@@ -66,28 +194,30 @@ def cache_matches(event_code: str, season: int = 2024) -> bool:
     Args:
         event_code: the event code of the event to retrieve data for (e.g. FTCCMP1OCHO)
         season: the year that the event happened
-    
+
     Returns True if success, False if there was an error.
     """
 
     season = int(season)
-    
-    if not event_code.replace("'", "").replace("-", "").replace("(","").replace(")","").isalnum():
+
+    if not is_valid_event_code(event_code):
         return False
-    
+
     if __auth is None:
         return False
-    
+
     try:
-        match_data = requests.get(f"https://ftc-api.firstinspires.org/v2.0/{season}/matches/{event_code}", auth=__auth).json()
+        match_data = fetch(f"{season}/matches/{event_code}", archive_as=(season, "matches", event_code))
     except:
         return False
 
-    is_good = True
-    for match in match_data['matches']:
-        is_good = is_good and database.store_match(event_code, match, season=season)
+    try:
+        rows = database.store_matches(event_code, match_data['matches'], season=season)
+    except Exception as e:
+        print(e)
+        return False
 
-    return is_good
+    return rows is not None
 
 def cache_schedule(event_code: str, season: int = 2024, qual_matches: bool = True) -> bool:
     """
@@ -97,77 +227,273 @@ def cache_schedule(event_code: str, season: int = 2024, qual_matches: bool = Tru
         event_code: the event code of the event to retrieve data for (e.g. FTCCMP1OCHO)
         season: the year that the event happened
         qual_matches: True = get qualification match schedule, False = get elimination match schedule
-    
+
     Returns True if success, False if there was an error.
     """
 
     season = int(season)
-    
-    if not event_code.replace("'", "").replace("-", "").replace("(","").replace(")","").isalnum():
+
+    if not is_valid_event_code(event_code):
         return False
-    
+
     if __auth is None:
         return False
-    
+
     try:
-        schedule_data = requests.get(f"https://ftc-api.firstinspires.org/v2.0/{season}/schedule/{event_code}?tournamentLevel={'qual' if qual_matches else 'playoff'}", auth=__auth).json()
+        level = 'qual' if qual_matches else 'playoff'
+        schedule_data = fetch(f"{season}/schedule/{event_code}", params={"tournamentLevel": level}, archive_as=(season, f"schedule/{level}", event_code))
     except:
         return False
 
-    is_good = True
-    for match in schedule_data['schedule']:
-        is_good = is_good and database.store_scheduled_match(event_code, match, season=season)
+    try:
+        rows = database.store_scheduled_matches(event_code, schedule_data['schedule'], season=season)
+    except Exception as e:
+        print(e)
+        return False
 
-    return is_good
+    return rows is not None
 
-def get_all_events(season: int = 2024) -> list[str]:
+def get_event_listings(season: int = 2024) -> list[dict]:
     """
-    Retrieves a list of all event codes for a given season from the FTC Event API.
+    Retrieves the listing (code, name, dateStart, dateEnd, etc) of every event in a season from the FTC Event API.
 
     Args:
         season: the year to look for events in
-    
-    Returns a list of event codes for `season` if successful, and an empty list if there was an error.
+
+    Returns a list of event listings for `season` if successful, and an empty list if there was an error.
     """
     season = int(season)
 
     if __auth is None:
         return []
-    
+
     try:
-        event_listings_data = requests.get(f"https://ftc-api.firstinspires.org/v2.0/{season}/events", auth=__auth).json()
+        return fetch(f"{season}/events", archive_as=(season, "events", None))["events"]
     except:
         return []
-    
+
+def get_all_events(season: int = 2024) -> list[str]:
+    """
+    Retrieves a list of all event codes for a given season from the FTC Event API.
+
+    Args:
+        season: the year to look for events in
+
+    Returns a list of event codes for `season` if successful, and an empty list if there was an error.
+    """
     try:
-        return list(map(lambda event: event["code"], event_listings_data["events"]))
+        return list(map(lambda event: event["code"], get_event_listings(season)))
     except:
         return []
 
-def cache_all_events(season: int = 2024) -> bool:
+def cache_event(event_code: str, season: int = 2024) -> bool:
+    """
+    Caches every piece of data we use from a single event (qual and elim scores and schedules, and matches).
+
+    Args:
+        event_code: the event code of the event to retrieve data for (e.g. FTCCMP1OCHO)
+        season: the year that the event happened
+
+    Returns True if success, False if any part failed.
+    """
+    return (cache_scores(event_code, season, qual_matches=True)
+            and cache_scores(event_code, season, qual_matches=False)
+            and cache_schedule(event_code, season, qual_matches=True)
+            and cache_schedule(event_code, season, qual_matches=False)
+            and cache_matches(event_code, season))
+
+def cache_all_events(season: int = 2024, workers: int = 8, resume: bool = True) -> bool:
     """
     Caches data from all events for a given season (needed for EPA calculations).
 
-    Takes a long time.
+    Events are cached concurrently by a pool of `workers` threads sharing one rate-limited session. Every event
+    that finishes is checkpointed, so an interrupted crawl picks up where it left off when `resume` is True.
+    A failing event doesn't stop the crawl; it's reported at the end and retried on the next run.
+    Checkpoints are cleared once a crawl finishes without failures, so the next crawl caches every event again.
+
+    Args:
+        season: the year to cache events from
+        workers: the number of events cached at the same time
+        resume: True = skip events already cached by an interrupted or failed crawl, False = start over
+
+    Returns True if every event was cached, False otherwise.
     """
+    season = int(season)
     event_codes = get_all_events(season)
 
-    print(f"Preparing to cache {len(event_codes)} events")
-
     if event_codes == []:
         return False
-    
-    for code in event_codes:
-        print(f"Caching qual scores from {code}")
-        if not cache_scores(code, season, qual_matches=True): return False
-        print(f"Caching elim scores from {code}")
-        if not cache_scores(code, season, qual_matches=False): return False
-        print(f"Caching qual schedule from {code}")
-        if not cache_schedule(code, season, qual_matches=True): return False
-        print(f"Caching elim schedule from {code}")
-        if not cache_schedule(code, season, qual_matches=False): return False
-        print(f"Caching matches from {code}")
-        if not cache_matches(code, season): return False
-        print("-------------------------------------")
-    
-    return True
\ No newline at end of file
+
+    if not resume:
+        database.clear_crawl_checkpoints(season)
+
+    completed = database.get_crawled_events(season)
+    pending = [code for code in event_codes if code not in completed]
+
+    print(f"Preparing to cache {len(pending)} events ({len(event_codes) - len(pending)} already cached)")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(cache_event, code, season): code for code in pending}
+        for idx, future in enumerate(as_completed(futures)):
+            code = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                print(e)
+                ok = False
+
+            if ok:
+                database.mark_event_crawled(code, season)
+                print(f"[{idx + 1}/{len(pending)}] Cached {code}")
+            else:
+                failed.append(code)
+                print(f"[{idx + 1}/{len(pending)}] Failed to cache {code}")
+
+    if failed:
+        print(f"Failed to cache {len(failed)} events: {', '.join(failed)}")
+    else:
+        # The crawl is complete, so there's nothing left to resume
+        database.clear_crawl_checkpoints(season)
+
+    return failed == []
+
+
+def __match_id(match: dict) -> tuple[str, int, int]:
+    """
+    Identifies a match from the matches or schedule endpoint by (tournament level, series, match number).
+    """
+    return (match["tournamentLevel"], int(match["series"]), int(match["matchNumber"]))
+
+def __fetch_if_modified(path: str, endpoint: str, state: dict[str, tuple[str, str]], archive_as: tuple[int, str, str], params: dict = None) -> tuple[dict, str]:
+    """
+    Fetches an endpoint only if it changed since the last sync.
+
+    Returns a tuple (JSON body or None if unchanged, Last-Modified header).
+    """
+    last_modified = state.get(endpoint, (None, None))[0]
+    response = fetch_response(path, params, modified_since=last_modified, archive_as=archive_as)
+    if response.status_code == 304:
+        return None, last_modified
+    return response.json(), response.headers.get("Last-Modified")
+
+def sync_event(event_code: str, season: int = 2024) -> int:
+    """
+    Incrementally syncs a single event. Endpoints are requested with If-Modified-Since so unchanged ones cost a 304,
+    and only matches whose modifiedOn changed (plus scores for those matches) are written to the database.
+
+    Args:
+        event_code: the event code of the event to sync (e.g. FTCCMP1OCHO)
+        season: the year that the event happened
+
+    Returns the number of rows written, or None if there was an error.
+    """
+    season = int(season)
+
+    if not is_valid_event_code(event_code) or __auth is None:
+        return None
+
+    try:
+        state = database.get_sync_state(event_code, season)
+        written = 0
+
+        # Matches are fetched first: their modifiedOn tells us which scores need rewriting. They're only stored (with
+        # their watermark) once those scores are, so if fetching the scores fails, the next sync still sees the
+        # matches as changed instead of getting a 304 and never rewriting the scores.
+        changed = set()
+        matches_body, matches_modified = __fetch_if_modified(f"{season}/matches/{event_code}", "matches", state, (season, "matches", event_code))
+        if matches_body is not None:
+            known = database.get_modified_times("matches", event_code, season)
+            matches = [match for match in matches_body["matches"] if known.get(__match_id(match)) != match["modifiedOn"]]
+            changed = {__match_id(match) for match in matches}
+
+        scored = database.get_scored_matches(event_code, season)
+        for level in ("qual", "playoff"):
+            body, last_modified = __fetch_if_modified(f"{season}/scores/{event_code}/{level}", f"scores/{level}", state, (season, f"scores/{level}", event_code))
+            if body is None:
+                continue
+            # Scores don't carry modifiedOn, so rewrite them for changed matches and any we never stored
+            scores = [score for score in body["matchScores"]
+                      if (score["matchLevel"], score["matchSeries"], score["matchNumber"]) in changed
+                      or (score["matchLevel"], score["matchSeries"], score["matchNumber"]) not in scored]
+            written += database.store_match_scores(event_code, scores, season=season)
+            database.set_sync_state(event_code, f"scores/{level}", last_modified, None, season)
+
+        if matches_body is not None:
+            written += database.store_matches(event_code, matches, season=season)
+            database.set_sync_state(event_code, "matches", matches_modified, max([m["modifiedOn"] or "" for m in matches_body["matches"]], default=None), season)
+
+        known = database.get_modified_times("schedule", event_code, season)
+        for level in ("qual", "playoff"):
+            body, last_modified = __fetch_if_modified(f"{season}/schedule/{event_code}", f"schedule/{level}", state, (season, f"schedule/{level}", event_code), params={"tournamentLevel": level})
+            if body is None:
+                continue
+            scheduled = [match for match in body["schedule"] if known.get(__match_id(match)) != match["modifiedOn"]]
+            written += database.store_scheduled_matches(event_code, scheduled, season=season)
+            database.set_sync_state(event_code, f"schedule/{level}", last_modified, max([m["modifiedOn"] or "" for m in body["schedule"]], default=None), season)
+
+        database.set_sync_state(event_code, "event", None, None, season)
+        return written
+    except Exception as e:
+        print(e)
+        return None
+
+def is_event_active(listing: dict, now: datetime = None, margin: timedelta = timedelta(days=1)) -> bool:
+    """
+    Returns True if `now` falls inside an event's date window (widened by `margin` on both sides).
+
+    Args:
+        listing: the event's entry from `get_event_listings`
+        now (optional): the time to compare against, defaults to the current time
+        margin: how long before and after the event it still counts as active
+    """
+    now = now or datetime.now()
+    try:
+        start = datetime.fromisoformat(listing["dateStart"])
+        end = datetime.fromisoformat(listing["dateEnd"])
+    except (KeyError, TypeError, ValueError):
+        # Without dates we can't tell, so keep it up to date
+        return True
+    return start - margin <= now <= end + margin
+
+def sync_season(season: int = 2024, workers: int = 8, recheck_past: bool = False, now: datetime = None) -> bool:
+    """
+    Incrementally syncs a season. Only events that are happening right now or were never synced are fetched;
+    everything else is left alone (or, with `recheck_past`, checked with cheap conditional requests).
+
+    Args:
+        season: the year to sync events from
+        workers: the number of events synced at the same time
+        recheck_past: True = also ask the API whether finished events changed since they were last synced
+        now (optional): the time used to decide which events are active, defaults to the current time
+
+    Returns True if every selected event was synced, False otherwise.
+    """
+    season = int(season)
+    listings = get_event_listings(season)
+
+    if listings == []:
+        return False
+
+    synced = database.get_synced_events(season)
+    pending = [listing["code"] for listing in listings
+               if recheck_past or listing["code"] not in synced or is_event_active(listing, now)]
+
+    print(f"Syncing {len(pending)} of {len(listings)} events")
+
+    failed = []
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(sync_event, code, season): code for code in pending}
+        for future in as_completed(futures):
+            rows = future.result()
+            if rows is None:
+                failed.append(futures[future])
+            else:
+                written += rows
+
+    print(f"Wrote {written} rows")
+    if failed:
+        print(f"Failed to sync {len(failed)} events: {', '.join(failed)}")
+
+    return failed == []
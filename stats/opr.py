@@ -1,11 +1,143 @@
 #!/usr/bin/env python3
+import threading
+from collections import OrderedDict
 import database
 import numpy as np
 from typing import Callable
 from functools import reduce
 from helper import *
 
-def calc_opr_from_function(event_code: str, fn: Callable[[dict[database.MatchKey, dict[str, Any]]], float], season: int = 2024) -> dict:
+# OPR results by (season, event code or None for the whole season, statistic, None for every statistic or "ratings" for OPR/DPR/CCWM),
+# least recently used first.
+# Value = (data version, OPRs): an entry is reused until the ingestion functions bump the event's version (see database.get_event_versions).
+__cache = OrderedDict()
+__cache_lock = threading.Lock()
+__cache_stats = {"hits": 0, "misses": 0, "stale": 0}
+# How many results are kept
+CACHE_SIZE = 4096
+
+# How OPR systems are solved: "dense" pseudoinverts the whole alliance matrix (exact, but O(alliance-matches x teams²)),
+# "sparse" runs conjugate gradient on its nonzeros, and "auto" picks dense up to DENSE_LIMIT teams, about where sparse
+# becomes faster (see tools/bench_opr.py)
+SOLVERS = ("auto", "dense", "sparse")
+DENSE_LIMIT = 200
+# The ratings calc_event_ratings returns per statistic
+RATINGS = ("opr", "dpr", "ccwm")
+
+class AllianceMatrix:
+    """
+    A sparse alliance matrix: one row per alliance-match, one column per team, and a 1 wherever the team was on the field
+    for that alliance. Only the positions of the ones are stored, so memory grows with the number of team-matches instead of
+    alliance-matches x teams, and multiplying by it (or its transpose) is a gather and a segmented sum over every statistic at once.
+
+    Args:
+        match_teams: teams in every alliance-match, as returned by database.get_match_teams
+
+    Attributes:
+        teams: the team of every column
+        shape: (alliance-matches, teams)
+    """
+
+    def __init__(self, match_teams: dict[database.MatchKey, dict[int, tuple[str, bool]]]):
+        self.teams = list(set(flatten(map(lambda match_team: list(match_team.keys()), match_teams.values()))))
+        self.shape = (len(match_teams), len(self.teams))
+        columns = {team: i for (i, team) in enumerate(self.teams)}
+        # ` if on_field` ensures a team actually played in that match
+        entries = [(row, columns[team]) for (row, teams) in enumerate(match_teams.values()) for (team, (_, on_field)) in teams.items() if on_field]
+        (rows, cols) = np.array(entries, dtype=np.intp).reshape(-1, 2).T
+
+        # The ones in row order (as built) for A @ x, and in column order for A.T @ y
+        self.__by_row = (rows, cols, self.__segments(rows))
+        order = np.argsort(cols, kind="stable")
+        self.__by_column = (cols[order], rows[order], self.__segments(cols[order]))
+
+    @staticmethod
+    def __segments(ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (where each run of equal ids starts, the id of each run) for sorted ids.
+        """
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.zeros(0, dtype=np.intp)
+        return starts, ids[starts]
+
+    @staticmethod
+    def __multiply(values: np.ndarray, grouped: tuple[np.ndarray, np.ndarray, tuple[np.ndarray, np.ndarray]], size: int) -> np.ndarray:
+        (ids, gather, (starts, heads)) = grouped
+        product = np.zeros((size, values.shape[1]), dtype=np.float64)
+        if len(ids):
+            product[heads] = np.add.reduceat(values[gather], starts, axis=0)
+        return product
+
+    def dot(self, x: np.ndarray) -> np.ndarray:
+        """
+        Returns A @ x for x of shape (teams, statistics).
+        """
+        return self.__multiply(x, self.__by_row, self.shape[0])
+
+    def tdot(self, y: np.ndarray) -> np.ndarray:
+        """
+        Returns A.T @ y for y of shape (alliance-matches, statistics).
+        """
+        return self.__multiply(y, self.__by_column, self.shape[1])
+
+    def dense(self) -> np.ndarray:
+        """
+        Returns the matrix as a dense float64 array.
+        """
+        (rows, cols, _) = self.__by_row
+        matrix = np.zeros(self.shape, dtype=np.float64)
+        matrix[rows, cols] = 1
+        return matrix
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes used by the stored positions.
+        """
+        return sum(array.nbytes for grouped in (self.__by_row, self.__by_column) for array in (grouped[0], grouped[1], *grouped[2]))
+
+def solve(matrix: AllianceMatrix, scores: np.ndarray, solver: str = "auto", tolerance: float = 1e-10, max_iterations: int = 10000) -> np.ndarray:
+    """
+    Finds the OPRs that best explain the scores (least squares, the smallest such OPRs if there are many, like the pseudoinverse).
+
+    Args:
+        matrix: the alliance matrix
+        scores: every alliance-match's score in every statistic, of shape (alliance-matches, statistics)
+        solver (optional): one of SOLVERS
+        tolerance (optional): sparse only, stop once |A.T (scores - A opr)| has shrunk by this factor for every statistic
+        max_iterations (optional): sparse only, stop after this many iterations even if the tolerance isn't met
+
+    Returns the OPRs, of shape (teams, statistics).
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"solver must be one of {', '.join(SOLVERS)}")
+    if solver == "dense" or (solver == "auto" and matrix.shape[1] <= DENSE_LIMIT):
+        # alliance_matrix * opr_matrix = score_matrix
+        # pseudoinverse(alliance_matrix) * score_matrix = opr_matrix
+        return np.linalg.pinv(matrix.dense()) @ scores
+
+    # Conjugate gradient on the normal equations A.T A x = A.T b (CGLS), run for every statistic at once. Starting from
+    # zero keeps every step in the row space of A, so it converges to the same minimum-norm solution as the pseudoinverse.
+    scores = np.asarray(scores, dtype=np.float64)
+    opr = np.zeros((matrix.shape[1], scores.shape[1]), dtype=np.float64)
+    residual = scores.copy()
+    gradient = matrix.tdot(residual)
+    direction = gradient.copy()
+    gamma = (gradient * gradient).sum(axis=0)
+    stop = tolerance**2 * gamma
+    for _ in range(max_iterations):
+        if np.all(gamma <= stop):
+            break
+        step = matrix.dot(direction)
+        delta = (step * step).sum(axis=0)
+        alpha = np.divide(gamma, delta, out=np.zeros_like(gamma), where=delta > 0)
+        opr += alpha * direction
+        residual -= alpha * step
+        gradient = matrix.tdot(residual)
+        (previous, gamma) = (gamma, (gradient * gradient).sum(axis=0))
+        direction = gradient + np.divide(gamma, previous, out=np.zeros_like(gamma), where=previous > 0) * direction
+    return opr
+
+def calc_opr_from_function(event_code: str, fn: Callable[[dict[database.MatchKey, dict[str, Any]]], float], season: int = 2024, solver: str = "auto") -> dict:
     """
     Calculates OPR for every team in an event.
 
@@ -13,6 +145,7 @@ def calc_opr_from_function(event_code: str, fn: Callable[[dict[database.MatchKey
         event_code: the event code of the event (used to retrieve data from database)
         fn: the function used to calculate the relevant metric, given a dictionary of score stats from the FTC Event API (e.g. autoSampleNet, teleopPoints, etc)
         season: the season the event happened
+        solver (optional): how to solve for the OPRs (see SOLVERS)
     
     Returns a dictionary where key = team number and value = calculated metric.
     """
@@ -20,29 +153,19 @@ def calc_opr_from_function(event_code: str, fn: Callable[[dict[database.MatchKey
     match_teams = database.get_match_teams(event_code=event_code, season=season)
     match_scores = database.get_match_scores(event_code=event_code, season=season)
 
-    teams_at_event = list(set(flatten(map(lambda match_team: list(match_team.keys()), match_teams.values()))))
-
-    alliance_matrix = np.zeros((len(match_scores), len(teams_at_event)), dtype=np.uint64)
-    score_matrix = np.zeros((len(match_scores), 1), dtype=np.float64)
-
-    # alliance_matrix * opr_matrix = score_matrix
-    # pseudoinverse(alliance_matrix) * score_matrix = opr_matrix
+    if not match_teams or any(key not in match_scores for key in match_teams.keys()):
+        # probably didn't pull qual and playoff data from both
+        return {}
 
-    for idx, key in enumerate(match_teams.keys()):
-        if key not in match_scores:
-            # probably didn't pull qual and playoff data from both
-            return {}
-        # ` and match_teams[key][team][1]` ensures a team actually played in that match
-        alliance_matrix[idx] = list(map(lambda team: 1 if team in match_teams[key].keys() and match_teams[key][team][1] else 0, teams_at_event))
-        score_matrix[idx] = fn(match_scores[key])
-
-    opr = np.linalg.pinv(alliance_matrix)@score_matrix
+    matrix = AllianceMatrix(match_teams)
+    score_matrix = np.array([fn(match_scores[key]) for key in match_teams.keys()], dtype=np.float64).reshape(-1, 1)
+    opr = solve(matrix, score_matrix, solver)
 
-    return {teams_at_event[t[0]]: float(t[1][0]) for t in enumerate(opr)}
+    return {team: float(value) for (team, value) in zip(matrix.teams, opr[:, 0])}
 
 def calc_single_stat_opr(event_code: str, statistic: str, season: int = 2024) -> dict:
     """
-    Calculates OPR for every team in an event.
+    Calculates OPR for every team in an event. Results are cached until the event's matches or scores change.
 
     Args:
         event_code: the event code of the event (used to retrieve data from database)
@@ -51,4 +174,141 @@ def calc_single_stat_opr(event_code: str, statistic: str, season: int = 2024) ->
     
     Returns a dictionary where key = team number and value = calculated metric.
     """
-    return calc_opr_from_function(event_code, lambda d: d[statistic], season)
\ No newline at end of file
+    return __cached((season, event_code, statistic, "auto"), database.get_event_version(event_code, season), lambda: calc_opr_from_function(event_code, lambda d: d[statistic], season))
+
+def calc_all_stats_opr(event_code: str, season: int = 2024, solver: str = "auto") -> dict[int, dict[str, float]]:
+    """
+    Calculates OPR for every numeric score statistic (database.NUMERIC_SCORE_FIELDS_2024) at once: the event is loaded
+    and the alliance matrix pseudoinverted a single time, then applied to every statistic's scores together.
+    Results are cached until the event's matches or scores change.
+
+    Args:
+        event_code: the event code of the event (used to retrieve data from database)
+        season: the season the event happened
+        solver (optional): how to solve for the OPRs (see SOLVERS)
+
+    Returns a dictionary where key = team number and value = dictionary where key = statistic and value = calculated metric.
+    """
+    def calculate():
+        match_teams = database.get_match_teams(event_code=event_code, season=season)
+        scores = database.get_match_score_columns(event_code=event_code, season=season)
+        if any(key not in scores.index for key in match_teams.keys()):
+            # probably didn't pull qual and playoff data from both
+            return {}
+        return __calc_all_stats_opr(match_teams, scores, solver)
+
+    return __cached((season, event_code, None, solver), database.get_event_version(event_code, season), calculate)
+
+def calc_event_ratings(event_code: str, season: int = 2024, solver: str = "auto") -> dict[int, dict[str, dict[str, float]]]:
+    """
+    Calculates OPR, DPR and CCWM for every numeric score statistic from one load of the event and one solve: each
+    alliance-match is paired with its opponent's row, and the alliance matrix is solved against the alliance's own
+    scores (OPR), the opponent's scores (DPR, the points a team's opponents score, so lower is better defense) and the
+    margin between them (CCWM, the points a team adds to its alliance's winning margin, equal to OPR - DPR).
+    Results are cached until the event's matches or scores change.
+
+    Args:
+        event_code: the event code of the event (used to retrieve data from database)
+        season: the season the event happened
+        solver (optional): how to solve for the ratings (see SOLVERS)
+
+    Returns a dictionary where key = team number and value = dictionary where key = rating (opr, dpr or ccwm)
+    and value = dictionary where key = statistic and value = calculated metric.
+    """
+    def calculate():
+        match_teams = database.get_match_teams(event_code=event_code, season=season)
+        scores = database.get_match_score_columns(event_code=event_code, season=season)
+        if not match_teams or any(key not in scores.index or key.opposite() not in scores.index for key in match_teams.keys()):
+            # probably didn't pull qual and playoff data from both
+            return {}
+
+        matrix = AllianceMatrix(match_teams)
+        # One row per alliance-match, one column per statistic and rating: own scores, then opponent scores, then margins
+        own = scores.numeric[:, [scores.index[key] for key in match_teams.keys()]].T.astype(np.float64)
+        opponent = scores.numeric[:, [scores.index[key.opposite()] for key in match_teams.keys()]].T.astype(np.float64)
+        ratings = solve(matrix, np.hstack([own, opponent, own - opponent]), solver)
+
+        fields = len(database.NUMERIC_SCORE_FIELDS_2024)
+        return {team: {rating: dict(zip(database.NUMERIC_SCORE_FIELDS_2024, values[i * fields:(i + 1) * fields])) for (i, rating) in enumerate(RATINGS)}
+                for (team, values) in zip(matrix.teams, ratings.tolist())}
+
+    return __cached((season, event_code, "ratings", solver), database.get_event_version(event_code, season), calculate)
+
+def calc_season_opr(season: int = 2024, solver: str = "sparse") -> dict[int, dict[str, float]]:
+    """
+    Calculates a season-wide OPR for every numeric score statistic: every scored alliance-match of every event in one
+    least-squares system, so teams that never met are compared through the teams they both played with.
+    Results are cached until any event in the season changes.
+
+    Args:
+        season: the season to calculate
+        solver (optional): how to solve for the OPRs (see SOLVERS). dense needs alliance-matches x teams x 8 bytes for the matrix.
+
+    Returns a dictionary where key = team number and value = dictionary where key = statistic and value = calculated metric.
+    """
+    def calculate():
+        match_teams = database.get_match_teams(season=season)
+        scores = database.get_match_score_columns(season=season)
+        # Matches still being played (or missing scores) are left out instead of failing the whole season
+        scored = {key: teams for (key, teams) in match_teams.items() if key in scores.index}
+        return __calc_all_stats_opr(scored, scores, solver)
+
+    version = max(database.get_event_versions(season).values(), default=0)
+    return __cached((season, None, None, solver), version, calculate)
+
+def __calc_all_stats_opr(match_teams: dict[database.MatchKey, dict[int, tuple[str, bool]]], scores: database.ScoreColumns, solver: str) -> dict[int, dict[str, float]]:
+    """
+    Solves every numeric statistic's OPR for the given alliance-matches, which must all have scores.
+    """
+    if not match_teams:
+        return {}
+
+    matrix = AllianceMatrix(match_teams)
+    # One column per statistic, one row per alliance-match
+    score_matrix = scores.numeric[:, [scores.index[key] for key in match_teams.keys()]].T.astype(np.float64)
+    opr = solve(matrix, score_matrix, solver)
+
+    return {team: dict(zip(database.NUMERIC_SCORE_FIELDS_2024, values)) for (team, values) in zip(matrix.teams, opr.tolist())}
+
+def __cached(key: tuple, version: int, calculate: Callable[[], dict]) -> dict:
+    """
+    Returns the cached result for `key` if it was calculated at the same data version, or calculates and caches it.
+
+    Args:
+        key: (season, event code or None for the whole season, statistic, None for every statistic or "ratings" for calc_event_ratings,
+             solver), so results from different solvers are cached separately
+        version: the data's current version (see database.get_event_versions), read before calculating so data
+                 ingested meanwhile makes the entry stale instead of being missed
+        calculate: calculates the result from the database
+    """
+    with __cache_lock:
+        cached = __cache.get(key)
+        if cached is not None and cached[0] == version:
+            __cache.move_to_end(key)
+            __cache_stats["hits"] += 1
+            return cached[1]
+        __cache_stats["misses" if cached is None else "stale"] += 1
+
+    result = calculate()
+
+    with __cache_lock:
+        __cache[key] = (version, result)
+        __cache.move_to_end(key)
+        while len(__cache) > CACHE_SIZE:
+            __cache.popitem(last=False)
+    return result
+
+def clear_cache():
+    """
+    Drops every cached OPR result (the counters are kept), so the next calls solve from the database again.
+    """
+    with __cache_lock:
+        __cache.clear()
+
+def get_cache_stats() -> dict[str, int]:
+    """
+    Returns the OPR cache's counters for monitoring: hits, misses (never calculated or evicted), stale (the event
+    changed since) and the number of results cached.
+    """
+    with __cache_lock:
+        return dict(__cache_stats, size=len(__cache))
\ No newline at end of file
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import threading
+from collections import OrderedDict
+import database
+from stats import epa
+
+# Predictions by (season, event code, whether played matches are included), least recently used first.
+# Value = (EPA revision, event version, predictions), so a cached entry is stale as soon as either moves.
+__cache = OrderedDict()
+__cache_lock = threading.Lock()
+# How many events' predictions are kept
+CACHE_SIZE = 256
+
+def predict_event(event_code: str, season: int = 2024, include_played: bool = False) -> list[dict]:
+    """
+    Predicts the scores and winner of every upcoming match at an event from its schedule and the current EPAs,
+    all in one pass (see epa.predict). Predictions are cached until the EPAs, the schedule or the event's scores change.
+
+    Args:
+        event_code: the event to predict
+        season: the season the event happens in
+        include_played (optional): also predict matches that already have scores (from today's EPAs, which include them)
+
+    Returns a list of dictionaries, one per match in start time order (see database.get_scheduled_matches), with:
+        red_score, blue_score: dictionary where key = component (total, auto, teleop, endgame) and value = predicted points
+        red_win_probability: the chance red wins, from 0 to 1
+    """
+    engine = epa.load(season)
+    key = (season, event_code, include_played)
+    # Read before predicting, so anything that changes meanwhile makes the entry stale instead of being missed
+    (revision, version) = (engine.revision, database.get_event_version(event_code, season))
+    with __cache_lock:
+        cached = __cache.get(key)
+        if cached is not None and cached[:2] == (revision, version):
+            __cache.move_to_end(key)
+            return cached[2]
+
+    matches = database.get_scheduled_matches(event_code, season)
+    if not include_played:
+        scored = database.get_scored_matches(event_code, season)
+        matches = [match for match in matches if (match["level"], match["series"], match["number"]) not in scored]
+
+    (scores, red_win_probability) = engine.predict([match["red"] for match in matches], [match["blue"] for match in matches])
+    predictions = [dict(match, red_score=dict(zip(epa.COMPONENT_NAMES, red)), blue_score=dict(zip(epa.COMPONENT_NAMES, blue)), red_win_probability=probability)
+                   for (match, (red, blue), probability) in zip(matches, scores.tolist(), red_win_probability.tolist())]
+
+    with __cache_lock:
+        __cache[key] = (revision, version, predictions)
+        __cache.move_to_end(key)
+        while len(__cache) > CACHE_SIZE:
+            __cache.popitem(last=False)
+    return predictions
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+import threading
+from collections import OrderedDict
+import numpy as np
+import database
+
+# Every team's OPR starts at 0 with this variance. Recursive least squares from P = PRIOR_VARIANCE * I solves least squares
+# with a ridge of 1 / PRIOR_VARIANCE: small enough that a finished event's OPRs match stats.opr to a small fraction of a
+# point, and it keeps early estimates sensible (partners who have only played together split their score evenly).
+PRIOR_VARIANCE = 1e4
+# Engines by (season, event code), least recently used first
+__engines = OrderedDict()
+__engines_lock = threading.Lock()
+# How many events' engines are kept
+CACHE_SIZE = 64
+
+class RollingOpr:
+    """
+    The OPRs of one event, updated match by match with recursive least squares instead of being solved from scratch:
+    it keeps the least-squares solution and its inverse normal matrix (P), and folds in each alliance-match with a
+    rank-one update. A match costs O(teams at the event²) however many matches came before it, and every numeric
+    score statistic is updated at once (they share P).
+
+    Every rank-one update is kept (its gain per team and its residual per statistic, instead of a copy of every OPR),
+    so the trajectory of each team's OPR over the event can be rebuilt.
+
+    Args:
+        event_code: the event to follow
+        season: the season the event happens in
+        prior_variance (optional): see PRIOR_VARIANCE
+    """
+
+    def __init__(self, event_code: str, season: int = 2024, prior_variance: float = PRIOR_VARIANCE):
+        self.event_code = event_code
+        self.season = season
+        self.__prior_variance = prior_variance
+        self.__lock = threading.Lock()
+        self.__version = None
+        self.__reset()
+
+    def __reset(self):
+        # key = team and value = its row/column in P and the OPRs
+        self.__columns = {}
+        # Allocated with spare capacity, so teams joining mid-event don't copy them every time
+        self.__covariance = np.zeros((0, 0), dtype=np.float64)
+        self.__oprs = np.zeros((0, len(database.NUMERIC_SCORE_FIELDS_2024)), dtype=np.float64)
+        # The matches applied so far in order, as (level, series, number, start time), and the same without start times
+        self.__matches = []
+        self.__applied = set()
+        # The updates each applied match made, as a list of (gain per team seen so far, residual per statistic):
+        # every OPR moved by gain[team] * residual[statistic]. And how many teams had been seen after each match.
+        self.__updates = []
+        self.__seen = []
+
+    def __add_team(self, team: int) -> int:
+        column = self.__columns.get(team)
+        if column is not None:
+            return column
+        column = self.__columns[team] = len(self.__columns)
+        if column == len(self.__covariance):
+            capacity = max(2 * column, 32)
+            covariance = np.zeros((capacity, capacity), dtype=np.float64)
+            covariance[:column, :column] = self.__covariance
+            oprs = np.zeros((capacity, self.__oprs.shape[1]), dtype=np.float64)
+            oprs[:column] = self.__oprs
+            (self.__covariance, self.__oprs) = (covariance, oprs)
+        # A new team is independent of everyone seen before
+        self.__covariance[column, column] = self.__prior_variance
+        return column
+
+    def __add_alliance(self, teams: dict[int, tuple[str, bool]], scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the update's (gain, residual), or None if no team was on the field.
+        """
+        # Teams that didn't play still get an OPR (of 0 until they do), like stats.opr
+        columns = [self.__add_team(team) for team in teams]
+        columns = [column for (column, (_, on_field)) in zip(columns, teams.values()) if on_field]
+        if not columns:
+            return None
+        n = len(self.__columns)
+        (covariance, oprs) = (self.__covariance[:n, :n], self.__oprs[:n])
+        # The alliance's row a is 1 for every team on the field, so P a sums columns and a.T P a sums a block
+        spread = covariance[:, columns].sum(axis=1)
+        gain = spread / (1 + spread[columns].sum())
+        residual = scores - oprs[columns].sum(axis=0)
+        oprs += np.outer(gain, residual)
+        covariance -= np.outer(gain, spread)
+        return gain, residual
+
+    def add_match(self, level: str, series: int, number: int, start_time: float,
+                  red: tuple[dict[int, tuple[str, bool]], np.ndarray], blue: tuple[dict[int, tuple[str, bool]], np.ndarray]):
+        """
+        Folds one scored match into the OPRs and records everyone's OPR after it.
+
+        Args:
+            level, series, number, start_time: identify the match (see database.MatchKey)
+            red, blue: (teams as returned by database.get_match_teams, scores in the order of database.NUMERIC_SCORE_FIELDS_2024)
+        """
+        updates = [self.__add_alliance(teams, np.asarray(scores, dtype=np.float64)) for (teams, scores) in (red, blue)]
+        self.__updates.append([update for update in updates if update is not None])
+        self.__seen.append(len(self.__columns))
+        self.__matches.append((level, series, number, start_time))
+        self.__applied.add((level, series, number))
+
+    def update(self) -> int:
+        """
+        Applies the event's newly scored matches from the database. Nothing is read unless the event's version changed,
+        and then only the matches written since the last update; the engine starts over from the whole event only if
+        one of them was already applied (its teams or scores changed) or was scored before the last applied match.
+
+        Returns the number of matches applied.
+        """
+        with self.__lock:
+            # Read before loading, so anything ingested meanwhile is picked up next time instead of being missed
+            # (at worst, a match loaded now is read again and looks changed, which only means starting over)
+            version = database.get_event_version(self.event_code, self.season)
+            if version == self.__version:
+                return 0
+
+            if self.__version is None:
+                (_, matches, teams, scores) = self.__scored_matches()
+            else:
+                (changed, matches, teams, scores) = self.__scored_matches(since=self.__version)
+                if not changed.isdisjoint(self.__applied) or (matches and self.__matches and matches[0][3] < self.__matches[-1][3]):
+                    self.__reset()
+                    (_, matches, teams, scores) = self.__scored_matches()
+            for i in range(len(matches)):
+                self.add_match(*matches[i], (teams[i][0], scores[i, 0]), (teams[i][1], scores[i, 1]))
+            self.__version = version
+            return len(matches)
+
+    def __scored_matches(self, since: int = None) -> tuple[set[tuple], list[tuple], list[tuple], np.ndarray]:
+        """
+        Reads the event's matches where both alliances have scores, in start time order.
+
+        Args:
+            since (optional): an event version, to read only the matches written after it (see database.get_match_teams)
+
+        Returns (every match read, scored or not, as (level, series, number), a list of the scored ones' (level, series, number,
+        start time), a list of their (red teams, blue teams) and their scores, of shape (matches, 2 alliances (red, blue), statistics)).
+        """
+        match_teams = database.get_match_teams(event_code=self.event_code, season=self.season, since=since)
+        scores = database.get_match_score_columns(event_code=self.event_code, season=self.season, since=since)
+        read = {(key.match_level, key.match_series, key.match_number) for key in (*match_teams.keys(), *scores.index.keys())}
+        (matches, teams, rows) = ([], [], [])
+        for (key, red_teams) in match_teams.items():
+            # Each match once, from its red side
+            if key.alliance != "Red" or key not in scores.index or key.opposite() not in scores.index or key.opposite() not in match_teams:
+                continue
+            matches.append((key.match_level, key.match_series, key.match_number, key.start_time))
+            teams.append((red_teams, match_teams[key.opposite()]))
+            rows.append((scores.index[key], scores.index[key.opposite()]))
+        return read, matches, teams, scores.numeric.T[np.array(rows, dtype=np.intp).reshape(-1, 2)].astype(np.float64)
+
+    def get_oprs(self) -> dict[int, dict[str, float]]:
+        """
+        Returns a dictionary where key = team and value = dictionary where key = statistic and value = current OPR.
+        """
+        with self.__lock:
+            oprs = self.__oprs[:len(self.__columns)].tolist()
+            return {team: dict(zip(database.NUMERIC_SCORE_FIELDS_2024, oprs[column])) for (team, column) in self.__columns.items()}
+
+    def get_trajectory(self, statistic: str = "totalPoints", teams: list[int] = None) -> dict:
+        """
+        Returns how the OPRs of a statistic moved over the event.
+
+        Args:
+            statistic (optional): one of database.NUMERIC_SCORE_FIELDS_2024
+            teams (optional): only these teams, defaults to everyone at the event
+
+        Returns a dictionary with:
+            matches: a list of dictionaries with the level, series, number and start_time of every applied match, in order
+            teams: dictionary where key = team and value = its OPR after each match (None before the team's first match)
+        """
+        field = database.NUMERIC_SCORE_FIELDS_2024.index(statistic)
+        with self.__lock:
+            columns = {team: self.__columns[team] for team in (self.__columns if teams is None else teams) if team in self.__columns}
+            picked = np.array(list(columns.values()), dtype=np.intp)
+            # Replaying the updates in order adds exactly what they added to the OPRs, so the values match bit for bit
+            oprs = np.zeros(len(picked), dtype=np.float64)
+            after = []
+            for (updates, seen) in zip(self.__updates, self.__seen):
+                for (gain, residual) in updates:
+                    present = picked < len(gain)
+                    oprs[present] += gain[picked[present]] * residual[field]
+                after.append([float(opr) if column < seen else None for (opr, column) in zip(oprs.tolist(), picked.tolist())])
+            trajectories = {team: [values[i] for values in after] for (i, team) in enumerate(columns)}
+            matches = [{"level": level, "series": series, "number": number, "start_time": start_time} for (level, series, number, start_time) in self.__matches]
+            return {"matches": matches, "teams": trajectories}
+
+def load(event_code: str, season: int = 2024) -> RollingOpr:
+    """
+    Returns the event's rolling OPR engine, caught up with every match scored so far.
+    """
+    key = (season, event_code)
+    with __engines_lock:
+        engine = __engines.get(key)
+        if engine is None:
+            engine = __engines[key] = RollingOpr(event_code, season)
+        __engines.move_to_end(key)
+        while len(__engines) > CACHE_SIZE:
+            __engines.popitem(last=False)
+    engine.update()
+    return engine
+
+def get_oprs(event_code: str, season: int = 2024) -> dict[int, dict[str, float]]:
+    """
+    Returns the current OPRs of every numeric statistic for all teams at an event (see RollingOpr.get_oprs).
+    """
+    return load(event_code, season).get_oprs()
+
+def get_trajectory(event_code: str, statistic: str = "totalPoints", teams: list[int] = None, season: int = 2024) -> dict:
+    """
+    Returns how an event's OPRs of a statistic moved match by match (see RollingOpr.get_trajectory).
+    """
+    return load(event_code, season).get_trajectory(statistic, teams)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Replays an EPA season under a grid of parameters (update factor x prior divisor) on a process pool, and reports how
+well each setting predicted the held-out matches at the end of the season: the error of the predicted total margin
+and alliance scores, and the Brier score of red's win probability (see EpaEngine.predict).
+
+Every team starts at the same prior, so with equal-size alliances it cancels out of every margin: the prior divisor
+only shows up in the score error.
+
+The season is loaded and compiled once (see EpaEngine.export_season) and its arrays are put in shared memory,
+so every worker reads the same copy instead of getting its own.
+
+Usage (from the repository root):
+    python -m tools.backtest_epa --database database.db --update-factors 0.1,0.144,0.2 --prior-divisors 1.5,2,3
+    python -m tools.backtest_epa --synthetic 300x3000 --workers 4
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import database
+from stats import epa
+from tools.synthetic_season import scratch_database, populate
+
+# The season in a worker process: key = array name and value = a view of its shared memory block (see attach)
+__season = {}
+# The worker's handles on the blocks, kept open as long as the views are used
+__blocks = []
+
+def share(arrays: dict[str, np.ndarray]) -> tuple[list[shared_memory.SharedMemory], dict[str, tuple[str, tuple, str]]]:
+    """
+    Copies arrays into shared memory blocks.
+
+    Returns (the blocks, which the caller closes and unlinks when the workers are done,
+    a dictionary where key = array name and value = (block name, shape, dtype) to pass to `attach`).
+    """
+    blocks, layout = [], {}
+    for (name, values) in arrays.items():
+        values = np.ascontiguousarray(values)
+        # Blocks can't be empty
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+        blocks.append(block)
+        layout[name] = (block.name, values.shape, values.dtype.str)
+    return blocks, layout
+
+def attach(layout: dict[str, tuple[str, tuple, str]]):
+    """
+    Maps the shared season arrays into a worker process without copying them (the pool's initializer).
+    """
+    for (name, (block_name, shape, dtype)) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        __blocks.append(block)
+        __season[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def evaluate(update_factor: float, prior_divisor: float, holdout_start: int, spread: float) -> dict:
+    """
+    Replays the shared season with one setting, predicting every match from the EPAs just before it.
+
+    Args:
+        update_factor: see epa.UPDATE_FACTOR
+        prior_divisor: see epa.PRIOR_DIVISOR
+        holdout_start: the index of the first held-out match; only matches from here on are scored
+        spread: the stddev of alliance scores used for win probabilities, from the matches before the held-out ones
+
+    Returns a dictionary with the setting, the mean absolute and root mean square error of the predicted total margin,
+    the mean absolute error of the predicted alliance scores, the Brier score of red's win probability (ties count as 0.5)
+    and how often the favorite won (ties left out).
+    """
+    rows, margins = __season["rows"], __season["margins"]
+    bounds = __season["level_bounds"].tolist()
+    levels = [__season["level_order"][start:end] for (start, end) in zip(bounds, bounds[1:])]
+
+    # Every team starts at the prior, row 0 (nobody) at zero
+    ratings = np.tile(__season["window_average"] / prior_divisor, (int(rows.max(initial=0)) + 1, 1))
+    ratings[0] = 0
+    predicted = np.empty((len(margins), 2, margins.shape[1]), dtype=np.float64)
+    epa.replay_levels(ratings, rows, margins, levels, update_factor=update_factor, predicted=predicted)
+
+    score_errors = predicted[holdout_start:, :, 0] - __season["scores"][holdout_start:, :, 0]
+    (predicted, actual) = (predicted[holdout_start:, 0, 0] - predicted[holdout_start:, 1, 0], margins[holdout_start:, 0])
+    errors = predicted - actual
+    probability = 1 / (1 + 10 ** (-5/8 * predicted / spread))
+    outcome = np.sign(actual) / 2 + 0.5
+    decided = outcome != 0.5
+    return {"update_factor": update_factor, "prior_divisor": prior_divisor,
+            "mae": float(np.abs(errors).mean()) if len(errors) else None,
+            "rmse": float(np.sqrt((errors ** 2).mean())) if len(errors) else None,
+            "score_mae": float(np.abs(score_errors).mean()) if len(errors) else None,
+            "brier": float(((probability - outcome) ** 2).mean()) if len(errors) else None,
+            "accuracy": float(((probability > 0.5) == (outcome > 0.5))[decided].mean()) if decided.any() else None}
+
+def parse_floats(values: str) -> list[float]:
+    """
+    Parses a comma separated list of numbers, allowing fractions (e.g. 36/250).
+    """
+    floats = []
+    for value in values.split(","):
+        (numerator, _, denominator) = value.partition("/")
+        floats.append(float(numerator) / float(denominator or 1))
+    return floats
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest EPA parameters on held-out matches")
+    parser.add_argument("--database", default="database.db", help="the database to read the season from")
+    parser.add_argument("--synthetic", help="backtest a synthetic season of EVENTSxTEAMS instead (e.g. 300x3000)")
+    parser.add_argument("--season", type=int, default=2024)
+    parser.add_argument("--update-factors", default="0.08,0.11,36/250,0.18,0.22")
+    parser.add_argument("--prior-divisors", default="1.5,2,2.5,3")
+    parser.add_argument("--holdout", type=float, default=0.2, help="the fraction of matches at the end of the season to score")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.synthetic:
+        (events, teams) = (int(n) for n in args.synthetic.lower().split("x"))
+        scratch_database()
+        populate(events=events, teams=teams, schedule=False)
+    else:
+        database.configure(args.database)
+        database.init()
+
+    start = time.perf_counter()
+    engine = epa.EpaEngine(args.season)
+    engine.init()
+    arrays = engine.export_season(database.get_match_score_columns(season=args.season))
+    matches = len(arrays["margins"])
+    if matches == 0:
+        print(f"No matches with scores stored for {args.season}")
+        exit(1)
+    print(f"Loaded {matches} matches in {time.perf_counter() - start:.1f}s")
+
+    holdout_start = int(matches * (1 - args.holdout))
+    # Only the matches before the held-out ones, so the spread doesn't peek at the answers
+    spread = float(arrays["margins"][:holdout_start, 0].std() / np.sqrt(2)) if holdout_start > 1 else 0.0
+    spread = spread if spread > 0 else 1.0
+
+    grid = list(itertools.product(parse_floats(args.update_factors), parse_floats(args.prior_divisors)))
+    blocks, layout = share(arrays)
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=attach, initargs=(layout,)) as pool:
+            results = list(pool.map(evaluate, *zip(*grid), itertools.repeat(holdout_start), itertools.repeat(spread)))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(grid)} settings on {args.workers} workers in {elapsed:.1f}s, scored on the last {matches - holdout_start} matches "
+          f"(season arrays shared: {sum(values.nbytes for values in arrays.values()) / 2**20:.1f} MiB)")
+    print(f"{'update factor':>14}{'prior divisor':>15}{'margin MAE':>12}{'margin RMSE':>13}{'score MAE':>11}{'Brier':>8}{'accuracy':>10}")
+    for result in sorted(results, key=lambda result: (result["brier"], result["score_mae"])):
+        current = "  <-- current" if (result["update_factor"], result["prior_divisor"]) == (epa.UPDATE_FACTOR, epa.PRIOR_DIVISOR) else ""
+        print(f"{result['update_factor']:>14.4f}{result['prior_divisor']:>15.2f}{result['mae']:>12.2f}{result['rmse']:>13.2f}"
+              f"{result['score_mae']:>11.2f}{result['brier']:>8.4f}{result['accuracy']:>10.1%}{current}")
+
+if __name__ == "__main__":
+    main()
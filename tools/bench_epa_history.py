@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compares the memory used by the array-backed EPA history store against the previous layout (a list of
+(MatchKey, EPA) tuples per team in a defaultdict), and shows that looking up unknown teams no longer grows it.
+
+Usage (from the repository root):
+    python -m tools.bench_epa_history --events 300 --teams 3000
+"""
+import argparse
+import sys
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stats import epa
+from tools.synthetic_season import scratch_database, populate
+
+def retained(fn) -> tuple[object, int]:
+    """
+    Returns (result, bytes still allocated by the result).
+    """
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare EPA history memory against the list-of-tuples layout")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--teams", type=int, default=3000)
+    parser.add_argument("--unknown-lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    scratch_database()
+    populate(events=args.events, teams=args.teams, schedule=False)
+    epa.init()
+    epa.season_epa()
+
+    teams = list(epa.get_ranks().keys())
+    # The MatchKeys are shared with the applied match list, so only the tuples, lists and floats count against the old layout
+    keys = {}
+    def legacy_history():
+        history = defaultdict(lambda: [])
+        for team in teams:
+            for (start_time, value) in epa.get_all_epas(team).items():
+                key = keys.setdefault(start_time, object())
+                history[team].append((key, float(value)))
+        return history
+
+    legacy, legacy_bytes = retained(legacy_history)
+    entries = sum(len(entries) for entries in legacy.values())
+    usage = epa.get_memory_usage()
+
+    print(f"{usage['teams']} teams, {entries} history entries")
+    print(f"{'store':<24}{'memory (MiB)':>14}{'bytes/entry':>13}")
+    print(f"{'list of tuples':<24}{legacy_bytes / 2**20:>14.2f}{legacy_bytes / entries:>13.1f}")
+    print(f"{f'arrays ({len(epa.COMPONENTS)} components)':<24}{usage['history'] / 2**20:>14.2f}{usage['history'] / entries:>13.1f}")
+
+    # Unknown team numbers, as arbitrary /api/stats/epa/<season>/<team> requests would send
+    unknown = range(100000, 100000 + args.unknown_lookups)
+    for team in unknown:
+        legacy[team]
+    legacy_grew = len(legacy) - len(teams)
+    for team in unknown:
+        epa.get_epa(team)
+        epa.get_all_epas(team)
+    print(f"\n{args.unknown_lookups} unknown-team lookups: list of tuples grew by {legacy_grew} teams, "
+          f"arrays grew by {epa.get_memory_usage()['teams'] - usage['teams']} teams")
+
+if __name__ == "__main__":
+    main()
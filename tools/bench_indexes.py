@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Times the hot-path queries against a scratch database before and after the schema migrations run,
+and shows the query plan SQLite picks for each.
+
+Usage (from the repository root):
+    python -m tools.bench_indexes --events 200 --teams 3000
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database
+from tools.synthetic_season import populate
+
+MATCH_COLUMNS = "eventCode, tournamentLevel, series, matchNumber, teamNumber, station, onField, actualStartTime"
+# What get_match_teams reads now: start times as epoch seconds, in match order (through the matches_teams index)
+MATCH_TEAMS_COLUMNS = "eventCode, tournamentLevel, series, matchNumber, station, teamNumber, onField, startTimestamp"
+MATCH_TEAMS_ORDER = "ORDER BY eventCode, tournamentLevel, series, matchNumber, station"
+
+# (name, query before the migrations, query after, parameters)
+QUERIES = [
+    ("get_match_teams (season)",
+     f"SELECT {MATCH_COLUMNS} FROM matches WHERE season=? ORDER BY DATETIME(actualStartTime)",
+     f"SELECT {MATCH_TEAMS_COLUMNS} FROM matches WHERE season=? AND startTimestamp IS NOT NULL {MATCH_TEAMS_ORDER}",
+     lambda ctx: (2024,)),
+    ("get_match_teams (event)",
+     f"SELECT {MATCH_COLUMNS} FROM matches WHERE eventCode=? AND season=? ORDER BY DATETIME(actualStartTime)",
+     f"SELECT {MATCH_TEAMS_COLUMNS} FROM matches WHERE eventCode=? AND season=? AND startTimestamp IS NOT NULL {MATCH_TEAMS_ORDER}",
+     lambda ctx: (ctx["event"], 2024)),
+    ("get_match_scores (event)",
+     "SELECT * FROM scores WHERE eventCode=? AND season=?",
+     "SELECT * FROM scores WHERE eventCode=? AND season=?",
+     lambda ctx: (ctx["event"], 2024)),
+    ("get_scouted_matches_for_team",
+     "SELECT * FROM scouting_match_data WHERE owning_team=? ORDER BY created_at DESC",
+     "SELECT * FROM scouting_match_data WHERE owning_team=? ORDER BY created_at DESC",
+     lambda ctx: (ctx["owner"],)),
+    ("get_team_by_code",
+     "SELECT rowid, name, team_code, team_number FROM teams WHERE team_code=?",
+     "SELECT rowid, name, team_code, team_number FROM teams WHERE team_code=?",
+     lambda ctx: (ctx["code"],)),
+    ("get_team_members",
+     "SELECT rowid, name, email, team_role FROM users WHERE team_id=? ORDER BY team_role DESC, name",
+     "SELECT rowid, name, email, team_role FROM users WHERE team_id=? ORDER BY team_role DESC, name",
+     lambda ctx: (ctx["owner"],)),
+]
+
+def time_query(conn, query: str, params: tuple, repeats: int) -> float:
+    """
+    Returns the median time in milliseconds to run a query and fetch every row.
+    """
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def query_plan(conn, query: str, params: tuple) -> str:
+    return "; ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall())
+
+def main():
+    parser = argparse.ArgumentParser(description="Time hot-path queries before and after the schema migrations")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--teams", type=int, default=3000)
+    parser.add_argument("--scouting-rows", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    # The schema is created by hand below, so the migrations can be timed separately
+    database.configure(str(Path(tempfile.mkdtemp()) / "database.db"))
+
+    with database.writing() as conn:
+        with open(database.schema_file) as f:
+            conn.executescript(f.read())
+        # store_matches writes the startTimestamp column migration 002 adds, and both stores write the version
+        # columns from migration 006, so the rows are staged with them and the columns are dropped again before
+        # timing the original schema. The stores also bump the event versions from migration 003, which no timed query reads.
+        conn.execute("ALTER TABLE matches ADD COLUMN startTimestamp INTEGER")
+        conn.execute("ALTER TABLE matches ADD COLUMN version INTEGER")
+        conn.execute("ALTER TABLE scores ADD COLUMN version INTEGER")
+        with open(database.migrations_dir / "003_event_versions.sql") as f:
+            conn.executescript(f.read())
+
+        print(f"Generating {args.events} events with {args.teams} teams")
+        listings = populate(events=args.events, teams=args.teams)
+
+        rng = random.Random(0)
+        codes = [f"CODE{i:05d}" for i in range(args.teams)]
+        with conn:
+            conn.executemany("INSERT INTO teams (name, team_number, team_code) VALUES (?, ?, ?)", [(f"Team {i}", i, code) for i, code in enumerate(codes)])
+            conn.executemany("INSERT INTO users (name, email, password, salt, team_id, team_role) VALUES (?, ?, ?, ?, ?, 0)",
+                             [(f"User {i}", f"user{i}@example.com", "x", "x", rng.randrange(args.teams)) for i in range(args.teams * 4)])
+            conn.executemany("INSERT INTO scouting_match_data (owning_team, team, climb_level) VALUES (?, ?, ?)",
+                             [(rng.randrange(args.teams), rng.randrange(1000, 30000), rng.randrange(4)) for _ in range(args.scouting_rows)])
+
+        conn.execute("ALTER TABLE matches DROP COLUMN startTimestamp")
+        conn.execute("ALTER TABLE matches DROP COLUMN version")
+        conn.execute("ALTER TABLE scores DROP COLUMN version")
+
+        ctx = {"event": listings[len(listings) // 2]["code"], "owner": args.teams // 2, "code": codes[args.teams // 2]}
+        matches_rows = conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        print(f"{matches_rows} match rows, {args.scouting_rows} scouting rows\n")
+
+        before = {name: (time_query(conn, old, params(ctx), args.repeats), query_plan(conn, old, params(ctx))) for (name, old, _, params) in QUERIES}
+        database.migrate(conn)
+        conn.execute("ANALYZE")
+        after = {name: (time_query(conn, new, params(ctx), args.repeats), query_plan(conn, new, params(ctx))) for (name, _, new, params) in QUERIES}
+
+        print(f"{'query':<32}{'before (ms)':>12}{'after (ms)':>12}{'speedup':>10}")
+        for (name, _, _, _) in QUERIES:
+            print(f"{name:<32}{before[name][0]:>12.3f}{after[name][0]:>12.3f}{before[name][0] / after[name][0]:>9.1f}x")
+
+        print("\nQuery plans")
+        for (name, _, _, _) in QUERIES:
+            print(f"{name}\n  before: {before[name][1]}\n  after:  {after[name][1]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compares the slotted, hash-caching MatchKey against the previous MatchKey (a plain class whose hash
+formatted its repr on every call), both for raw hashing/lookups and for a full-season EPA replay.
+
+Usage (from the repository root):
+    python -m tools.bench_match_key --events 300 --teams 3000
+"""
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database
+from stats import epa
+from tools.synthetic_season import scratch_database, populate
+
+class LegacyMatchKey:
+    """
+    MatchKey as it was before it had slots and a cached hash.
+    """
+    def __init__(self, event_code, match_level, match_series, match_number, alliance, season=2024, start_time=None):
+        self.event_code = event_code
+        self.match_level = match_level
+        self.match_series = match_series
+        self.match_number = match_number
+        self.alliance = alliance
+        self.season = season
+        self.start_time = start_time
+
+    def __repr__(self) -> str:
+        return f'MatchKey(event_code="{self.event_code}", match_level="{self.match_level}", match_series={self.match_series}, match_number={self.match_number}, alliance="{self.alliance}", season={self.season})'
+
+    def __hash__(self) -> int:
+        return self.__repr__().__hash__()
+
+    def __eq__(self, other) -> bool:
+        return self.__hash__() == other.__hash__()
+
+def legacy_replay(teams: dict, totals: dict, prior: float) -> dict:
+    """
+    The season replay as it was: two deepcopies per match to flip the alliance, and filter/map lookups.
+    """
+    epas = {}
+    for match_key in sorted(filter(lambda k: k.alliance == "Red", teams.keys()), key=lambda k: k.start_time):
+        red_match_key = copy.deepcopy(match_key)
+        red_match_key.alliance = "Red"
+        blue_match_key = copy.deepcopy(match_key)
+        blue_match_key.alliance = "Blue"
+
+        red_teams = list(filter(lambda t: teams[red_match_key][t][1], teams[red_match_key].keys()))
+        blue_teams = list(filter(lambda t: teams[blue_match_key][t][1], teams[blue_match_key].keys()))
+
+        predicted_score_margin = sum(map(lambda team: epas.get(team, prior), red_teams)) - sum(map(lambda team: epas.get(team, prior), blue_teams))
+        actual_score_margin = totals[red_match_key] - totals[blue_match_key]
+        delta_epa = 36/250 * (actual_score_margin - predicted_score_margin)
+
+        for team in red_teams:
+            epas[team] = epas.get(team, prior) + delta_epa
+        for team in blue_teams:
+            epas[team] = epas.get(team, prior) - delta_epa
+    return epas
+
+def timed(fn) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MatchKey hashing and EPA replay against the previous MatchKey")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--teams", type=int, default=3000)
+    args = parser.parse_args()
+
+    scratch_database()
+    populate(events=args.events, teams=args.teams, schedule=False)
+
+    teams = database.get_match_teams()
+    scores = database.get_match_score_columns()
+    totals = scores.column("totalPoints")
+
+    def legacy_key(key):
+        return LegacyMatchKey(key.event_code, key.match_level, key.match_series, key.match_number, key.alliance, key.season, key.start_time)
+
+    legacy_teams = {legacy_key(key): value for (key, value) in teams.items()}
+    legacy_totals = {legacy_key(key): int(totals[row]) for (row, key) in enumerate(scores.keys)}
+    keys, legacy_keys = list(teams.keys()), list(legacy_teams.keys())
+
+    # Replays reuse the ratings from the previous run, which doesn't change how much work they do
+    epa.init()
+
+    print(f"{len(keys)} alliance-matches\n")
+    print(f"{'operation':<28}{'legacy (s)':>12}{'current (s)':>13}{'speedup':>10}")
+
+    for (name, legacy_fn, current_fn) in [
+            ("hash every key x10", lambda: [hash(k) for _ in range(10) for k in legacy_keys], lambda: [hash(k) for _ in range(10) for k in keys]),
+            ("dict lookup every key x10", lambda: [legacy_teams[k] for _ in range(10) for k in legacy_keys], lambda: [teams[k] for _ in range(10) for k in keys]),
+            ("opposite alliance key", lambda: [copy.deepcopy(k) for k in legacy_keys], lambda: [k.opposite() for k in keys]),
+            ("season EPA replay", lambda: legacy_replay(legacy_teams, legacy_totals, 20.0), epa.season_epa)]:
+        legacy_time, current_time = timed(legacy_fn), timed(current_fn)
+        print(f"{name:<28}{legacy_time:>12.3f}{current_time:>13.3f}{legacy_time / current_time:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
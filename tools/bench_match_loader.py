@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compares the season-wide get_match_teams loader against the previous implementation, which parsed
+start times with strptime/mktime on every row and folded single-entry dicts together with reduce/merge_with.
+
+Usage (from the repository root):
+    python -m tools.bench_match_loader --events 300 --teams 3000
+"""
+import argparse
+import statistics
+import sys
+import time
+from functools import reduce
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database
+from tools.synthetic_season import scratch_database, populate
+
+def legacy_get_match_teams(database, season: int = 2024) -> dict:
+    """
+    The loader as it was before start times were stored as epochs.
+    """
+    from helper import merge_with, merge_left
+
+    with database.reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT eventCode, tournamentLevel, series, matchNumber, teamNumber, station, onField, actualStartTime FROM matches WHERE season=? ORDER BY DATETIME(actualStartTime)", (season,))
+        matches = cursor.fetchall()
+        individual_dicts = [{database.MatchKey(event_code, match_level, match_series, match_number, alliance=station[:-1], season=season, start_time=time.mktime(time.strptime(actualStartTime if "." not in actualStartTime else actualStartTime[:actualStartTime.index(".")], "%Y-%m-%dT%H:%M:%S"))): {team_number: (station, on_field)}}
+                            for (event_code, match_level, match_series, match_number, team_number, station, on_field, actualStartTime) in matches]
+        return reduce(lambda current_dict, new_dict: merge_with(merge_left, current_dict, new_dict), individual_dicts)
+
+def best_of(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples), statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time season-wide match loading against the previous loader")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--teams", type=int, default=3000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    scratch_database()
+    populate(events=args.events, teams=args.teams, schedule=False)
+
+    with database.reading() as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    legacy, current = legacy_get_match_teams(database), database.get_match_teams()
+    assert legacy.keys() == current.keys() and all(legacy[key] == current[key] for key in current), "loaders disagree"
+
+    legacy_best, legacy_median = best_of(lambda: legacy_get_match_teams(database), args.repeats)
+    current_best, current_median = best_of(lambda: database.get_match_teams(), args.repeats)
+
+    print(f"{rows} match rows, {len(current)} alliance-matches")
+    print(f"{'loader':<12}{'best (s)':>10}{'median (s)':>12}")
+    print(f"{'legacy':<12}{legacy_best:>10.3f}{legacy_median:>12.3f}")
+    print(f"{'current':<12}{current_best:>10.3f}{current_median:>12.3f}")
+    print(f"speedup: {legacy_median / current_median:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compares the dense (pseudoinverse) and sparse (conjugate gradient) OPR solvers on a synthetic season: per event,
+and season-wide with every event's matches in one system. Reports solve time, alliance matrix memory and the
+largest difference between the two solvers' OPRs. Loading the matches is timed separately, since both share it.
+
+Usage (from the repository root):
+    python -m tools.bench_opr --events 300 --teams 3000
+    python -m tools.bench_opr --events 20 --teams 600 --teams-per-event 300
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import database
+from stats import opr
+from tools.synthetic_season import scratch_database, populate
+
+def timed(fn) -> tuple[object, float]:
+    """
+    Returns (result, seconds it took).
+    """
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def system(match_teams: dict, scores: database.ScoreColumns) -> tuple[opr.AllianceMatrix, np.ndarray]:
+    """
+    Returns the alliance matrix and score matrix (every numeric statistic) of the scored alliance-matches.
+    """
+    match_teams = {key: teams for (key, teams) in match_teams.items() if key in scores.index}
+    return opr.AllianceMatrix(match_teams), scores.numeric[:, [scores.index[key] for key in match_teams.keys()]].T.astype(np.float64)
+
+def compare(name: str, matrices: list[tuple[opr.AllianceMatrix, np.ndarray]], dense_limit: int):
+    """
+    Solves every system with both solvers and prints one line of totals. Dense is skipped above dense_limit teams.
+    """
+    sparse, sparse_time = timed(lambda: [opr.solve(matrix, scores, "sparse") for (matrix, scores) in matrices])
+    teams = max(matrix.shape[1] for (matrix, _) in matrices)
+    dense_bytes = sum(matrix.shape[0] * matrix.shape[1] * 8 for (matrix, _) in matrices)
+    sparse_bytes = sum(matrix.nbytes for (matrix, _) in matrices)
+    if teams <= dense_limit:
+        dense, dense_time = timed(lambda: [opr.solve(matrix, scores, "dense") for (matrix, scores) in matrices])
+        difference = max(float(np.abs(a - b).max(initial=0)) for (a, b) in zip(dense, sparse))
+        dense_column = f"{dense_time:>12.3f}{dense_time / sparse_time:>9.1f}x{difference:>12.2e}"
+    else:
+        dense_column = f"{'skipped':>12}{'':>10}{'':>12}"
+    print(f"{name:<22}{teams:>7}{sparse_time:>12.3f}{dense_column}{dense_bytes / 2**20:>12.1f}{sparse_bytes / 2**20:>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the dense and sparse OPR solvers")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--teams", type=int, default=3000)
+    parser.add_argument("--teams-per-event", type=int, default=24)
+    parser.add_argument("--dense-limit", type=int, default=3000, help="skip the dense solver on systems with more teams than this")
+    args = parser.parse_args()
+
+    scratch_database()
+    populate(events=args.events, teams=args.teams, teams_per_event=args.teams_per_event, schedule=False)
+
+    (match_teams, scores), load_time = timed(lambda: (database.get_match_teams(), database.get_match_score_columns()))
+    print(f"Loaded {len(match_teams)} alliance-matches in {load_time:.2f}s, {len(database.NUMERIC_SCORE_FIELDS_2024)} statistics per solve\n")
+
+    events = {}
+    for (key, teams) in match_teams.items():
+        events.setdefault(key.event_code, {})[key] = teams
+
+    print(f"{'system':<22}{'teams':>7}{'sparse (s)':>12}{'dense (s)':>12}{'speedup':>10}{'max diff':>12}{'dense MiB':>12}{'sparse MiB':>12}")
+    compare(f"{len(events)} events", [system(event, scores) for event in events.values()], args.dense_limit)
+    compare("season-wide", [system(match_teams, scores)], args.dense_limit)
+
+if __name__ == "__main__":
+    main()
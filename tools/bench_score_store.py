@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compares the memory and load time of the columnar score store (get_match_score_columns) against
+the previous dict-of-dicts loader, for a whole synthetic season.
+
+Usage (from the repository root):
+    python -m tools.bench_score_store --events 300 --teams 3000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database
+from tools.synthetic_season import scratch_database, populate
+
+def legacy_get_match_scores(database, season: int = 2024) -> dict:
+    """
+    The loader as it was before scores were stored in columns.
+    """
+    with database.reading() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT eventCode, matchLevel, matchSeries, matchNumber, alliance, {', '.join(database.SCORE_FIELDS_2024)} FROM scores WHERE season=?", (season,))
+        scores = cursor.fetchall()
+        return {database.MatchKey(event_code=score[0], match_level=score[1], match_series=score[2], match_number=score[3], alliance=score[4], season=season): {database.SCORE_FIELDS_2024[i]: score[5+i] for i in range(len(database.SCORE_FIELDS_2024))} for score in scores}
+
+def measure(fn) -> tuple[object, float, int]:
+    """
+    Returns (result, best of three times in seconds, bytes still allocated by the result).
+    """
+    elapsed = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        fn()
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    # Memory is measured on a separate run, since tracing allocations slows everything down
+    tracemalloc.start()
+    result = fn()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the columnar score store with the dict-of-dicts loader")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--teams", type=int, default=3000)
+    args = parser.parse_args()
+
+    scratch_database()
+    populate(events=args.events, teams=args.teams, schedule=False)
+
+    legacy, legacy_time, legacy_bytes = measure(lambda: legacy_get_match_scores(database))
+    columns, columns_time, columns_bytes = measure(lambda: database.get_match_score_columns())
+    del legacy
+
+    view = database.get_match_scores()
+    key = columns.keys[len(columns) // 2]
+    assert dict(view[key]) == legacy_get_match_scores(database)[key], "loaders disagree"
+
+    print(f"{len(columns)} alliance-matches")
+    print(f"{'store':<16}{'load (s)':>10}{'memory (MiB)':>14}")
+    print(f"{'dict of dicts':<16}{legacy_time:>10.3f}{legacy_bytes / 2**20:>14.2f}")
+    print(f"{'columns':<16}{columns_time:>10.3f}{columns_bytes / 2**20:>14.2f}")
+    print(f"score arrays alone: {columns.nbytes / 2**20:.2f} MiB ({legacy_bytes / columns.nbytes:.0f}x smaller than the dicts)")
+
+if __name__ == "__main__":
+    main()
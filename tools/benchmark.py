@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Times the stats pipeline (ingestion, season loading, EPA replay, per-event OPR (uncached and cached) and ranks) against synthetic
+seasons at several scales, and writes the results to a JSON file so runs from different versions can be compared.
+
+Usage (from the repository root):
+    python -m tools.benchmark --scales 20x200,100x1000,300x3000 --output bench.json
+    python -m tools.benchmark --compare bench.json
+The second form exits with 1 if any benchmark got slower than --threshold compared to bench.json.
+
+Results file format:
+    {"commit": ..., "python": ..., "numpy": ..., "platform": ..., "created": ...,
+     "results": [{"events": 20, "teams": 200, "rows": {...}, "timings": {name: {"best": s, "median": s, "runs": n}}}]}
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import database
+from stats import epa, opr
+from tools.synthetic_season import scratch_database, populate
+
+def timed(fn, repeats: int, setup=None) -> dict:
+    """
+    Runs fn `repeats` times (calling setup before each run, untimed).
+
+    Returns a dictionary with the best and median time in seconds and the number of runs.
+    """
+    samples = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"best": min(samples), "median": statistics.median(samples), "runs": repeats}
+
+def parse_scale(scale: str) -> tuple[int, int]:
+    """
+    Parses a scale written as EVENTSxTEAMS (e.g. 100x1000).
+    """
+    events, teams = scale.lower().split("x")
+    return int(events), int(teams)
+
+def __commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_scale(events: int, teams: int, repeats: int, opr_events: int) -> dict:
+    """
+    Benchmarks every stage against a fresh synthetic season with the given number of events and teams.
+    """
+    scratch_database()
+
+    # Ingestion can only run once per database
+    start = time.perf_counter()
+    listings = populate(events=events, teams=teams)
+    elapsed = time.perf_counter() - start
+    timings = {"ingest": {"best": elapsed, "median": elapsed, "runs": 1}}
+
+    with database.reading() as conn:
+        rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("scores", "matches", "schedule")}
+
+    timings["load_match_teams"] = timed(database.get_match_teams, repeats)
+    timings["load_match_scores"] = timed(database.get_match_score_columns, repeats)
+    timings["epa_init"] = timed(epa.init, repeats)
+    timings["epa_replay"] = timed(epa.season_epa, repeats, setup=epa.init)
+    timings["epa_ranks"] = timed(epa.get_ranks, repeats)
+
+    # Spread the sampled events over the season, and report the time per event. The OPR cache is cleared before
+    # every run so event_opr times the solve itself; event_opr_cached times the same calls answered from the cache.
+    sample = [listing["code"] for listing in listings[::max(1, len(listings) // opr_events)]][:opr_events]
+    calc_sample = lambda: [opr.calc_single_stat_opr(code, "totalPoints") for code in sample]
+    event_opr = timed(calc_sample, repeats, setup=opr.clear_cache)
+    timings["event_opr"] = {"best": event_opr["best"] / len(sample), "median": event_opr["median"] / len(sample), "runs": repeats}
+    event_opr_cached = timed(calc_sample, repeats, setup=calc_sample)
+    timings["event_opr_cached"] = {"best": event_opr_cached["best"] / len(sample), "median": event_opr_cached["median"] / len(sample), "runs": repeats}
+
+    return {"events": events, "teams": teams, "rows": rows, "timings": timings}
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Prints how each benchmark changed since a baseline results file.
+
+    Args:
+        baseline: results loaded from an earlier run
+        current: results from this run
+        threshold: how much slower (as a fraction, e.g. 0.2 = 20%) the best time can get before it counts as a regression
+
+    Returns the names of the regressed benchmarks, as "EVENTSxTEAMS/name".
+    """
+    previous = {(result["events"], result["teams"]): result["timings"] for result in baseline["results"]}
+    regressions = []
+
+    print(f"\nCompared to {baseline.get('commit')} ({baseline.get('created')})")
+    # Best times are compared, since they're the least affected by whatever else the machine is doing
+    print(f"{'scale':<12}{'benchmark':<20}{'before (s)':>12}{'after (s)':>12}{'change':>10}")
+    for result in current["results"]:
+        scale = f"{result['events']}x{result['teams']}"
+        for (name, timing) in result["timings"].items():
+            before = previous.get((result["events"], result["teams"]), {}).get(name)
+            if before is None:
+                continue
+            change = timing["best"] / before["best"] - 1 if before["best"] else 0.0
+            flag = "  <-- slower" if change > threshold else ""
+            print(f"{scale:<12}{name:<20}{before['best']:>12.4f}{timing['best']:>12.4f}{change:>+9.0%}{flag}")
+            if flag:
+                regressions.append(f"{scale}/{name}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, loading, EPA and OPR on synthetic seasons")
+    parser.add_argument("--scales", default="20x200,100x1000,300x3000", help="comma separated EVENTSxTEAMS")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--opr-events", type=int, default=10, help="how many events to time OPR on at each scale")
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Read the baseline first, in case it's also the output file
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = {
+        "commit": __commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "results": [],
+    }
+
+    for scale in args.scales.split(","):
+        events, teams = parse_scale(scale)
+        print(f"Benchmarking {events} events x {teams} teams")
+        result = run_scale(events, teams, args.repeats, args.opr_events)
+        report["results"].append(result)
+        for (name, timing) in result["timings"].items():
+            print(f"  {name:<20}{timing['median']:>10.4f}s")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if baseline is not None:
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            exit(1)
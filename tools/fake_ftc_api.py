@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the parts of the FTC Event API that stats.events_api uses, serving deterministic
+synthetic 2024-format events. Lets the crawler be exercised without credentials or network access.
+
+Usage:
+    python -m tools.fake_ftc_api --port 8081 --events 50
+
+then point the crawler at it:
+    events_api.init(api_url="http://localhost:8081/v2.0", username="fake", token="fake")
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SEASON_START = datetime(2024, 10, 5, 9, 0, 0)
+
+def __count(rng: random.Random, mean: float) -> int:
+    """
+    Draws a non-negative whole number of game pieces (roughly Poisson with the given mean).
+    """
+    return max(0, round(rng.gauss(mean, mean ** 0.5))) if mean > 0 else 0
+
+def __timestamp(moment: datetime, rng: random.Random) -> str:
+    """
+    Formats a time the way the FTC Event API does (local time, sometimes with fractional seconds).
+    """
+    text = moment.strftime("%Y-%m-%dT%H:%M:%S")
+    if rng.random() < 0.5:
+        text += f".{rng.randint(1, 999)}"
+    return text
+
+def alliance_score(rng: random.Random, alliance: str, strengths: list[float]) -> dict:
+    """
+    Generates one alliance's half of a `matchScores` entry from the strengths of its robots.
+
+    `totalPoints` doesn't include penalty points yet, since those come from the other alliance's fouls.
+    """
+    expected = sum(strengths)
+    auto, teleop = expected * 0.3, expected * 0.5
+
+    score = {
+        'alliance': alliance,
+        'team': 0,
+        'robot1Auto': rng.choice(["NONE", "OBSERVATION_ZONE", "ASCENT"]),
+        'robot2Auto': rng.choice(["NONE", "OBSERVATION_ZONE", "ASCENT"]),
+        'autoSampleNet': __count(rng, auto * 0.1 / 2),
+        'autoSampleLow': __count(rng, 0.3),
+        'autoSampleHigh': __count(rng, auto * 0.4 / 8),
+        'autoSpecimenLow': __count(rng, 0.3),
+        'autoSpecimenHigh': __count(rng, auto * 0.5 / 10),
+        'teleopSampleNet': __count(rng, teleop * 0.1 / 2),
+        'teleopSampleLow': __count(rng, 0.5),
+        'teleopSampleHigh': __count(rng, teleop * 0.5 / 8),
+        'teleopSpecimenLow': __count(rng, 0.5),
+        'teleopSpecimenHigh': __count(rng, teleop * 0.4 / 10),
+        'minorFouls': __count(rng, 0.5),
+        'majorFouls': __count(rng, 0.1),
+    }
+
+    # Stronger robots are more likely to make a higher ascent
+    endgames = []
+    for strength in strengths:
+        roll = rng.random() * strength
+        endgames.append("ASCENT_3" if roll > 45 else "ASCENT_2" if roll > 25 else "ASCENT_1" if roll > 12 else "OBSERVATION_ZONE" if roll > 4 else "NONE")
+    score['robot1Teleop'], score['robot2Teleop'] = endgames
+
+    score['autoSamplePoints'] = 2 * score['autoSampleNet'] + 4 * score['autoSampleLow'] + 8 * score['autoSampleHigh']
+    score['autoSpecimenPoints'] = 6 * score['autoSpecimenLow'] + 10 * score['autoSpecimenHigh']
+    auto_park = 3 * [score['robot1Auto'], score['robot2Auto']].count("OBSERVATION_ZONE") + 3 * [score['robot1Auto'], score['robot2Auto']].count("ASCENT")
+    score['teleopSamplePoints'] = 2 * score['teleopSampleNet'] + 4 * score['teleopSampleLow'] + 8 * score['teleopSampleHigh']
+    score['teleopSpecimenPoints'] = 6 * score['teleopSpecimenLow'] + 10 * score['teleopSpecimenHigh']
+    score['teleopParkPoints'] = 3 * endgames.count("OBSERVATION_ZONE")
+    score['teleopAscentPoints'] = 3 * endgames.count("ASCENT_1") + 15 * endgames.count("ASCENT_2") + 30 * endgames.count("ASCENT_3")
+    score['autoPoints'] = score['autoSamplePoints'] + score['autoSpecimenPoints'] + auto_park
+    score['teleopPoints'] = score['teleopSamplePoints'] + score['teleopSpecimenPoints']
+    score['endGamePoints'] = score['teleopParkPoints'] + score['teleopAscentPoints']
+    score['foulPointsCommitted'] = 5 * score['minorFouls'] + 15 * score['majorFouls']
+    score['preFoulTotal'] = score['autoPoints'] + score['teleopPoints'] + score['endGamePoints']
+    score['totalPoints'] = score['preFoulTotal']
+    return score
+
+def build_event(start: datetime, teams: list[int], strengths: dict[int, float], rng: random.Random,
+                matches_per_team: int = 5, played: float = 1.0) -> dict[str, dict]:
+    """
+    Generates every API payload for a single event.
+
+    Args:
+        start: when the first match starts
+        teams: the teams attending the event
+        strengths: each team's expected point contribution
+        rng: the random number generator to draw from
+        matches_per_team: how many qualification matches each team plays
+        played: the fraction of matches that have already been played (the rest are only scheduled)
+
+    Returns a dictionary where key = endpoint (e.g. scores/qual, schedule/playoff, matches) and value = JSON body.
+    """
+    qual_lineups = []
+    for _ in range(matches_per_team):
+        order = teams[:]
+        rng.shuffle(order)
+        qual_lineups += [order[i:i + 4] for i in range(0, len(order) - len(order) % 4, 4)]
+
+    # Simple best-of-one bracket between the four strongest pairs
+    seeded = sorted(teams, key=lambda t: strengths[t], reverse=True)[:8]
+    playoff_lineups = [seeded[0:2] + seeded[6:8], seeded[2:4] + seeded[4:6], seeded[0:2] + seeded[2:4]]
+
+    payloads = {"scores/qual": [], "scores/playoff": [], "schedule/qual": [], "schedule/playoff": [], "matches": []}
+    moment = start
+    cutoff = round(played * (len(qual_lineups) + len(playoff_lineups)))
+    for idx, (level, series, number, lineup) in enumerate(
+            [("QUALIFICATION", 0, i + 1, lineup) for i, lineup in enumerate(qual_lineups)]
+            + [("PLAYOFF", i + 1, 1, lineup) for i, lineup in enumerate(playoff_lineups)]):
+        moment += timedelta(minutes=7)
+        short = "qual" if level == "QUALIFICATION" else "playoff"
+        description = f"{'Qualification' if short == 'qual' else 'Match'} {number if short == 'qual' else series}"
+        stations = ["Red1", "Red2", "Blue1", "Blue2"]
+        scheduled_at = __timestamp(moment, rng)
+
+        payloads[f"schedule/{short}"].append({
+            'description': description, 'field': str(idx % 2 + 1), 'tournamentLevel': level, 'startTime': scheduled_at,
+            'series': series, 'matchNumber': number, 'modifiedOn': scheduled_at,
+            'teams': [{'teamNumber': team, 'displayTeamNumber': str(team), 'station': station, 'team': None,
+                       'teamName': f"Team {team}", 'surrogate': False, 'noShow': False} for team, station in zip(lineup, stations)],
+        })
+
+        if idx >= cutoff:
+            continue
+
+        red = alliance_score(rng, "Red", [strengths[t] for t in lineup[:2]])
+        blue = alliance_score(rng, "Blue", [strengths[t] for t in lineup[2:]])
+        red['totalPoints'] += blue['foulPointsCommitted']
+        blue['totalPoints'] += red['foulPointsCommitted']
+        payloads[f"scores/{short}"].append({'matchLevel': level, 'matchSeries': series, 'matchNumber': number, 'alliances': [blue, red]})
+
+        started_at = __timestamp(moment + timedelta(seconds=rng.randint(0, 240)), rng)
+        posted_at = __timestamp(moment + timedelta(minutes=5), rng)
+        payloads["matches"].append({
+            'actualStartTime': started_at, 'description': description, 'tournamentLevel': level, 'series': series, 'matchNumber': number,
+            'scoreRedFinal': red['totalPoints'], 'scoreRedFoul': blue['foulPointsCommitted'], 'scoreRedAuto': red['autoPoints'],
+            'scoreBlueFinal': blue['totalPoints'], 'scoreBlueFoul': red['foulPointsCommitted'], 'scoreBlueAuto': blue['autoPoints'],
+            'postResultTime': posted_at, 'modifiedOn': posted_at,
+            'teams': [{'teamNumber': team, 'station': station, 'dq': False, 'onField': True} for team, station in zip(lineup, stations)],
+        })
+
+    return {
+        "scores/qual": {"matchScores": payloads["scores/qual"]},
+        "scores/playoff": {"matchScores": payloads["scores/playoff"]},
+        "schedule/qual": {"schedule": payloads["schedule/qual"]},
+        "schedule/playoff": {"schedule": payloads["schedule/playoff"]},
+        "matches": {"matches": payloads["matches"]},
+    }
+
+def build_season(events: int = 20, teams: int = 200, teams_per_event: int = 24, matches_per_team: int = 5,
+                 seed: int = 2024, live_events: int = 0) -> tuple[list[dict], dict[str, dict[str, dict]]]:
+    """
+    Generates a whole synthetic season.
+
+    Args:
+        events: the number of events
+        teams: the number of teams in the season
+        teams_per_event: how many teams attend each event
+        matches_per_team: how many qualification matches each team plays per event
+        seed: random seed, so the same arguments always produce the same season
+        live_events: how many of the last events are still in progress (only partly played)
+
+    Returns a tuple (event listings, payloads) where payloads maps event code -> endpoint -> JSON body.
+    """
+    rng = random.Random(seed)
+    team_numbers = rng.sample(range(1000, 30000), teams)
+    base_strengths = {team: max(5.0, rng.gauss(30, 12)) for team in team_numbers}
+
+    listings, payloads = [], {}
+    for idx in range(events):
+        code = f"SYN{idx:04d}"
+        start = SEASON_START + timedelta(days=(idx * 180) // max(events, 1))
+        # Teams get better over the course of the season
+        progress = idx / max(events - 1, 1)
+        strengths = {team: strength * (1 + 0.5 * progress) for team, strength in base_strengths.items()}
+        attending = rng.sample(team_numbers, min(teams_per_event, teams))
+        played = 0.5 if idx >= events - live_events else 1.0
+
+        listings.append({"code": code, "name": f"Synthetic Event {idx}",
+                         "dateStart": start.strftime("%Y-%m-%dT00:00:00"), "dateEnd": (start + timedelta(days=1)).strftime("%Y-%m-%dT00:00:00")})
+        payloads[code] = build_event(start, attending, strengths, rng, matches_per_team=matches_per_team, played=played)
+
+    return listings, payloads
+
+class FakeFTCApi:
+    """
+    Serves a synthetic season over HTTP on a background thread, mimicking the FTC Event API endpoints.
+
+    Set `failure_rate` to make that fraction of requests fail with a 503, and `latency` to delay every response.
+    """
+
+    def __init__(self, season: int = 2024, port: int = 0, failure_rate: float = 0.0, latency: float = 0.0, **season_args):
+        self.season = season
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.requests_served = 0
+        self.events, self.payloads = build_season(**season_args)
+        # Last-Modified of every event, in whole seconds like HTTP dates
+        self.modified = {event["code"]: int(time.time()) for event in self.events}
+        self.__rng = random.Random(season)
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(("127.0.0.1", port), self.__handler())
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.__server.server_address[1]}/v2.0"
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def update_event(self, code: str, payloads: dict[str, dict]):
+        """
+        Replaces an event's payloads and bumps its Last-Modified time, like a new match result being posted.
+        """
+        self.payloads[code] = payloads
+        self.modified[code] = max(int(time.time()), self.modified[code] + 1)
+
+    def record_request(self) -> bool:
+        """
+        Counts a request and returns True if it should be made to fail.
+        """
+        with self.__lock:
+            self.requests_served += 1
+            return self.__rng.random() < self.failure_rate
+
+    def route(self, path: str, query: dict) -> dict:
+        """
+        Returns the JSON body for an API path, or None if the path isn't one we serve.
+        """
+        parts = path.strip("/").split("/")
+        if len(parts) < 3 or parts[0] != "v2.0" or parts[1] != str(self.season):
+            return None
+
+        endpoint, rest = parts[2], parts[3:]
+        if endpoint == "events" and rest == []:
+            return {"events": self.events, "eventCount": len(self.events)}
+        if not rest or rest[0] not in self.payloads:
+            return None
+
+        event = self.payloads[rest[0]]
+        if endpoint == "scores" and len(rest) == 2 and rest[1] in ("qual", "playoff"):
+            return event[f"scores/{rest[1]}"]
+        if endpoint == "schedule" and len(rest) == 1:
+            return event[f"schedule/{query.get('tournamentLevel', ['qual'])[0]}"]
+        if endpoint == "matches" and len(rest) == 1:
+            return event["matches"]
+        return None
+
+    def __handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fail = api.record_request()
+
+                if api.latency:
+                    time.sleep(api.latency)
+
+                if "Authorization" not in self.headers:
+                    return self.__send(401, {"error": "missing credentials"})
+                if fail:
+                    return self.__send(503, {"error": "try again later"})
+
+                url = urlparse(self.path)
+                body = api.route(url.path, parse_qs(url.query))
+                if body is None:
+                    return self.__send(404, {"error": "not found"})
+
+                # Event endpoints support conditional requests, like the real API
+                parts = url.path.strip("/").split("/")
+                modified = api.modified.get(parts[3]) if len(parts) > 3 else None
+                since = self.headers.get("If-Modified-Since")
+                if modified is not None and since is not None and parsedate_to_datetime(since).timestamp() >= modified:
+                    return self.__send(304, None, modified)
+                self.__send(200, body, modified)
+
+            def __send(self, status: int, body: dict, modified: int = None):
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if modified is not None:
+                    self.send_header("Last-Modified", formatdate(modified, usegmt=True))
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic season that mimics the FTC Event API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    api = FakeFTCApi(port=args.port, failure_rate=args.failure_rate, latency=args.latency, events=args.events, teams=args.teams).start()
+    print(f"Serving {args.events} synthetic events at {api.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
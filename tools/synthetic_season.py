@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Fills a scratch SQLite database with a synthetic 2024-format season (scores, matches and schedule rows)
+without touching the FTC Event API. The payloads come from tools.fake_ftc_api.build_season and are stored
+with the same bulk functions the crawler uses, so the rows look exactly like ingested ones.
+
+Usage (from the repository root):
+    python -m tools.synthetic_season --events 300 --teams 3000 --output synthetic.db
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database
+from tools.fake_ftc_api import build_season
+
+def scratch_database(path: str = None) -> str:
+    """
+    Points the database module at a new, migrated database file.
+
+    Args:
+        path (optional): where to create the database, defaults to a new temporary directory
+
+    Returns the path of the database file.
+    """
+    if path is None:
+        path = str(Path(tempfile.mkdtemp()) / "database.db")
+    database.configure(path)
+    database.init()
+    return path
+
+def store_event(event_code: str, payloads: dict[str, dict], season: int = 2024, schedule: bool = True) -> int:
+    """
+    Stores one event's payloads (as returned by build_event) in the database.
+
+    Returns the number of rows written.
+    """
+    written = database.store_match_scores(event_code, payloads["scores/qual"]["matchScores"] + payloads["scores/playoff"]["matchScores"], season=season)
+    written += database.store_matches(event_code, payloads["matches"]["matches"], season=season)
+    if schedule:
+        written += database.store_scheduled_matches(event_code, payloads["schedule/qual"]["schedule"] + payloads["schedule/playoff"]["schedule"], season=season)
+    return written
+
+def populate(events: int = 20, teams: int = 200, teams_per_event: int = 24, matches_per_team: int = 5,
+             seed: int = 2024, season: int = 2024, schedule: bool = True) -> list[dict]:
+    """
+    Generates a synthetic season and stores it in the database the database module currently points at.
+
+    Args:
+        events: the number of events
+        teams: the number of teams in the season
+        teams_per_event: how many teams attend each event
+        matches_per_team: how many qualification matches each team plays per event
+        seed: random seed, so the same arguments always produce the same season
+        season: the season to store the rows under
+        schedule (optional): also store the schedule rows
+
+    Returns the event listings, in the same format as the season's event listing from the API.
+    """
+    listings, payloads = build_season(events=events, teams=teams, teams_per_event=teams_per_event,
+                                      matches_per_team=matches_per_team, seed=seed)
+    for listing in listings:
+        store_event(listing["code"], payloads[listing["code"]], season=season, schedule=schedule)
+    return listings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a SQLite database with a synthetic 2024-format season")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--teams-per-event", type=int, default=24)
+    parser.add_argument("--matches-per-team", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--output", default="synthetic.db")
+    args = parser.parse_args()
+
+    if Path(args.output).exists():
+        print(f"{args.output} already exists")
+        exit(1)
+
+    scratch_database(args.output)
+    start = time.perf_counter()
+    listings = populate(events=args.events, teams=args.teams, teams_per_event=args.teams_per_event,
+                        matches_per_team=args.matches_per_team, seed=args.seed)
+    print(f"Stored {len(listings)} events in {args.output} in {time.perf_counter() - start:.2f}s")